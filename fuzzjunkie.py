@@ -5,8 +5,8 @@ fuzzjunkie v3.1 for Python 3
 fuzzjunkie provides easy-to-use methods for performing fuzzy string searches.
 Strings can be compared to other strings and receive a score based on percentage
 match (relative) or number of matches (absolute). v3.0 uses its own
-implementation of character n-grams to achieve this. Word n-gram functionality
-is planned for a future v4.0.
+implementation of character n-grams to achieve this. WordNgram provides the same
+functionality using word n-grams, which are better suited to long strings.
 
 In addition, fuzzjunkie was coded with clarity and readability in mind. The
 source code is meant to be educational and not hyper-optimized for speed as C,
@@ -17,6 +17,10 @@ based logic in any programming language.
 See fuzzjunkie_examples.py for a demonstration of how to make use of fuzzjunkie
 in your own Python programs. Unit tests can be found in fuzzjunkie_tests.py.
 
+fuzzjunkie can also be run from the command line to match a file of query
+strings against a file of reference strings; see main() or run
+"python -m fuzzjunkie --help".
+
 More on n-grams: https://en.wikipedia.org/wiki/N-gram
 
 Author:
@@ -50,7 +54,684 @@ __copyright__ = "Juan Irming"
 __maintainer__ = "Juan Irming"
 
 # ------------------------------------------------------------------------------
+import argparse
+import asyncio
+import bisect
+import contextlib
+import hashlib
+import heapq
+import itertools
+import json
+import math
+import mmap
+import os
+import random
+import re
+import struct
+import sys
+import tempfile
+import threading
+import time
+
+from array import array
+from collections import OrderedDict, deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
 from enum import Enum
+from types import MappingProxyType
+
+try:
+    import numpy
+except ImportError:     # numpy is optional and only used by CharNgramMatrix.
+    numpy = None
+
+# ------------------------------------------------------------------------------
+class CharNgramCache(object):
+    """A bounded least recently used cache of generated ngrams.
+
+    Stores the ngrams generated from each string, partitioned by ngram size.
+    The cache is bounded by a maximum number of entries and by a maximum
+    approximate number of bytes across all partitions. Once either limit is
+    exceeded, the least recently used entries are evicted until both limits
+    are met again. Hits, misses, evictions and resident bytes are tracked per
+    partition and reported by cache_info().
+
+    Strings are cached in one of two roles. Reference strings are reused on
+    every comparison and are always admitted. Query strings are often only
+    seen once, so their ngrams are only admitted once a frequency sketch has
+    seen the string at least a given number of times, and only if the string
+    has been seen more often than the query string it would evict (TinyLFU).
+    Query entries never evict reference entries and are always evicted before
+    them, so reference entries are pinned for as long as query entries remain
+    to be evicted.
+
+    CharNgram uses an instance of this class by default. A differently sized
+    instance, or any object providing the same get(), put(), clear() and
+    cache_info() methods, can be plugged in using CharNgram.set_cache().
+
+    All methods are thread-safe. Since the recency order, the limits and the
+    frequency sketch are shared by all partitions, a single lock guards them;
+    it is only held for the few dict operations of each call.
+
+    Attributes:
+        Role.REFERENCE:     Enum
+                            A convenience value for selecting the reference
+                            string role.
+
+        Role.QUERY:         Enum
+                            A convenience value for selecting the query string
+                            role.
+
+        Info:               namedtuple
+                            The type returned by cache_info(), with the fields
+                            hits, misses, evictions, entries, bytes,
+                            max_entries and max_bytes.
+
+    Author:
+        Juan Irming
+    """
+
+    # --------------------------------------------------------------------------
+    # Available roles of cached strings.
+    Role = Enum(
+        "Role",
+        "REFERENCE QUERY",
+        qualname="CharNgramCache.Role"
+    )
+
+    # --------------------------------------------------------------------------
+    Info = namedtuple(
+        "Info",
+        "hits misses evictions entries bytes max_entries max_bytes"
+    )
+
+    # --------------------------------------------------------------------------
+    __DEFAULT_MAX_ENTRIES = 100000          # The default maximum number of
+                                            # cached strings.
+    __DEFAULT_MAX_BYTES = 64 * 1024 * 1024  # The default maximum approximate
+                                            # number of bytes of cached ngrams.
+    __DEFAULT_QUERY_ADMISSION = 2           # The default number of times a
+                                            # query string must be seen before
+                                            # its ngrams are cached.
+
+    __SKETCH_DEPTH = 4                      # Rows in the frequency sketch.
+    __SKETCH_MIN_WIDTH = 1024               # Minimum and maximum counters per
+    __SKETCH_MAX_WIDTH = 1024 * 1024        # frequency sketch row.
+    __SKETCH_MAX_COUNT = 15                 # Frequency sketch counter limit.
+    __SKETCH_HALVE_TABLE = bytes(           # Maps every counter to half of
+        count >> 1 for count in range(256)  # it, so that bytes.translate()
+    )                                       # halves a whole sketch in C.
+
+    # Indexes into the per-partition statistics lists.
+    __HITS = 0
+    __MISSES = 1
+    __EVICTIONS = 2
+    __ENTRIES = 3
+    __BYTES = 4
+
+    # --------------------------------------------------------------------------
+    def __init__(
+        self,
+        arg_max_entries=__DEFAULT_MAX_ENTRIES,
+        arg_max_bytes=__DEFAULT_MAX_BYTES,
+        arg_query_admission=__DEFAULT_QUERY_ADMISSION
+    ):
+        """Creates an empty cache.
+
+        Args:
+            arg_max_entries:        int|None (optional)
+                                    The maximum number of cached strings across
+                                    all ngram sizes. None means unlimited.
+                                    Defaults to class attribute
+                                    __DEFAULT_MAX_ENTRIES.
+
+            arg_max_bytes:          int|None (optional)
+                                    The maximum approximate number of bytes
+                                    used by cached strings and their ngrams
+                                    across all ngram sizes. None means
+                                    unlimited.
+                                    Defaults to class attribute
+                                    __DEFAULT_MAX_BYTES.
+
+            arg_query_admission:    int (optional)
+                                    The number of times a query string must be
+                                    seen before its ngrams are cached. A value
+                                    of 1 or less caches query strings like
+                                    reference strings.
+                                    Defaults to class attribute
+                                    __DEFAULT_QUERY_ADMISSION.
+
+        Raises:
+            CharNgramException: if a limit is negative or not an int.
+        """
+
+        for name, value in [
+            ("arg_max_entries", arg_max_entries),
+            ("arg_max_bytes", arg_max_bytes),
+            ("arg_query_admission", arg_query_admission)
+        ]:
+            if value is None and name != "arg_query_admission":
+                continue
+
+            try:
+                if value < 0:
+                    raise CharNgramException("%s must be at least 0" % name)
+            except TypeError:
+                raise CharNgramException("%s must be type int" % name)
+
+        self.max_entries = arg_max_entries
+        self.max_bytes = arg_max_bytes
+        self.query_admission = arg_query_admission
+
+        # (ngram size, string) -> (ngrams, approximate bytes), least recently
+        # used first. One dict per role.
+        self.__entries = {
+            self.Role.REFERENCE: OrderedDict(),
+            self.Role.QUERY: OrderedDict()
+        }
+
+        self.__stats = {}               # ngram size -> [hits, misses,
+                                        # evictions, entries, bytes]
+        self.__entry_count = 0
+        self.__byte_count = 0
+
+        self.__lock = threading.Lock()  # Guards all of the above and the
+                                        # frequency sketch below.
+
+        sketch_width = self.__SKETCH_MIN_WIDTH
+
+        while (
+            sketch_width < self.__SKETCH_MAX_WIDTH
+            and (arg_max_entries is None or sketch_width < arg_max_entries)
+        ):
+            sketch_width *= 2
+
+        self.__sketch_mask = sketch_width - 1
+        self.__sketch = bytearray(self.__SKETCH_DEPTH * sketch_width)
+        self.__sketch_additions = 0
+        self.__sketch_sample_size = 10 * sketch_width
+
+    # --------------------------------------------------------------------------
+    def get(self, arg_ngram_size, arg_string, arg_role=Role.REFERENCE):
+        """Fetches the cached ngrams of a string.
+
+        Args:
+            arg_ngram_size:         int
+                                    The ngram size the ngrams were generated
+                                    with.
+
+            arg_string:             str
+                                    The string the ngrams were generated from.
+
+            arg_role:               int (optional)
+                                    The role of the string. Valid values are
+                                    Role.REFERENCE and Role.QUERY. Query
+                                    lookups are counted by the frequency
+                                    sketch.
+                                    Defaults to class attribute
+                                    Role.REFERENCE.
+
+        Returns:
+            dict|None
+            The cached ngrams, or None if they are not in the cache.
+        """
+
+        key = (arg_ngram_size, arg_string)
+
+        with self.__lock:
+            stats = self.__get_stats(arg_ngram_size)
+
+            if arg_role == self.Role.QUERY:
+                self.__record(key)
+
+            for entries in self.__entries.values():
+                entry = entries.get(key)
+
+                if entry is not None:
+                    stats[self.__HITS] += 1
+                    entries.move_to_end(key)
+
+                    return entry[0]
+
+            stats[self.__MISSES] += 1
+
+            return None
+
+    # --------------------------------------------------------------------------
+    def put(
+        self,
+        arg_ngram_size,
+        arg_string,
+        arg_ngrams,
+        arg_role=Role.REFERENCE
+    ):
+        """Stores the ngrams of a string, evicting old entries if needed.
+
+        Query strings are only stored if admitted by the frequency sketch. A
+        reference string replaces any query entry of the same string.
+
+        Args:
+            arg_ngram_size:         int|tuple
+                                    The ngram size the ngrams were generated
+                                    with, or the tuple of ngram sizes of a
+                                    multi-size profile.
+
+            arg_string:             str
+                                    The string the ngrams were generated from.
+
+            arg_ngrams:             dict|tuple
+                                    The ngrams generated from the string, or a
+                                    tuple of them, one per ngram size.
+
+            arg_role:               int (optional)
+                                    The role of the string. Valid values are
+                                    Role.REFERENCE and Role.QUERY.
+                                    Defaults to class attribute
+                                    Role.REFERENCE.
+        """
+
+        key = (arg_ngram_size, arg_string)
+        size = self.__estimate_bytes(arg_string, arg_ngrams)
+
+        with self.__lock:
+            if arg_role == self.Role.QUERY:
+                if key in self.__entries[self.Role.REFERENCE]:
+                    return
+
+                if not self.__admit(key):
+                    return
+            else:
+                arg_role = self.Role.REFERENCE
+
+            for role in self.__entries:
+                if key in self.__entries[role]:
+                    self.__remove(role, key)
+
+            self.__entries[arg_role][key] = (arg_ngrams, size)
+
+            stats = self.__get_stats(arg_ngram_size)
+            stats[self.__ENTRIES] += 1
+            stats[self.__BYTES] += size
+            self.__entry_count += 1
+            self.__byte_count += size
+
+            while self.__is_over_limit():
+                if self.__entries[self.Role.QUERY]:
+                    role = self.Role.QUERY
+                else:
+                    role = self.Role.REFERENCE
+
+                evicted_key = next(iter(self.__entries[role]))
+                self.__remove(role, evicted_key)
+                self.__stats[evicted_key[0]][self.__EVICTIONS] += 1
+
+    # --------------------------------------------------------------------------
+    def clear(self, arg_ngram_size=None):
+        """Removes cached ngrams and resets statistics.
+
+        Args:
+            arg_ngram_size:         int|None (optional)
+                                    The ngram size partition to clear. None
+                                    clears every partition as well as the
+                                    frequency sketch.
+                                    Defaults to None.
+        """
+
+        with self.__lock:
+            if arg_ngram_size is None:
+                for entries in self.__entries.values():
+                    entries.clear()
+
+                self.__stats.clear()
+                self.__entry_count = 0
+                self.__byte_count = 0
+
+                self.__sketch = bytearray(len(self.__sketch))
+                self.__sketch_additions = 0
+            else:
+                for role, entries in self.__entries.items():
+                    for key in [
+                        key for key in entries if key[0] == arg_ngram_size
+                    ]:
+                        self.__remove(role, key)
+
+                self.__stats.pop(arg_ngram_size, None)
+
+    # --------------------------------------------------------------------------
+    def cache_info(self, arg_ngram_size=None):
+        """Reports cache statistics.
+
+        Args:
+            arg_ngram_size:         int|None (optional)
+                                    The ngram size partition to report on.
+                                    None reports on all partitions combined.
+                                    Defaults to None.
+
+        Returns:
+            CharNgramCache.Info
+            The cache statistics.
+
+            Example:
+            Info(hits=10, misses=5, evictions=0, entries=5, bytes=2410,
+                 max_entries=100000, max_bytes=67108864)
+        """
+
+        with self.__lock:
+            if arg_ngram_size is None:
+                stats = [0, 0, 0, 0, 0]
+
+                for partition_stats in self.__stats.values():
+                    for i, value in enumerate(partition_stats):
+                        stats[i] += value
+            else:
+                stats = list(
+                    self.__stats.get(arg_ngram_size, [0, 0, 0, 0, 0])
+                )
+
+        return self.Info(
+            stats[self.__HITS],
+            stats[self.__MISSES],
+            stats[self.__EVICTIONS],
+            stats[self.__ENTRIES],
+            stats[self.__BYTES],
+            self.max_entries,
+            self.max_bytes
+        )
+
+    # --------------------------------------------------------------------------
+    def __get_stats(self, arg_ngram_size):
+        """Returns the statistics list of an ngram size partition."""
+
+        if arg_ngram_size not in self.__stats:
+            self.__stats[arg_ngram_size] = [0, 0, 0, 0, 0]
+
+        return self.__stats[arg_ngram_size]
+
+    # --------------------------------------------------------------------------
+    def __is_over_limit(self, arg_extra_entries=0):
+        """Checks whether the entry or byte limit is exceeded.
+
+        Args:
+            arg_extra_entries:      int (optional)
+                                    A number of entries to add to the current
+                                    entry count before checking.
+                                    Defaults to 0.
+        """
+
+        return (
+            self.max_entries is not None
+            and self.__entry_count + arg_extra_entries > self.max_entries
+        ) or (
+            self.max_bytes is not None
+            and self.__byte_count > self.max_bytes
+        )
+
+    # --------------------------------------------------------------------------
+    def __remove(self, arg_role, arg_key):
+        """Removes an entry and updates the entry and byte counts."""
+
+        ngrams, size = self.__entries[arg_role].pop(arg_key)
+
+        stats = self.__stats[arg_key[0]]
+        stats[self.__ENTRIES] -= 1
+        stats[self.__BYTES] -= size
+        self.__entry_count -= 1
+        self.__byte_count -= size
+
+    # --------------------------------------------------------------------------
+    def __admit(self, arg_key):
+        """Decides whether the ngrams of a query string should be cached.
+
+        A query string is admitted once it has been seen at least
+        query_admission times. If the cache is full, it must also have been
+        seen more often than the least recently used query string it would
+        evict. Query strings never evict reference strings.
+        """
+
+        frequency = self.__estimate(arg_key)
+
+        if frequency < self.query_admission:
+            return False
+
+        if self.__is_over_limit(1):
+            query_entries = self.__entries[self.Role.QUERY]
+
+            if not query_entries:
+                return False
+
+            victim_key = next(iter(query_entries))
+
+            return frequency > self.__estimate(victim_key)
+
+        return True
+
+    # --------------------------------------------------------------------------
+    def __record(self, arg_key):
+        """Counts a query string lookup in the frequency sketch.
+
+        The sketch is a count-min sketch of small saturating counters. Once a
+        sample of lookups has been counted, all counters are halved so that
+        the sketch favors recent lookups.
+        """
+
+        width = self.__sketch_mask + 1
+        key_hash = hash(arg_key)
+
+        for row in range(self.__SKETCH_DEPTH):
+            i = row * width + (hash((row, key_hash)) & self.__sketch_mask)
+
+            if self.__sketch[i] < self.__SKETCH_MAX_COUNT:
+                self.__sketch[i] += 1
+
+        self.__sketch_additions += 1
+
+        if self.__sketch_additions >= self.__sketch_sample_size:
+            self.__sketch = self.__sketch.translate(self.__SKETCH_HALVE_TABLE)
+            self.__sketch_additions //= 2
+
+    # --------------------------------------------------------------------------
+    def __estimate(self, arg_key):
+        """Returns the frequency sketch estimate of query string lookups."""
+
+        width = self.__sketch_mask + 1
+        key_hash = hash(arg_key)
+
+        return min(
+            self.__sketch[
+                row * width + (hash((row, key_hash)) & self.__sketch_mask)
+            ]
+            for row in range(self.__SKETCH_DEPTH)
+        )
+
+    # --------------------------------------------------------------------------
+    @staticmethod
+    def __estimate_bytes(arg_string, arg_ngrams):
+        """Approximates the memory used by a string and its ngrams.
+
+        Counts the string, the ngram dicts and their ngram keys. The counts are
+        small ints shared by the interpreter and therefore not counted.
+        """
+
+        size = sys.getsizeof(arg_string)
+
+        if isinstance(arg_ngrams, tuple):
+            size += sys.getsizeof(arg_ngrams)
+            profiles = arg_ngrams
+        else:
+            profiles = (arg_ngrams,)
+
+        for ngrams in profiles:
+            size += sys.getsizeof(ngrams)
+
+            for ngram in ngrams:
+                size += sys.getsizeof(ngram)
+
+        return size
+
+# ------------------------------------------------------------------------------
+class CharNgramMetrics(object):
+    """Counters and timers of where CharNgram spends its work.
+
+    Once plugged in using CharNgram.set_metrics(), CharNgram reports the
+    following to the instance. Counters:
+
+        queries:            Input strings compared against a reference list
+                            (compare_list() and friends, once per call and
+                            once per distinct input of compare_many()).
+        comparisons:        Reference strings scored, including by
+                            compare_string(). Reference strings skipped for
+                            arg_min_score or left out by an index are not.
+        strings_profiled:   Strings whose ngrams were generated.
+        ngrams_generated:   Ngrams generated from those strings.
+        cache_hits:         Ngram lookups answered by the cache.
+        cache_misses:       Ngram lookups the cache could not answer.
+
+    Timers, in seconds:
+
+        profiling:          Generating the ngrams of strings.
+        scoring:            Scoring reference lists in compare_list() and
+                            compare_list_topk(), including any profiling.
+        sorting:            Ranking the scores of compare_list().
+
+    Every report is added up in the instance and also passed to the callback,
+    if one was given, so that it can be forwarded to an external metrics
+    system. Without metrics, which is the default, CharNgram does no timing
+    or counting at all. Work done in CharNgramShardPool or main() worker
+    processes is not reported.
+
+    All methods are thread-safe.
+
+    Attributes:
+        Kind.COUNTER:       Enum
+                            The kind of report of counters.
+
+        Kind.TIMER:         Enum
+                            The kind of report of timers.
+
+        Timer:              namedtuple
+                            The type of each timer in snapshot(), with the
+                            fields count, total and max, in seconds.
+
+        Snapshot:           namedtuple
+                            The type returned by snapshot(), with the fields
+                            counters (a dict of ints) and timers (a dict of
+                            Timer).
+
+    Author:
+        Juan Irming
+    """
+
+    # --------------------------------------------------------------------------
+    # Available kinds of reports.
+    Kind = Enum(
+        "Kind",
+        "COUNTER TIMER",
+        qualname="CharNgramMetrics.Kind"
+    )
+
+    # --------------------------------------------------------------------------
+    Timer = namedtuple("Timer", "count total max")
+
+    Snapshot = namedtuple("Snapshot", "counters timers")
+
+    # --------------------------------------------------------------------------
+    def __init__(self, arg_callback=None):
+        """Creates an instance with all counters and timers at zero.
+
+        Args:
+            arg_callback:           callable|None (optional)
+                                    Called with the kind (Kind.COUNTER or
+                                    Kind.TIMER), name and value of every
+                                    report, in the thread making it. Timer
+                                    values are in seconds. Should return
+                                    quickly, since comparisons wait for it.
+                                    Defaults to None.
+        """
+
+        self.__callback = arg_callback
+
+        self.__lock = threading.Lock()
+        self.__counters = {}
+        self.__timers = {}  # name -> [count, total, max]
+
+    # --------------------------------------------------------------------------
+    def increment(self, arg_name, arg_value=1):
+        """Adds to a counter.
+
+        Args:
+            arg_name:               str
+                                    The name of the counter.
+
+            arg_value:              int (optional)
+                                    The amount to add.
+                                    Defaults to 1.
+        """
+
+        with self.__lock:
+            self.__counters[arg_name] = (
+                self.__counters.get(arg_name, 0) + arg_value
+            )
+
+        if self.__callback is not None:
+            self.__callback(self.Kind.COUNTER, arg_name, arg_value)
+
+    # --------------------------------------------------------------------------
+    def record_time(self, arg_name, arg_seconds):
+        """Adds a duration to a timer.
+
+        Args:
+            arg_name:               str
+                                    The name of the timer.
+
+            arg_seconds:            float
+                                    The duration to add.
+        """
+
+        with self.__lock:
+            timer = self.__timers.get(arg_name)
+
+            if timer is None:
+                self.__timers[arg_name] = [1, arg_seconds, arg_seconds]
+            else:
+                timer[0] += 1
+                timer[1] += arg_seconds
+
+                if arg_seconds > timer[2]:
+                    timer[2] = arg_seconds
+
+        if self.__callback is not None:
+            self.__callback(self.Kind.TIMER, arg_name, arg_seconds)
+
+    # --------------------------------------------------------------------------
+    def snapshot(self):
+        """Returns the current counters and timers.
+
+        Returns:
+            CharNgramMetrics.Snapshot
+            A copy of the counters and timers reported so far.
+
+            Example:
+            Snapshot(
+                counters={"queries": 1, "comparisons": 10},
+                timers={"scoring": Timer(count=1, total=0.002, max=0.002)}
+            )
+        """
+
+        with self.__lock:
+            return self.Snapshot(
+                dict(self.__counters),
+                {
+                    name: self.Timer(*timer)
+                    for name, timer in self.__timers.items()
+                }
+            )
+
+    # --------------------------------------------------------------------------
+    def reset(self):
+        """Sets all counters and timers back to zero."""
+
+        with self.__lock:
+            self.__counters = {}
+            self.__timers = {}
 
 # ------------------------------------------------------------------------------
 class CharNgram(object):
@@ -62,6 +743,12 @@ class CharNgram(object):
     mentioned comparison. Results can be computed as percentage matches or
     absolute number of matches.
 
+    All methods are thread-safe and may be called concurrently, e.g. from the
+    worker threads of a web server. Generated ngrams are shared through a
+    thread-safe CharNgramCache; the dicts it hands out are never modified once
+    cached. A CharNgramIndex may be queried from many threads at once, but
+    must not be modified while it is being queried.
+
     Attributes:
         Scoring.PERCENTAGE: Enum
             A convenience value for selecting the scoring method.
@@ -69,6 +756,18 @@ class CharNgram(object):
         Scoring.MATCHES:    Enum
             A convenience value for selecting the scoring method.
 
+        Scoring.INPUT_PERCENTAGE: Enum
+            A convenience value for selecting the scoring method.
+
+        Scoring.DICE:       Enum
+            A convenience value for selecting the scoring method.
+
+        Scoring.JACCARD:    Enum
+            A convenience value for selecting the scoring method.
+
+        Scoring.COSINE:     Enum
+            A convenience value for selecting the scoring method.
+
         ReturnBy.STRING:    Enum
                     A convenience value for selecting the return type.
 
@@ -91,21 +790,37 @@ class CharNgram(object):
                     A convenience value for selecting the score of each tuple in
                     the compare_list() return.
 
+        BatchScores: namedtuple
+                    The compare_many() return type, with the fields indexes and
+                    scores.
+
     Author:
         Juan Irming
     """
 
     # --------------------------------------------------------------------------
     # Available scoring methods.
-    Scoring = Enum("Scoring", "PERCENTAGE MATCHES")
+    Scoring = Enum(
+        "Scoring",
+        "PERCENTAGE MATCHES INPUT_PERCENTAGE DICE JACCARD COSINE",
+        qualname="CharNgram.Scoring"
+    )
 
     # --------------------------------------------------------------------------
     # Available compare_list() return types.
-    ReturnBy = Enum("ReturnBy", "STRING INDEX")
+    ReturnBy = Enum(
+        "ReturnBy",
+        "STRING INDEX",
+        qualname="CharNgram.ReturnBy"
+    )
 
     # --------------------------------------------------------------------------
     # The compare_list() scoring results to include in return.
-    ReturnScope = Enum("ReturnScope", "ALL TOP")
+    ReturnScope = Enum(
+        "ReturnScope",
+        "ALL TOP",
+        qualname="CharNgram.ReturnScope"
+    )
 
     # --------------------------------------------------------------------------
     # Attributes to help find match string/index and score of each tuple in
@@ -113,14 +828,44 @@ class CharNgram(object):
     MATCH = 0
     SCORE = 1
 
+    # --------------------------------------------------------------------------
+    # The compare_many() return type.
+    BatchScores = namedtuple("BatchScores", "indexes scores")
+
     # --------------------------------------------------------------------------
     __MIN_NGRAM_SIZE = 1        # The minimum valid ngram size.
     __DEFAULT_NGRAM_SIZE = 2    # The default ngram size.
+    __DEFAULT_CHUNK_SIZE = 1000 # The default number of reference strings the
+                                # async methods score between yields to the
+                                # event loop.
+
+    __cache = CharNgramCache()  # A bounded cache where we store generated
+                                # ngrams so we don't needlessly regenerate them
+                                # in the future. Partitioned to allow for
+                                # various ngram sizes of the same string.
+
+    __metrics = None            # Where we report counters and timers, if
+                                # anywhere. See set_metrics().
+
+    _ENGINE_ID = 0              # Identifies the ngrams of this class in saved
+                                # files, see load(). Subclasses generating
+                                # different ngrams must override it.
+
+    _DEFAULT_NGRAM_SIZE = __DEFAULT_NGRAM_SIZE  # The default ngram size, for
+                                                # callers outside the class,
+                                                # e.g. CharNgramShardPool.
 
-    __cache = {}                # A dict where we store generated ngrams so we
-                                # don't needlessly regenerate them in the
-                                # future. Multi-dimensional to allow for various
-                                # ngram sizes of the same string.
+    # --------------------------------------------------------------------------
+    def __init_subclass__(cls, **kwargs):
+        """Gives every subclass a cache of its own.
+
+        Subclasses such as WordNgram generate different ngrams from the same
+        strings, so they must not share cached ngrams with CharNgram.
+        """
+
+        super().__init_subclass__(**kwargs)
+
+        cls.__cache = CharNgramCache()
 
     # --------------------------------------------------------------------------
     @classmethod
@@ -138,6 +883,27 @@ class CharNgram(object):
         For instance, "test" is calculated as a 50.0% match against "testing",
         and scores a 3 in terms of number of matches given an ngram size of 2.
 
+        Every scoring method is computed from the same single count of ngram
+        matches m, given r reference ngrams and i input ngrams, and all but
+        Scoring.MATCHES range from 0 to 100:
+
+            Scoring.PERCENTAGE          m / r * 100
+            Scoring.MATCHES             m
+            Scoring.INPUT_PERCENTAGE    m / i * 100
+            Scoring.DICE                2 * m / (r + i) * 100
+            Scoring.JACCARD             m / (r + i - m) * 100
+            Scoring.COSINE              m / sqrt(r * i) * 100
+
+        Ngrams occurring several times are matched as many times as they occur
+        in both strings. Scoring.COSINE is thus the Otsuka-Ochiai coefficient
+        of the two ngram multisets, which equals the cosine similarity of their
+        ngram count vectors whenever no ngram occurs more than once. A score is
+        0 if its denominator is.
+
+        Given a tuple of scoring methods, e.g.
+        (Scoring.DICE, Scoring.JACCARD), the matches are counted once and a
+        tuple of scores is returned, one per method.
+
         Args:
             arg_reference_string:   str
                                     The reference string to compare against.
@@ -145,29 +911,38 @@ class CharNgram(object):
             arg_input_string:       str
                                     The input string to be compared.
 
-            arg_scoring_method:     int (optional)
-                                    Desired scoring method. Valid values are
-                                    Scoring.PERCENTAGE (percentage match) and
-                                    Scoring.MATCHES (number of matches).
+            arg_scoring_method:     int|tuple (optional)
+                                    Desired scoring method, or a tuple of
+                                    them. Valid values are the members of
+                                    Scoring, see above.
                                     Defaults to class attribute
                                     Scoring.PERCENTAGE.
 
-            arg_ngram_size:         int (optional)
+            arg_ngram_size:         int|tuple (optional)
                                     The ngram size to use. The minimum valid
-                                    value is 1.
+                                    value is 1. Given a tuple of ngram sizes,
+                                    e.g. (1, 2, 3), the ngrams of every size
+                                    are generated in a single scan of each
+                                    string and cached together, and a score
+                                    is returned per size.
                                     Defaults to class attribute
                                     __DEFAULT_NGRAM_SIZE.
 
         Returns:
-            number
+            number|tuple
             A number reflecting the result of the comparison (float for
-            Scoring.PERCENTAGE, int for Scoring.MATCHES).
+            Scoring.PERCENTAGE, int for Scoring.MATCHES), or a tuple of them,
+            one per scoring method, if arg_scoring_method is a tuple. If
+            arg_ngram_size is a tuple, a tuple of those, one per ngram size.
 
             Example (Scoring.PERCENTAGE):
             50.0
 
             Example (Scoring.MATCHES):
             3
+
+            Example (Scoring.PERCENTAGE, arg_ngram_size (1, 2, 3)):
+            (57.14285714285714, 50.0, 40.0)
         """
 
         reference_ngrams = cls.__generate_ngrams(
@@ -177,7 +952,8 @@ class CharNgram(object):
 
         input_ngrams = cls.__generate_ngrams(
             arg_input_string,
-            arg_ngram_size
+            arg_ngram_size,
+            CharNgramCache.Role.QUERY
         )
 
         score = cls.__compare_ngrams(
@@ -186,6 +962,9 @@ class CharNgram(object):
             arg_scoring_method
         )
 
+        if cls.__metrics is not None:
+            cls.__metrics.increment("comparisons")
+
         return score
 
     # --------------------------------------------------------------------------
@@ -197,7 +976,8 @@ class CharNgram(object):
         arg_scoring_method=Scoring.PERCENTAGE,
         arg_ngram_size=__DEFAULT_NGRAM_SIZE,
         arg_return_type=ReturnBy.STRING,
-        arg_return_scores=ReturnScope.TOP
+        arg_return_scores=ReturnScope.TOP,
+        arg_min_score=None
     ):
         """Compares a string against a list of strings.
 
@@ -207,23 +987,36 @@ class CharNgram(object):
         compare_string().
 
         Args:
-            arg_reference_list:     list
+            arg_reference_list:     list|compiled reference list
                                     The list of reference strings to compare
-                                    against.
+                                    against, or a compiled form of such a list:
+                                    a CharNgramReferenceSet, CharNgramIndex,
+                                    CharNgramMappedIndex, CharNgramMatrix,
+                                    CharNgramMinHashIndex,
+                                    CharNgramSimHashIndex or
+                                    CharNgramShardPool.
 
             arg_input_string:       str
                                     The input string to be compared.
 
-            arg_scoring_method:     int (optional)
-                                    Desired scoring method. Valid values are
-                                    Scoring.PERCENTAGE (percentage match) and
-                                    Scoring.MATCHES (number of matches).
+            arg_scoring_method:     int|tuple (optional)
+                                    Desired scoring method, or a tuple of them.
+                                    See compare_string(). Tuples of scores
+                                    rank by the first method, then the next
+                                    and so on. A tuple cannot be combined with
+                                    arg_min_score.
                                     Defaults to class attribute
                                     Scoring.PERCENTAGE.
 
-            arg_ngram_size:         int (optional)
+            arg_ngram_size:         int|tuple (optional)
                                     The ngram size to use. The minimum valid
-                                    value is 1.
+                                    value is 1. Ignored if arg_reference_list
+                                    is not a list, in which case its own ngram
+                                    size is used. A tuple of ngram sizes scores
+                                    every size at once, see compare_string(),
+                                    and ranks the tuples of scores by the first
+                                    size, then the next and so on. It cannot be
+                                    combined with arg_min_score.
                                     Defaults to class attribute
                                     __DEFAULT_NGRAM_SIZE.
 
@@ -243,6 +1036,17 @@ class CharNgram(object):
                                     Defaults to class attribute
                                     ReturnScope.TOP.
 
+            arg_min_score:          number|None (optional)
+                                    The minimum score a reference string must
+                                    reach to be included. Reference strings
+                                    which cannot reach it, judging by their
+                                    ngram totals alone or by the ngrams left to
+                                    compare, are skipped without being fully
+                                    scored. Applied before arg_return_scores,
+                                    so ReturnScope.TOP may return an empty
+                                    list. None includes all scores.
+                                    Defaults to None.
+
         Returns:
             list
             A list of tuples containing a reference string (or its index) and
@@ -275,76 +1079,497 @@ class CharNgram(object):
             ]
 
         Raises:
-            CharNgramException: if arg_reference_list is not populated or if
-            return type is invalid.
+            CharNgramException: if arg_reference_list is not populated, if
+            return type is invalid, if arg_min_score is not a number or if it
+            is given together with a tuple of ngram sizes or scoring methods.
+        """
+
+        if arg_return_type not in (cls.ReturnBy.STRING, cls.ReturnBy.INDEX):
+            raise CharNgramException("arg_return_type is invalid")
+
+        cls.__check_min_score(arg_min_score, arg_scoring_method)
+
+        if arg_return_scores == cls.ReturnScope.TOP:
+            min_results = 1
+        else:
+            min_results = None
+
+        metrics = cls.__metrics
+
+        if metrics is not None:
+            start = time.perf_counter()
+
+        scores = dict(
+            cls.__iter_scores(
+                arg_reference_list,
+                arg_input_string,
+                arg_scoring_method,
+                arg_ngram_size,
+                arg_return_type,
+                min_results,
+                arg_return_scores == cls.ReturnScope.TOP,
+                arg_min_score
+            )
+        )
+
+        if metrics is not None:
+            metrics.record_time("scoring", time.perf_counter() - start)
+            metrics.increment("queries")
+            metrics.increment("comparisons", len(scores))
+
+        return cls.__rank_scores(scores, arg_return_type, arg_return_scores)
+
+    # --------------------------------------------------------------------------
+    @classmethod
+    def compare_list_topk(
+        cls,
+        arg_reference_list,
+        arg_input_string,
+        arg_k,
+        arg_scoring_method=Scoring.PERCENTAGE,
+        arg_ngram_size=__DEFAULT_NGRAM_SIZE,
+        arg_return_type=ReturnBy.STRING,
+        arg_min_score=None
+    ):
+        """Compares a string against a list of strings and returns the k best.
+
+        Returns the same tuples as compare_list() with ReturnScope.ALL would,
+        truncated to the first arg_k. The full list of scores is never
+        materialised or sorted; a heap of at most arg_k tuples is kept while
+        scoring instead.
+
+        Args:
+            arg_reference_list:     list|compiled reference list
+                                    The list of reference strings to compare
+                                    against, or a compiled form of such a list:
+                                    a CharNgramReferenceSet, CharNgramIndex,
+                                    CharNgramMappedIndex, CharNgramMatrix,
+                                    CharNgramMinHashIndex,
+                                    CharNgramSimHashIndex or
+                                    CharNgramShardPool.
+
+            arg_input_string:       str
+                                    The input string to be compared.
+
+            arg_k:                  int
+                                    The maximum number of tuples to return.
+                                    The minimum valid value is 1.
+
+            arg_scoring_method:     int (optional)
+                                    Desired scoring method. See
+                                    compare_list().
+
+            arg_ngram_size:         int (optional)
+                                    The ngram size to use. See compare_list().
+
+            arg_return_type:        int (optional)
+                                    Desired return type. See compare_list().
+
+            arg_min_score:          number|None (optional)
+                                    The minimum score a reference string must
+                                    reach to be included. See compare_list().
+
+        Returns:
+            list
+            A list of at most arg_k tuples containing a reference string (or
+            its index) and its corresponding score, sorted like the return of
+            compare_list().
+
+            Example (arg_k 2, ReturnBy.STRING, Scoring.PERCENTAGE):
+            [
+                ("Fluorine", 28.57142857142857),
+                ("Boron", 25.0)
+            ]
+
+        Raises:
+            CharNgramException: if arg_reference_list is not populated, if
+                                arg_k is invalid, if return type is invalid or
+                                if arg_min_score is not a number.
+        """
+
+        try:
+            if arg_k < 1:
+                raise CharNgramException("arg_k must be at least 1")
+        except TypeError:
+            raise CharNgramException("arg_k must be type int")
+
+        if arg_return_type not in (cls.ReturnBy.STRING, cls.ReturnBy.INDEX):
+            raise CharNgramException("arg_return_type is invalid")
+
+        cls.__check_min_score(arg_min_score, arg_scoring_method)
+
+        metrics = cls.__metrics
+
+        scores = cls.__iter_scores(
+            arg_reference_list,
+            arg_input_string,
+            arg_scoring_method,
+            arg_ngram_size,
+            arg_return_type,
+            arg_k,
+            arg_min_score=arg_min_score
+        )
+
+        if metrics is not None:
+            start = time.perf_counter()
+            scores = cls.__count_comparisons(scores)
+
+        scores = cls.__select_topk(scores, arg_k, arg_return_type)
+
+        if metrics is not None:
+            metrics.record_time("scoring", time.perf_counter() - start)
+            metrics.increment("queries")
+
+        return scores
+
+    # --------------------------------------------------------------------------
+    @classmethod
+    def iter_compare(
+        cls,
+        arg_reference_iterable,
+        arg_input_string,
+        arg_scoring_method=Scoring.PERCENTAGE,
+        arg_ngram_size=__DEFAULT_NGRAM_SIZE,
+        arg_return_type=ReturnBy.STRING,
+        arg_min_score=None
+    ):
+        """Compares a string against a stream of strings, lazily.
+
+        A generator scoring the input string against each reference string as
+        it is drawn from arg_reference_iterable, e.g. the lines of a file or
+        the rows of a database cursor, and generating a tuple per reference
+        string right away. Only one reference string is held at a time, so
+        memory use does not grow with the number of reference strings; for the
+        same reason repeated reference strings are not merged in case of
+        ReturnBy.STRING. Reference ngrams are cached like those of input
+        strings, so that a long stream of one-off strings does not flush the
+        cache.
+
+        Args:
+            arg_reference_iterable: iterable
+                                    The reference strings to compare against.
+                                    Consumed once.
+
+            arg_input_string:       str
+                                    The input string to be compared.
+
+            arg_scoring_method:     int (optional)
+                                    Desired scoring method. See
+                                    compare_list().
+
+            arg_ngram_size:         int (optional)
+                                    The ngram size to use. See compare_list().
+
+            arg_return_type:        int (optional)
+                                    Desired return type. See compare_list().
+                                    Indexes count the reference strings drawn
+                                    from arg_reference_iterable, from 0.
+
+            arg_min_score:          number|None (optional)
+                                    The minimum score a reference string must
+                                    reach to be generated. See compare_list().
+
+        Yields:
+            tuple
+            A reference string (or its index) and its corresponding score, in
+            reference order.
+
+            Example (ReturnBy.STRING, Scoring.PERCENTAGE):
+            ("file.txt", 30.0)
+
+        Raises:
+            CharNgramException: if return type is invalid, if arg_min_score is
+                                not a number or if any reference string is not
+                                type str. Raised when the first tuple is
+                                requested.
         """
 
+        if arg_return_type not in (cls.ReturnBy.STRING, cls.ReturnBy.INDEX):
+            raise CharNgramException("arg_return_type is invalid")
+
+        cls.__check_min_score(arg_min_score, arg_scoring_method)
+
         input_ngrams = cls.__generate_ngrams(
             arg_input_string,
-            arg_ngram_size
+            arg_ngram_size,
+            CharNgramCache.Role.QUERY
         )
 
-        scores = {}
+        input_total = cls.__get_input_total(
+            input_ngrams,
+            arg_scoring_method,
+            arg_min_score
+        )
 
-        if arg_reference_list:
-            if arg_return_type == cls.ReturnBy.STRING:
-                for reference_string in arg_reference_list:
-                    reference_ngrams = cls.__generate_ngrams(
-                        reference_string,
-                        arg_ngram_size
-                    )
+        if cls.__metrics is not None:
+            cls.__metrics.increment("queries")
 
-                    scores[reference_string] = cls.__compare_ngrams(
-                        reference_ngrams,
-                        input_ngrams,
-                        arg_scoring_method
-                    )
+        for index, reference_string in enumerate(arg_reference_iterable):
+            reference_ngrams = cls.__generate_ngrams(
+                reference_string,
+                arg_ngram_size,
+                CharNgramCache.Role.QUERY
+            )
 
-                    sorted_scores = sorted(
-                        scores.items(),
-                        key=lambda x: (
-                            x[cls.SCORE],
-                            -len(x[cls.MATCH]),
-                            x[cls.MATCH]
-                        ),
-                        reverse=True
-                    )
-            elif arg_return_type == cls.ReturnBy.INDEX:
-                for index, reference_string in enumerate(arg_reference_list):
-                    reference_ngrams = cls.__generate_ngrams(
-                        reference_string,
-                        arg_ngram_size
-                    )
+            score = cls.__compare_ngrams(
+                reference_ngrams,
+                input_ngrams,
+                arg_scoring_method,
+                arg_min_score,
+                input_total
+            )
 
-                    scores[index] = cls.__compare_ngrams(
-                        reference_ngrams,
-                        input_ngrams,
-                        arg_scoring_method
-                    )
+            if score is None:
+                continue
 
-                    sorted_scores = sorted(
-                        scores.items(),
-                        key=lambda x: (
-                            x[cls.SCORE]
-                        ),
-                        reverse=True
-                    )
+            if cls.__metrics is not None:
+                cls.__metrics.increment("comparisons")
+
+            if arg_return_type == cls.ReturnBy.STRING:
+                yield reference_string, score
             else:
-                raise CharNgramException("arg_return_type is invalid")
+                yield index, score
 
-            if arg_return_scores == cls.ReturnScope.TOP:
-                final_scores = [
-                    score for score in sorted_scores if (
-                        score[cls.SCORE]
-                        >= sorted_scores[0][cls.SCORE] 
-                    )
+    # --------------------------------------------------------------------------
+    @classmethod
+    def compare_iterable_topk(
+        cls,
+        arg_reference_iterable,
+        arg_input_string,
+        arg_k,
+        arg_scoring_method=Scoring.PERCENTAGE,
+        arg_ngram_size=__DEFAULT_NGRAM_SIZE,
+        arg_return_type=ReturnBy.STRING,
+        arg_min_score=None
+    ):
+        """Compares a string against a stream of strings and returns the k
+        best.
+
+        Consumes iter_compare() while keeping a running heap of at most arg_k
+        tuples, so memory use is bounded by arg_k rather than by the number of
+        reference strings. Returns the same tuples as compare_list_topk()
+        would for a list of the same reference strings, repeated reference
+        strings included.
+
+        Args:
+            arg_reference_iterable: iterable
+                                    The reference strings to compare against.
+                                    See iter_compare().
+
+            arg_input_string:       str
+                                    The input string to be compared.
+
+            arg_k:                  int
+                                    The maximum number of tuples to return.
+                                    The minimum valid value is 1.
+
+            arg_scoring_method:     int (optional)
+                                    Desired scoring method. See
+                                    compare_list().
+
+            arg_ngram_size:         int (optional)
+                                    The ngram size to use. See compare_list().
+
+            arg_return_type:        int (optional)
+                                    Desired return type. See iter_compare().
+
+            arg_min_score:          number|None (optional)
+                                    The minimum score a reference string must
+                                    reach to be included. See compare_list().
+
+        Returns:
+            list
+            A list of at most arg_k tuples containing a reference string (or
+            its index) and its corresponding score, sorted like the return of
+            compare_list().
+
+        Raises:
+            CharNgramException: if arg_k is invalid, or as raised by
+                                iter_compare().
+        """
+
+        try:
+            if arg_k < 1:
+                raise CharNgramException("arg_k must be at least 1")
+        except TypeError:
+            raise CharNgramException("arg_k must be type int")
+
+        return cls.__select_topk(
+            cls.iter_compare(
+                arg_reference_iterable,
+                arg_input_string,
+                arg_scoring_method,
+                arg_ngram_size,
+                arg_return_type,
+                arg_min_score
+            ),
+            arg_k,
+            arg_return_type
+        )
+
+    # --------------------------------------------------------------------------
+    @classmethod
+    def compare_many(
+        cls,
+        arg_reference_list,
+        arg_input_list,
+        arg_scoring_method=Scoring.PERCENTAGE,
+        arg_ngram_size=__DEFAULT_NGRAM_SIZE,
+        arg_k=None
+    ):
+        """Compares many strings against a list of strings.
+
+        Compares every input string against every reference string. The
+        reference strings are indexed once for the whole batch, and repeated
+        input strings are only scored once. Returns either a dense matrix with
+        the score of every input string against every reference string, or,
+        given arg_k, the indexes and scores of the best arg_k reference strings
+        for every input string.
+
+        Args:
+            arg_reference_list:     list|compiled reference list
+                                    The list of reference strings to compare
+                                    against, or a compiled form of such a list.
+                                    See compare_list().
+
+            arg_input_list:         list
+                                    The list of input strings to be compared.
+
+            arg_scoring_method:     int (optional)
+                                    Desired scoring method. See
+                                    compare_list().
+
+            arg_ngram_size:         int (optional)
+                                    The ngram size to use. See compare_list().
+
+            arg_k:                  int|None (optional)
+                                    The number of best matches to return per
+                                    input string. None returns the dense matrix
+                                    of all scores instead.
+                                    Defaults to None.
+
+        Returns:
+            CharNgram.BatchScores
+            A namedtuple of two lists with one row per input string, in input
+            order. Rows of repeated input strings are the same list object.
+
+            Without arg_k, indexes is None and each row of scores holds the
+            score of every reference string, in reference order.
+
+            With arg_k, each row of indexes holds the indexes of the best
+            arg_k reference strings and each row of scores their scores,
+            ranked like compare_list_topk() with ReturnBy.INDEX.
+
+            Example (arg_k None, Scoring.MATCHES):
+            BatchScores(
+                indexes=None,
+                scores=[
+                    [0, 2],
+                    [3, 0]
                 ]
-            else:
-                final_scores = sorted_scores
+            )
+
+            Example (arg_k 1, Scoring.MATCHES):
+            BatchScores(
+                indexes=[
+                    [1],
+                    [0]
+                ],
+                scores=[
+                    [2],
+                    [3]
+                ]
+            )
+
+        Raises:
+            CharNgramException: if arg_reference_list or arg_input_list is not
+                                populated, if arg_k is invalid, or if arg_k is
+                                None and arg_reference_list is a
+                                CharNgramIndex whose reference ids are not 0
+                                to len - 1.
+        """
+
+        if not arg_input_list:
+            raise CharNgramException("arg_input_list is not populated")
 
-            return final_scores
+        if isinstance(
+            arg_reference_list,
+            (
+                CharNgramReferenceSet,
+                CharNgramIndex,
+                CharNgramMappedIndex,
+                CharNgramMatrix,
+                CharNgramMinHashIndex,
+                CharNgramSimHashIndex,
+                CharNgramShardPool
+            )
+        ):
+            reference_list = arg_reference_list
         else:
-            raise CharNgramException("arg_reference_list is not populated")
+            reference_list = cls.build_index(
+                arg_reference_list,
+                arg_ngram_size
+            )
+
+        if arg_k is None and isinstance(reference_list, CharNgramIndex):
+            reference_ids = reference_list.get_reference_ids()
+
+            if reference_ids and reference_ids[-1] != len(reference_ids) - 1:
+                raise CharNgramException(
+                    "arg_reference_list must have reference ids 0 to len - 1 "
+                    + "unless arg_k is given"
+                )
+
+        rows = {}
+        indexes = []
+        scores = []
+
+        for input_string in arg_input_list:
+            if input_string not in rows:
+                if arg_k is None:
+                    index_row = None
+                    score_row = [0] * len(reference_list)
+
+                    scores_of_row = cls.__iter_scores(
+                        reference_list,
+                        input_string,
+                        arg_scoring_method,
+                        arg_ngram_size,
+                        cls.ReturnBy.INDEX
+                    )
+
+                    if cls.__metrics is not None:
+                        cls.__metrics.increment("queries")
+                        scores_of_row = cls.__count_comparisons(scores_of_row)
+
+                    for index, score in scores_of_row:
+                        score_row[index] = score
+                else:
+                    top_scores = cls.compare_list_topk(
+                        reference_list,
+                        input_string,
+                        arg_k,
+                        arg_scoring_method,
+                        arg_ngram_size,
+                        cls.ReturnBy.INDEX
+                    )
+
+                    index_row = [score[cls.MATCH] for score in top_scores]
+                    score_row = [score[cls.SCORE] for score in top_scores]
+
+                rows[input_string] = (index_row, score_row)
+
+            index_row, score_row = rows[input_string]
+
+            if arg_k is not None:
+                indexes.append(index_row)
+
+            scores.append(score_row)
+
+        if arg_k is None:
+            indexes = None
+
+        return cls.BatchScores(indexes, scores)
 
     # --------------------------------------------------------------------------
     @classmethod
@@ -361,17 +1586,22 @@ class CharNgram(object):
         the best match.
 
         Args:
-            arg_reference_list:     list
+            arg_reference_list:     list|compiled reference list
                                     The list of reference strings to compare
-                                    against.
+                                    against, or a compiled form of such a list:
+                                    a CharNgramReferenceSet, CharNgramIndex,
+                                    CharNgramMappedIndex, CharNgramMatrix,
+                                    CharNgramMinHashIndex,
+                                    CharNgramSimHashIndex or
+                                    CharNgramShardPool.
 
             arg_input_string:       str
                                     The input string to be compared.
 
             arg_scoring_method:     int (optional)
                                     Desired scoring method. Valid values are
-                                    Scoring.PERCENTAGE (percentage match) and
-                                    Scoring.MATCHES (number of matches).
+                                    the members of Scoring, see
+                                    compare_string().
                                     Defaults to class attribute
                                     Scoring.PERCENTAGE.
 
@@ -390,16 +1620,16 @@ class CharNgram(object):
             "file.txt"
         """
 
-        scores = cls.compare_list(
+        scores = cls.compare_list_topk(
             arg_reference_list,
             arg_input_string,
+            1,
             arg_scoring_method,
             arg_ngram_size,
-            cls.ReturnBy.STRING,
-            cls.ReturnScope.ALL
+            cls.ReturnBy.STRING
         )
 
-        if scores[0][cls.SCORE] > 0:
+        if cls.__is_match(scores[0][cls.SCORE]):
             best_match = scores[0][cls.MATCH]
         else:
             best_match = None
@@ -422,17 +1652,22 @@ class CharNgram(object):
         the original list index of the best match.
 
         Args:
-            arg_reference_list:     list
+            arg_reference_list:     list|compiled reference list
                                     The list of reference strings to compare
-                                    against.
+                                    against, or a compiled form of such a list:
+                                    a CharNgramReferenceSet, CharNgramIndex,
+                                    CharNgramMappedIndex, CharNgramMatrix,
+                                    CharNgramMinHashIndex,
+                                    CharNgramSimHashIndex or
+                                    CharNgramShardPool.
 
             arg_input_string:       str
                                     The input string to be compared.
 
             arg_scoring_method:     int (optional)
                                     Desired scoring method. Valid values are
-                                    Scoring.PERCENTAGE (percentage match) and
-                                    Scoring.MATCHES (number of matches).
+                                    the members of Scoring, see
+                                    compare_string().
                                     Defaults to class attribute
                                     Scoring.PERCENTAGE.
 
@@ -452,16 +1687,16 @@ class CharNgram(object):
             1
         """
 
-        scores = cls.compare_list(
+        scores = cls.compare_list_topk(
             arg_reference_list,
             arg_input_string,
+            1,
             arg_scoring_method,
             arg_ngram_size,
-            cls.ReturnBy.INDEX,
-            cls.ReturnScope.ALL
+            cls.ReturnBy.INDEX
         )
 
-        if scores[0][cls.SCORE] > 0:
+        if cls.__is_match(scores[0][cls.SCORE]):
             best_match_index = scores[0][cls.MATCH]
         else:
             best_match_index = None
@@ -470,102 +1705,222 @@ class CharNgram(object):
 
     # --------------------------------------------------------------------------
     @classmethod
-    def __compare_ngrams(
+    async def compare_string_async(
         cls,
-        arg_reference_ngrams,
-        arg_input_ngrams,
-        arg_scoring_method=Scoring.PERCENTAGE
+        arg_reference_string,
+        arg_input_string,
+        arg_scoring_method=Scoring.PERCENTAGE,
+        arg_ngram_size=__DEFAULT_NGRAM_SIZE
     ):
-        """Compares two dicts of ngrams.
+        """Compares two strings from a coroutine.
 
-        Compares an input dict of ngrams against a reference dict and returns
-        the result either as a percentage match or as an absolute number of
-        matches. For instance, "test" is calculated as a 50.0% match against
-        "testing", and scores a 3 in terms of number of matches given an ngram
-        size of 2.
+        Yields to the event loop once and then returns the same score as
+        compare_string(). A single comparison is short enough to be computed
+        in one step without delaying other tasks noticeably.
 
         Args:
-            arg_reference_ngrams:   dict
-                                    The reference string to compare against.
-
-            arg_input_ngrams:       dict
-                                    The input string to be compared.
-
-            arg_scoring_method:     int (optional)
-                                    Desired scoring method. Valid values are
-                                    Scoring.PERCENTAGE (percentage match) and
-                                    Scoring.MATCHES (number of matches).
-                                    Defaults to class attribute
-                                    Scoring.PERCENTAGE.
+            See compare_string().
 
         Returns:
             number
-            A number reflecting the result of the comparison (float for
-            Scoring.PERCENTAGE, int for Scoring.MATCHES).
-
-            Example (Scoring.PERCENTAGE):
-            50.0
-
-            Example (Scoring.MATCHES):
-            3
-
-        Raises:
-            CharNgramException: if arg_reference_ngrams is not populated, if
-                                arg_input_ngrams is not populated, or if
-                                scoring method is invalid.
+            See compare_string().
         """
 
-        try:
-            max_matches = sum(arg_reference_ngrams.values())
-        except AttributeError:
-            raise CharNgramException("arg_reference_ngrams is not populated")
+        await asyncio.sleep(0)
 
-        matches = 0
+        return cls.compare_string(
+            arg_reference_string,
+            arg_input_string,
+            arg_scoring_method,
+            arg_ngram_size
+        )
 
-        if max_matches > 0:
-            for ngram in arg_reference_ngrams:
-                try:
-                    if ngram in arg_input_ngrams:
-                        max_ngram_score = arg_input_ngrams[ngram]
-                        if max_ngram_score > arg_reference_ngrams[ngram]:
-                            max_ngram_score = arg_reference_ngrams[ngram]
+    # --------------------------------------------------------------------------
+    @classmethod
+    async def compare_list_async(
+        cls,
+        arg_reference_list,
+        arg_input_string,
+        arg_scoring_method=Scoring.PERCENTAGE,
+        arg_ngram_size=__DEFAULT_NGRAM_SIZE,
+        arg_return_type=ReturnBy.STRING,
+        arg_return_scores=ReturnScope.TOP,
+        arg_min_score=None,
+        arg_chunk_size=__DEFAULT_CHUNK_SIZE
+    ):
+        """Compares a string against a list of strings from a coroutine.
 
-                        delta = arg_reference_ngrams[ngram] - max_ngram_score
-                        matches += arg_reference_ngrams[ngram] - delta
-                except TypeError:
-                    raise CharNgramException(
-                        "arg_input_ngrams is not populated"
-                    )
+        Returns the same tuples as compare_list(), but scores the reference
+        strings in chunks of arg_chunk_size and yields to the event loop after
+        each chunk, so that other tasks keep running while a long list is
+        scored. Cancelling the task stops the scoring at the next chunk
+        boundary. A CharNgramShardPool is waited on in the event loop's
+        default executor instead, while its processes do the scoring.
 
-            if arg_scoring_method == cls.Scoring.PERCENTAGE:
-                percentage_match = (matches / max_matches) * 100
+        Args:
+            arg_reference_list:     list|compiled reference list
+                                    The list of reference strings to compare
+                                    against, or a compiled form of such a list.
+                                    See compare_list().
 
-                return percentage_match
-            elif arg_scoring_method == cls.Scoring.MATCHES:
-                return matches
-            else:
-                raise CharNgramException("arg_scoring_method is invalid")
+            arg_input_string:       str
+                                    The input string to be compared.
 
-        return 0
+            arg_scoring_method:     int (optional)
+                                    Desired scoring method. See
+                                    compare_list().
+
+            arg_ngram_size:         int (optional)
+                                    The ngram size to use. See compare_list().
+
+            arg_return_type:        int (optional)
+                                    Desired return type. See compare_list().
+
+            arg_return_scores:      int (optional)
+                                    Desired scores to include. See
+                                    compare_list().
+
+            arg_min_score:          number|None (optional)
+                                    The minimum score a reference string must
+                                    reach to be included. See compare_list().
+
+            arg_chunk_size:         int (optional)
+                                    The number of reference strings to score
+                                    between yields to the event loop. The
+                                    minimum valid value is 1.
+                                    Defaults to class attribute
+                                    __DEFAULT_CHUNK_SIZE.
+
+        Returns:
+            list
+            See compare_list().
+
+        Raises:
+            CharNgramException: as raised by compare_list(), or if
+                                arg_chunk_size is invalid.
+            asyncio.CancelledError: if the task is cancelled.
+        """
+
+        if arg_return_type not in (cls.ReturnBy.STRING, cls.ReturnBy.INDEX):
+            raise CharNgramException("arg_return_type is invalid")
+
+        cls.__check_min_score(arg_min_score, arg_scoring_method)
+
+        if arg_return_scores == cls.ReturnScope.TOP:
+            min_results = 1
+        else:
+            min_results = None
+
+        scores = {}
+
+        async for match, score in cls.__iter_scores_async(
+            arg_reference_list,
+            arg_input_string,
+            arg_scoring_method,
+            arg_ngram_size,
+            arg_return_type,
+            min_results,
+            arg_return_scores == cls.ReturnScope.TOP,
+            arg_min_score,
+            arg_chunk_size
+        ):
+            scores[match] = score
+
+        if cls.__metrics is not None:
+            cls.__metrics.increment("queries")
+            cls.__metrics.increment("comparisons", len(scores))
+
+        return cls.__rank_scores(scores, arg_return_type, arg_return_scores)
 
     # --------------------------------------------------------------------------
     @classmethod
-    def __generate_ngrams(
+    async def get_best_list_match_async(
         cls,
-        arg_string,
+        arg_reference_list,
+        arg_input_string,
+        arg_scoring_method=Scoring.PERCENTAGE,
+        arg_ngram_size=__DEFAULT_NGRAM_SIZE,
+        arg_chunk_size=__DEFAULT_CHUNK_SIZE
+    ):
+        """Returns the #1 match of a string in a list of strings from a
+        coroutine.
+
+        Returns the same match as get_best_list_match(), scoring the reference
+        strings in chunks like compare_list_async().
+
+        Args:
+            arg_reference_list:     list|compiled reference list
+                                    The list of reference strings to compare
+                                    against, or a compiled form of such a list.
+                                    See compare_list().
+
+            arg_input_string:       str
+                                    The input string to be compared.
+
+            arg_scoring_method:     int (optional)
+                                    Desired scoring method. See
+                                    compare_list().
+
+            arg_ngram_size:         int (optional)
+                                    The ngram size to use. See compare_list().
+
+            arg_chunk_size:         int (optional)
+                                    The number of reference strings to score
+                                    between yields to the event loop. See
+                                    compare_list_async().
+
+        Returns:
+            str|None
+            See get_best_list_match().
+
+        Raises:
+            CharNgramException: if arg_reference_list is not populated or if
+                                arg_chunk_size is invalid.
+            asyncio.CancelledError: if the task is cancelled.
+        """
+
+        sort_key = cls.__get_sort_key(cls.ReturnBy.STRING)
+
+        best_score = None
+
+        async for score in cls.__iter_scores_async(
+            arg_reference_list,
+            arg_input_string,
+            arg_scoring_method,
+            arg_ngram_size,
+            cls.ReturnBy.STRING,
+            1,
+            arg_chunk_size=arg_chunk_size
+        ):
+            if best_score is None or sort_key(score) > sort_key(best_score):
+                best_score = score
+
+        if cls.__is_match(best_score[cls.SCORE]):
+            best_match = best_score[cls.MATCH]
+        else:
+            best_match = None
+
+        return best_match
+
+    # --------------------------------------------------------------------------
+    @classmethod
+    def compile(
+        cls,
+        arg_reference_list,
         arg_ngram_size=__DEFAULT_NGRAM_SIZE
     ):
-        """Generates a dict of lowercase ngrams from a string.
+        """Compiles a list of strings into a frozen reference set.
 
-        Creates a dict of ngrams where each ngram is the key and the value
-        reflects how many instances of that ngram were found in the string.
-        A class dict attribute is used to cache previously generated ngrams;
-        if the ngrams for the string already exist in the cache, they are
-        simply fetched from there. Forces ngrams to lowercase.
+        Profiles every reference string once, see build_profile(), and freezes
+        the profiles together with the strings and their ngram totals. The
+        returned reference set can be passed to every method accepting a
+        reference list, in which case no ngrams are looked up, cached or
+        generated for the reference strings. Compiling bypasses the ngram
+        cache, so that it is not flooded with the reference strings.
 
         Args:
-            arg_string:             str
-                                    The string to generate ngrams from.
+            arg_reference_list:     list
+                                    The list of reference strings to compile.
 
             arg_ngram_size:         int (optional)
                                     The ngram size to use. The minimum valid
@@ -574,65 +1929,5009 @@ class CharNgram(object):
                                     __DEFAULT_NGRAM_SIZE.
 
         Returns:
-            dict
-            A dict containing the ngrams generated from the string.
+            CharNgramReferenceSet
+            The compiled reference strings.
 
-            Example:
-            {
-                "te": 1,
-                "es": 1,
-                "st": 1
-            }
+        Raises:
+            CharNgramException: if arg_reference_list is not populated or if
+                                any reference string is not type str.
+        """
+
+        if not arg_reference_list:
+            raise CharNgramException("arg_reference_list is not populated")
+
+        cls.__check_ngram_size(arg_ngram_size)
+
+        reference_list = list(arg_reference_list)
+
+        return CharNgramReferenceSet(
+            arg_ngram_size,
+            reference_list,
+            [
+                CharNgramProfile(
+                    cls.__count_string_ngrams(
+                        reference_string,
+                        arg_ngram_size
+                    )
+                )
+                for reference_string in reference_list
+            ],
+            cls._ENGINE_ID
+        )
+
+    # --------------------------------------------------------------------------
+    @classmethod
+    def build_index(
+        cls,
+        arg_reference_list,
+        arg_ngram_size=__DEFAULT_NGRAM_SIZE
+    ):
+        """Builds an inverted ngram index from a list of strings.
+
+        Generates the ngrams of every reference string once and stores them as
+        posting lists, mapping each ngram to the reference strings it occurs in.
+        The returned index can be passed to compare_list(),
+        get_best_list_match() and get_best_list_match_index() in place of the
+        reference list, in which case only reference strings sharing at least
+        one ngram with the input string are scored.
+
+        Args:
+            arg_reference_list:     list
+                                    The list of reference strings to index.
+
+            arg_ngram_size:         int (optional)
+                                    The ngram size to use. The minimum valid
+                                    value is 1.
+                                    Defaults to class attribute
+                                    __DEFAULT_NGRAM_SIZE.
+
+        Returns:
+            CharNgramIndex
+            An index of the reference strings.
 
         Raises:
-            CharNgramException: if either arg type is invalid.
+            CharNgramException: if arg_reference_list is not populated.
         """
 
-        if (
-            arg_ngram_size in cls.__cache
-            and arg_string in cls.__cache[arg_ngram_size]
-        ):
+        if not arg_reference_list:
+            raise CharNgramException("arg_reference_list is not populated")
 
-            return cls.__cache[arg_ngram_size][arg_string]
+        cls.__check_ngram_size(arg_ngram_size)
 
-        try:
-            string = arg_string.lower()
-        except AttributeError:
-            raise CharNgramException("arg_string must be type str")
+        index = CharNgramIndex(arg_ngram_size, cls._ENGINE_ID)
 
-        try:
-            if arg_ngram_size < cls.__MIN_NGRAM_SIZE:
-                ngram_size = cls.__MIN_NGRAM_SIZE
-            else:
-                ngram_size = arg_ngram_size
-        except TypeError:
-            raise CharNgramException("arg_ngram_size must be type int")
+        for reference_string in arg_reference_list:
+            index.append(
+                reference_string,
+                cls.__count_string_ngrams(reference_string, arg_ngram_size)
+            )
 
-        string_length = len(string)
-        last_ngram_offset = string_length - (ngram_size - 1)
+        return index
 
-        ngrams = {}
+    # --------------------------------------------------------------------------
+    @classmethod
+    def add_reference(
+        cls,
+        arg_index,
+        arg_reference_id,
+        arg_reference_string
+    ):
+        """Adds a reference string to an index.
 
-        if string_length >= ngram_size:
-            for i in range(0, last_ngram_offset):
-                ngram = string[i:i + ngram_size]
+        Generates the ngrams of the reference string and appends them to the
+        posting lists of the index, in time proportional to their number. The
+        index is not rebuilt; queries against it return the same results as
+        against an index built from scratch, see CharNgramIndex.
 
-                if ngram in ngrams:
-                    ngrams[ngram] += 1
-                else:
-                    ngrams[ngram] = 1
-        elif string_length > 0:
-            ngrams[string] = 1
+        Args:
+            arg_index:              CharNgramIndex
+                                    The index to add the reference string to,
+                                    e.g. one returned by build_index().
 
-        if arg_ngram_size not in cls.__cache:
-            cls.__cache[arg_ngram_size] = {}
+            arg_reference_id:       int
+                                    The reference id of the reference string,
+                                    from 0 to 2**32 - 1, not yet in the index.
+                                    ReturnBy.INDEX returns it in place of a
+                                    position in a list.
 
-        cls.__cache[arg_ngram_size][arg_string] = ngrams
+            arg_reference_string:   str
+                                    The reference string to add.
 
-        return ngrams
+        Raises:
+            CharNgramException: if arg_index is not a CharNgramIndex built by
+                                cls, or if arg_reference_id is invalid or
+                                already in the index.
+        """
 
-# ------------------------------------------------------------------------------
-class CharNgramException(Exception):
-    """Exception."""
-    pass
+        cls.__check_index(arg_index)
+
+        arg_index.add(
+            arg_reference_id,
+            arg_reference_string,
+            cls.__count_string_ngrams(
+                arg_reference_string,
+                arg_index.ngram_size
+            )
+        )
+
+    # --------------------------------------------------------------------------
+    @classmethod
+    def remove_reference(cls, arg_index, arg_reference_id):
+        """Removes a reference string from an index.
+
+        Leaves a tombstone in the index, which is compacted away once
+        tombstones outnumber the reference strings. See
+        CharNgramIndex.remove().
+
+        Args:
+            arg_index:              CharNgramIndex
+                                    The index to remove the reference string
+                                    from.
+
+            arg_reference_id:       int
+                                    The reference id of the reference string to
+                                    remove.
+
+        Raises:
+            CharNgramException: if arg_index is not a CharNgramIndex built by
+                                cls or if arg_reference_id is not in the
+                                index.
+        """
+
+        cls.__check_index(arg_index)
+
+        arg_index.remove(arg_reference_id)
+
+    # --------------------------------------------------------------------------
+    @classmethod
+    def update_reference(
+        cls,
+        arg_index,
+        arg_reference_id,
+        arg_reference_string
+    ):
+        """Replaces the reference string of a reference id in an index.
+
+        Equivalent to remove_reference() followed by add_reference(), in time
+        proportional to the number of ngrams of the new reference string.
+
+        Args:
+            arg_index:              CharNgramIndex
+                                    The index holding the reference string.
+
+            arg_reference_id:       int
+                                    The reference id of the reference string to
+                                    replace.
+
+            arg_reference_string:   str
+                                    The new reference string.
+
+        Raises:
+            CharNgramException: if arg_index is not a CharNgramIndex built by
+                                cls or if arg_reference_id is not in the
+                                index.
+        """
+
+        cls.__check_index(arg_index)
+
+        reference_ngrams = cls.__count_string_ngrams(
+            arg_reference_string,
+            arg_index.ngram_size
+        )
+
+        arg_index.remove(arg_reference_id)
+        arg_index.add(arg_reference_id, arg_reference_string, reference_ngrams)
+
+    # --------------------------------------------------------------------------
+    @classmethod
+    def build_matrix(
+        cls,
+        arg_reference_list,
+        arg_ngram_size=__DEFAULT_NGRAM_SIZE
+    ):
+        """Builds a sparse ngram count matrix from a list of strings.
+
+        Generates the ngrams of every reference string once and stores their
+        counts as a compressed sparse row matrix, with one row per reference
+        string and one column per distinct ngram. The returned matrix can be
+        passed to compare_list(), get_best_list_match() and
+        get_best_list_match_index() in place of the reference list, in which
+        case the ngram matches of all reference strings are counted in a
+        handful of vectorized numpy operations. Requires numpy.
+
+        Args:
+            arg_reference_list:     list
+                                    The list of reference strings to encode.
+
+            arg_ngram_size:         int (optional)
+                                    The ngram size to use. The minimum valid
+                                    value is 1.
+                                    Defaults to class attribute
+                                    __DEFAULT_NGRAM_SIZE.
+
+        Returns:
+            CharNgramMatrix
+            A matrix of the reference strings.
+
+        Raises:
+            CharNgramException: if arg_reference_list is not populated or if
+                                numpy is not installed.
+        """
+
+        if not arg_reference_list:
+            raise CharNgramException("arg_reference_list is not populated")
+
+        cls.__check_ngram_size(arg_ngram_size)
+
+        reference_list = list(arg_reference_list)
+
+        return CharNgramMatrix(
+            arg_ngram_size,
+            reference_list,
+            [
+                cls.__count_string_ngrams(reference_string, arg_ngram_size)
+                for reference_string in reference_list
+            ],
+            cls._ENGINE_ID
+        )
+
+    # --------------------------------------------------------------------------
+    @classmethod
+    def build_minhash_index(
+        cls,
+        arg_reference_list,
+        arg_ngram_size=__DEFAULT_NGRAM_SIZE,
+        arg_bands=32,
+        arg_rows=4,
+        arg_seed=0
+    ):
+        """Builds an approximate MinHash index from a list of strings.
+
+        Generates the ngrams of every reference string once and files their
+        MinHash signatures in banded LSH tables. The returned index can be
+        passed to compare_list(), get_best_list_match() and
+        get_best_list_match_index() in place of the reference list, in which
+        case only reference strings sharing an LSH bucket with the input string
+        are scored. Scores are exact, but reference strings of low ngram
+        similarity may be missed. See CharNgramMinHashIndex for the expected
+        recall.
+
+        Args:
+            arg_reference_list:     list
+                                    The list of reference strings to index.
+
+            arg_ngram_size:         int (optional)
+                                    The ngram size to use. The minimum valid
+                                    value is 1.
+                                    Defaults to class attribute
+                                    __DEFAULT_NGRAM_SIZE.
+
+            arg_bands:              int (optional)
+                                    The number of LSH bands. More bands raise
+                                    recall and the number of candidates.
+                                    Defaults to 32.
+
+            arg_rows:               int (optional)
+                                    The number of hash values per band. More
+                                    rows lower recall and the number of
+                                    candidates.
+                                    Defaults to 4.
+
+            arg_seed:               int (optional)
+                                    The seed of the MinHash functions.
+                                    Defaults to 0.
+
+        Returns:
+            CharNgramMinHashIndex
+            An approximate index of the reference strings.
+
+        Raises:
+            CharNgramException: if arg_reference_list is not populated or if
+                                arg_bands or arg_rows is invalid.
+        """
+
+        if not arg_reference_list:
+            raise CharNgramException("arg_reference_list is not populated")
+
+        cls.__check_ngram_size(arg_ngram_size)
+
+        index = CharNgramMinHashIndex(
+            arg_ngram_size,
+            arg_bands,
+            arg_rows,
+            arg_seed,
+            cls._ENGINE_ID
+        )
+
+        for reference_string in arg_reference_list:
+            index.append(
+                reference_string,
+                cls.__count_string_ngrams(reference_string, arg_ngram_size)
+            )
+
+        return index
+
+    # --------------------------------------------------------------------------
+    @classmethod
+    def build_simhash_index(
+        cls,
+        arg_reference_list,
+        arg_ngram_size=__DEFAULT_NGRAM_SIZE,
+        arg_max_distance=3
+    ):
+        """Builds a SimHash index for near-duplicate search from a list.
+
+        Generates the ngrams of every reference string once and files their
+        64-bit SimHash fingerprints in one table per block of bits. The
+        returned index can be passed to compare_list(), get_best_list_match()
+        and get_best_list_match_index() in place of the reference list, in
+        which case only reference strings whose fingerprints differ from that
+        of the input string in at most arg_max_distance bits are scored.
+        Scores are exact, but only near-duplicates are found, so it is best
+        combined with a high arg_min_score. See CharNgramSimHashIndex.
+
+        Args:
+            arg_reference_list:     list
+                                    The list of reference strings to index.
+
+            arg_ngram_size:         int (optional)
+                                    The ngram size to use. The minimum valid
+                                    value is 1.
+                                    Defaults to class attribute
+                                    __DEFAULT_NGRAM_SIZE.
+
+            arg_max_distance:       int (optional)
+                                    The largest number of differing
+                                    fingerprint bits of a candidate, from 0 to
+                                    63. Higher values find less similar
+                                    strings at the cost of more tables and
+                                    candidates.
+                                    Defaults to 3.
+
+        Returns:
+            CharNgramSimHashIndex
+            A SimHash index of the reference strings.
+
+        Raises:
+            CharNgramException: if arg_reference_list is not populated or if
+                                arg_max_distance is invalid.
+        """
+
+        if not arg_reference_list:
+            raise CharNgramException("arg_reference_list is not populated")
+
+        cls.__check_ngram_size(arg_ngram_size)
+
+        index = CharNgramSimHashIndex(
+            arg_ngram_size,
+            arg_max_distance,
+            cls._ENGINE_ID
+        )
+
+        for reference_string in arg_reference_list:
+            index.append(
+                reference_string,
+                cls.__count_string_ngrams(reference_string, arg_ngram_size)
+            )
+
+        return index
+
+    # --------------------------------------------------------------------------
+    @classmethod
+    def get_simhash(cls, arg_string, arg_ngram_size=__DEFAULT_NGRAM_SIZE):
+        """Computes the 64-bit SimHash fingerprint of a string.
+
+        Strings with similar ngram profiles get fingerprints differing in few
+        bits, so the number of differing bits, bin(a ^ b).count("1"), is a
+        cheap estimate of how different two strings are. Fingerprints are
+        stable across processes and can be stored alongside the strings.
+
+        Args:
+            arg_string:             str
+                                    The string to fingerprint.
+
+            arg_ngram_size:         int (optional)
+                                    The ngram size to use. The minimum valid
+                                    value is 1.
+                                    Defaults to class attribute
+                                    __DEFAULT_NGRAM_SIZE.
+
+        Returns:
+            int
+            The fingerprint, in the range [0, 2**64). 0 if the string has no
+            ngrams.
+
+        Raises:
+            CharNgramException: if either arg type is invalid.
+        """
+
+        cls.__check_ngram_size(arg_ngram_size)
+
+        return CharNgramSimHashIndex.get_fingerprint(
+            cls.__generate_ngrams(arg_string, arg_ngram_size)
+        )
+
+    # --------------------------------------------------------------------------
+    @classmethod
+    def build_profile(
+        cls,
+        arg_string,
+        arg_ngram_size=__DEFAULT_NGRAM_SIZE
+    ):
+        """Builds a compact, integer-encoded ngram profile of a string.
+
+        Args:
+            arg_string:             str
+                                    The string to generate ngrams from.
+
+            arg_ngram_size:         int (optional)
+                                    The ngram size to use. The minimum valid
+                                    value is 1.
+                                    Defaults to class attribute
+                                    __DEFAULT_NGRAM_SIZE.
+
+        Returns:
+            CharNgramProfile
+            The profile of the string's lowercase ngrams.
+
+        Raises:
+            CharNgramException: if either arg type is invalid.
+        """
+
+        cls.__check_ngram_size(arg_ngram_size)
+
+        return CharNgramProfile(
+            cls.__generate_ngrams(arg_string, arg_ngram_size)
+        )
+
+    # --------------------------------------------------------------------------
+    @classmethod
+    def compare_profiles(
+        cls,
+        arg_reference_profile,
+        arg_input_profile,
+        arg_scoring_method=Scoring.PERCENTAGE
+    ):
+        """Compares two ngram profiles.
+
+        Behaves like compare_string(), but on profiles built once with
+        build_profile(). The ngram matches are counted with a single merge
+        join of the two sorted key arrays.
+
+        Args:
+            arg_reference_profile:  CharNgramProfile
+                                    The profile of the reference string to
+                                    compare against.
+
+            arg_input_profile:      CharNgramProfile
+                                    The profile of the input string to be
+                                    compared.
+
+            arg_scoring_method:     int (optional)
+                                    Desired scoring method. See
+                                    compare_string().
+
+        Returns:
+            number
+            A number reflecting the result of the comparison. See
+            compare_string().
+
+        Raises:
+            CharNgramException: if either profile is invalid or if scoring
+                                method is invalid.
+        """
+
+        if not (
+            isinstance(arg_reference_profile, CharNgramProfile)
+            and isinstance(arg_input_profile, CharNgramProfile)
+        ):
+            raise CharNgramException("arguments must be type CharNgramProfile")
+
+        return cls.__score_matches(
+            cls.__count_profile_matches(
+                arg_reference_profile,
+                arg_input_profile
+            ),
+            arg_reference_profile.total,
+            arg_scoring_method,
+            arg_input_profile.total
+        )
+
+    # --------------------------------------------------------------------------
+    @staticmethod
+    def __count_profile_matches(arg_reference_profile, arg_input_profile):
+        """Counts the ngram matches of two profiles with a merge join.
+
+        Args:
+            arg_reference_profile:  CharNgramProfile
+                                    The profile of the reference string.
+
+            arg_input_profile:      CharNgramProfile
+                                    The profile of the input string.
+
+        Returns:
+            int
+            The number of ngram matches, as counted by compare_string() with
+            Scoring.MATCHES.
+        """
+
+        reference_keys = arg_reference_profile.keys
+        reference_counts = arg_reference_profile.counts
+        input_keys = arg_input_profile.keys
+        input_counts = arg_input_profile.counts
+
+        reference_length = len(reference_keys)
+        input_length = len(input_keys)
+
+        matches = 0
+        i = 0
+        j = 0
+
+        while i < reference_length and j < input_length:
+            reference_key = reference_keys[i]
+            input_key = input_keys[j]
+
+            if reference_key == input_key:
+                if reference_counts[i] < input_counts[j]:
+                    matches += reference_counts[i]
+                else:
+                    matches += input_counts[j]
+
+                i += 1
+                j += 1
+            elif reference_key < input_key:
+                i += 1
+            else:
+                j += 1
+
+        return matches
+
+    # --------------------------------------------------------------------------
+    @classmethod
+    def load(cls, arg_path):
+        """Loads a compiled reference list saved to a file.
+
+        Reads a file written by CharNgramReferenceSet.save() or
+        CharNgramIndex.save() and returns the reference set or index it holds,
+        without generating any ngrams.
+
+        Args:
+            arg_path:               str
+                                    The path of the file to load.
+
+        Returns:
+            CharNgramReferenceSet|CharNgramIndex
+            The loaded reference set or index, ready to be passed to
+            compare_list() and friends.
+
+        Raises:
+            CharNgramException: if the file is not a valid fuzzjunkie file, its
+                                format version is not supported or it was
+                                saved by a different class, e.g. WordNgram.
+            OSError:            if the file cannot be read.
+        """
+
+        with open(arg_path, "rb") as file:
+            data = file.read()
+
+        kind, engine_id = _read_file_kind(data)
+
+        cls.__check_engine_id(engine_id)
+
+        if kind == _FILE_KIND_REFERENCE_SET:
+            return CharNgramReferenceSet.from_bytes(data)
+
+        if kind == _FILE_KIND_INDEX:
+            return CharNgramIndex.from_bytes(data)
+
+        raise CharNgramException("file holds an unknown kind of data")
+
+    # --------------------------------------------------------------------------
+    @classmethod
+    def open_index(cls, arg_path):
+        """Opens an index saved to a file without loading it into memory.
+
+        Memory-maps a file written by CharNgramIndex.save() and returns a
+        CharNgramMappedIndex reading the file in place. Only the pages holding
+        the posting lists and reference strings a comparison touches are ever
+        read, and processes mapping the same file share those pages through
+        the operating system's page cache. Scores are the same as those of the
+        loaded index.
+
+        Args:
+            arg_path:               str
+                                    The path of the index file to open.
+
+        Returns:
+            CharNgramMappedIndex
+            The opened index, ready to be passed to compare_list() and friends.
+            Should be closed once no longer needed.
+
+        Raises:
+            CharNgramException: if the file is not a valid index file, its
+                                format version is not supported, it was saved
+                                by a different class, e.g. WordNgram, or the
+                                platform is big-endian.
+            OSError:            if the file cannot be opened.
+        """
+
+        index = CharNgramMappedIndex(arg_path)
+
+        try:
+            cls.__check_engine_id(index.engine_id)
+        except CharNgramException:
+            index.close()
+            raise
+
+        return index
+
+    # --------------------------------------------------------------------------
+    @classmethod
+    def set_cache(cls, arg_cache):
+        """Replaces the cache used to store generated ngrams.
+
+        Args:
+            arg_cache:              CharNgramCache|None
+                                    The cache to use from now on. Any object
+                                    providing the get(), put(), clear() and
+                                    cache_info() methods of CharNgramCache may
+                                    be used. None disables caching.
+        """
+
+        cls.__cache = arg_cache
+
+    # --------------------------------------------------------------------------
+    @classmethod
+    def clear_cache(cls, arg_ngram_size=None):
+        """Removes all cached ngrams and resets the cache statistics.
+
+        Args:
+            arg_ngram_size:         int|None (optional)
+                                    The ngram size whose cached ngrams should
+                                    be removed. None removes all of them.
+                                    Defaults to None.
+        """
+
+        if cls.__cache is not None:
+            cls.__cache.clear(arg_ngram_size)
+
+    # --------------------------------------------------------------------------
+    @classmethod
+    def cache_info(cls, arg_ngram_size=None):
+        """Reports statistics of the cache used to store generated ngrams.
+
+        Args:
+            arg_ngram_size:         int|None (optional)
+                                    The ngram size to report on. None reports
+                                    on all ngram sizes combined.
+                                    Defaults to None.
+
+        Returns:
+            CharNgramCache.Info|None
+            The cache statistics (hits, misses, evictions, entries, bytes,
+            max_entries and max_bytes), or None if caching is disabled.
+        """
+
+        if cls.__cache is None:
+            return None
+
+        return cls.__cache.cache_info(arg_ngram_size)
+
+    # --------------------------------------------------------------------------
+    @classmethod
+    def set_metrics(cls, arg_metrics):
+        """Starts or stops reporting counters and timers.
+
+        Args:
+            arg_metrics:            CharNgramMetrics|None
+                                    The instance to report to from now on. Any
+                                    object providing the increment() and
+                                    record_time() methods of CharNgramMetrics
+                                    may be used. None, the default, stops
+                                    reporting, leaving no timing or counting
+                                    overhead.
+        """
+
+        cls.__metrics = arg_metrics
+
+    # --------------------------------------------------------------------------
+    @classmethod
+    def __iter_scores(
+        cls,
+        arg_reference_list,
+        arg_input_string,
+        arg_scoring_method=Scoring.PERCENTAGE,
+        arg_ngram_size=__DEFAULT_NGRAM_SIZE,
+        arg_return_type=ReturnBy.STRING,
+        arg_min_results=None,
+        arg_top_only=False,
+        arg_min_score=None
+    ):
+        """Scores an input string against each reference string.
+
+        Generates a (reference string or index, score) tuple for each reference
+        string, in reference order. In case of ReturnBy.STRING, repeated
+        reference strings are only scored and generated once. If arg_min_score
+        is given, reference strings scoring below it are not generated, and are
+        abandoned as early as their ngram totals or the ngrams left to compare
+        allow.
+
+        If arg_reference_list is a CharNgramIndex, CharNgramMappedIndex or
+        CharNgramMatrix, only the reference strings sharing at least one ngram
+        with the input string are scored. The
+        remaining reference strings all score 0 and are skipped entirely if
+        the scored ones already amount to arg_min_results distinct matches.
+
+        If arg_reference_list is a CharNgramMinHashIndex, only the candidates
+        sharing an LSH bucket with the input string are scored, and the
+        remaining reference strings all score 0 in the same manner. Likewise
+        for a CharNgramSimHashIndex, whose candidates are the reference strings
+        with SimHash fingerprints near that of the input string.
+
+        If arg_reference_list is a CharNgramShardPool, every shard is scored
+        in its own process and only the top-scoring tuples (if arg_top_only)
+        or the best arg_min_results tuples of each shard are generated, shard
+        by shard.
+
+        Args:
+            arg_reference_list:     list|compiled reference list
+                                    The reference strings to compare against.
+                                    See compare_list().
+
+            arg_input_string:       str
+                                    The input string to be compared.
+
+            arg_scoring_method:     int (optional)
+                                    Desired scoring method. See
+                                    compare_list().
+
+            arg_ngram_size:         int (optional)
+                                    The ngram size to use. See compare_list().
+
+            arg_return_type:        int (optional)
+                                    Desired return type. See compare_list().
+
+            arg_min_results:        int|None (optional)
+                                    The number of distinct matches the caller
+                                    needs. None means every reference string
+                                    must be generated.
+                                    Defaults to None.
+
+            arg_top_only:           bool (optional)
+                                    Whether the caller only needs the
+                                    top-scoring tuples, like ReturnScope.TOP.
+                                    Defaults to False.
+
+            arg_min_score:          number|None (optional)
+                                    The minimum score of the tuples to
+                                    generate. See compare_list().
+                                    Defaults to None.
+
+        Yields:
+            tuple
+            A reference string (or its index) and its corresponding score.
+
+        Raises:
+            CharNgramException: if arg_reference_list is not populated, or
+                                was compiled by a different class, e.g.
+                                WordNgram.
+        """
+
+        if isinstance(
+            arg_reference_list,
+            (
+                CharNgramIndex,
+                CharNgramMappedIndex,
+                CharNgramMatrix,
+                CharNgramMinHashIndex,
+                CharNgramSimHashIndex,
+                CharNgramReferenceSet,
+                CharNgramShardPool
+            )
+        ):
+            cls.__check_engine_id(
+                arg_reference_list.engine_id,
+                "arg_reference_list was compiled"
+            )
+
+        if isinstance(arg_reference_list, CharNgramShardPool):
+            scored = set()
+
+            if arg_top_only:
+                return_scores = cls.ReturnScope.TOP
+                k = None
+            else:
+                return_scores = cls.ReturnScope.ALL
+                k = arg_min_results
+
+            for shard_scores in arg_reference_list.compare_shards(
+                arg_input_string,
+                arg_scoring_method,
+                arg_return_type,
+                return_scores,
+                k,
+                arg_min_score
+            ):
+                for match, score in shard_scores:
+                    if match not in scored:
+                        scored.add(match)
+
+                        yield match, score
+
+            return
+
+        if isinstance(arg_reference_list, CharNgramReferenceSet):
+            yield from cls.__iter_reference_set_scores(
+                arg_reference_list,
+                arg_input_string,
+                arg_scoring_method,
+                arg_return_type,
+                arg_min_score
+            )
+
+            return
+
+        if isinstance(
+            arg_reference_list,
+            (CharNgramMinHashIndex, CharNgramSimHashIndex)
+        ):
+            yield from cls.__iter_candidate_scores(
+                arg_reference_list,
+                arg_input_string,
+                arg_scoring_method,
+                arg_return_type,
+                arg_min_results,
+                arg_min_score
+            )
+
+            return
+
+        if isinstance(
+            arg_reference_list,
+            (CharNgramIndex, CharNgramMappedIndex, CharNgramMatrix)
+        ):
+            yield from cls.__iter_index_scores(
+                arg_reference_list,
+                arg_input_string,
+                arg_scoring_method,
+                arg_return_type,
+                arg_min_results,
+                arg_min_score
+            )
+
+            return
+
+        if not arg_reference_list:
+            raise CharNgramException("arg_reference_list is not populated")
+
+        input_ngrams = cls.__generate_ngrams(
+            arg_input_string,
+            arg_ngram_size,
+            CharNgramCache.Role.QUERY
+        )
+
+        input_total = cls.__get_input_total(
+            input_ngrams,
+            arg_scoring_method,
+            arg_min_score
+        )
+
+        scored = set()
+
+        for index, reference_string in enumerate(arg_reference_list):
+            if arg_return_type == cls.ReturnBy.STRING:
+                if reference_string in scored:
+                    continue
+
+                scored.add(reference_string)
+                match = reference_string
+            else:
+                match = index
+
+            reference_ngrams = cls.__generate_ngrams(
+                reference_string,
+                arg_ngram_size
+            )
+
+            score = cls.__compare_ngrams(
+                reference_ngrams,
+                input_ngrams,
+                arg_scoring_method,
+                arg_min_score,
+                input_total
+            )
+
+            if score is not None:
+                yield match, score
+
+    # --------------------------------------------------------------------------
+    @classmethod
+    async def __iter_scores_async(
+        cls,
+        arg_reference_list,
+        arg_input_string,
+        arg_scoring_method=Scoring.PERCENTAGE,
+        arg_ngram_size=__DEFAULT_NGRAM_SIZE,
+        arg_return_type=ReturnBy.STRING,
+        arg_min_results=None,
+        arg_top_only=False,
+        arg_min_score=None,
+        arg_chunk_size=__DEFAULT_CHUNK_SIZE
+    ):
+        """Scores an input string against each reference string, yielding to
+        the event loop between chunks.
+
+        Generates the same tuples as __iter_scores(). A plain reference list
+        is cut into chunks of arg_chunk_size reference strings, each scored by
+        __iter_scores() before yielding to the event loop, so that reference
+        strings skipped for arg_min_score count towards a chunk as well.
+        Compiled reference lists yield after every arg_chunk_size tuples, and
+        a CharNgramShardPool is waited on in the default executor.
+
+        Args:
+            See __iter_scores() and compare_list_async().
+
+        Yields:
+            tuple
+            A reference string (or its index) and its corresponding score.
+
+        Raises:
+            CharNgramException: if arg_reference_list is not populated or if
+                                arg_chunk_size is invalid.
+        """
+
+        try:
+            if arg_chunk_size < 1:
+                raise CharNgramException("arg_chunk_size must be at least 1")
+        except TypeError:
+            raise CharNgramException("arg_chunk_size must be type int")
+
+        if isinstance(
+            arg_reference_list,
+            (
+                CharNgramReferenceSet,
+                CharNgramIndex,
+                CharNgramMappedIndex,
+                CharNgramMatrix,
+                CharNgramMinHashIndex,
+                CharNgramSimHashIndex,
+                CharNgramShardPool
+            )
+        ):
+            scores = cls.__iter_scores(
+                arg_reference_list,
+                arg_input_string,
+                arg_scoring_method,
+                arg_ngram_size,
+                arg_return_type,
+                arg_min_results,
+                arg_top_only,
+                arg_min_score
+            )
+
+            if isinstance(arg_reference_list, CharNgramShardPool):
+                scores = await asyncio.get_running_loop().run_in_executor(
+                    None,
+                    list,
+                    scores
+                )
+
+            for position, score in enumerate(scores, 1):
+                yield score
+
+                if position % arg_chunk_size == 0:
+                    await asyncio.sleep(0)
+
+            return
+
+        if not arg_reference_list:
+            raise CharNgramException("arg_reference_list is not populated")
+
+        reference_strings = iter(arg_reference_list)
+        scored = set()
+        offset = 0
+
+        while True:
+            chunk = list(itertools.islice(reference_strings, arg_chunk_size))
+
+            if not chunk:
+                break
+
+            for match, score in cls.__iter_scores(
+                chunk,
+                arg_input_string,
+                arg_scoring_method,
+                arg_ngram_size,
+                arg_return_type,
+                arg_min_score=arg_min_score
+            ):
+                if arg_return_type == cls.ReturnBy.STRING:
+                    if match in scored:
+                        continue
+
+                    scored.add(match)
+                else:
+                    match += offset
+
+                yield match, score
+
+            offset += len(chunk)
+
+            await asyncio.sleep(0)
+
+    # --------------------------------------------------------------------------
+    @classmethod
+    def __select_topk(cls, arg_scores, arg_k, arg_return_type=ReturnBy.STRING):
+        """Selects the best arg_k tuples of a stream of scores.
+
+        Keeps a heap of at most arg_k tuples. A tuple whose match is already in
+        the heap is skipped, so repeated reference strings only take one place
+        in case of ReturnBy.STRING. A repeat of a string that has left the heap
+        can never re-enter it, as its key no longer beats the heap minimum.
+
+        Args:
+            arg_scores:             iterable
+                                    The (reference string or index, score)
+                                    tuples to select from.
+
+            arg_k:                  int
+                                    The maximum number of tuples to select.
+
+            arg_return_type:        int (optional)
+                                    Desired return type. See compare_list().
+
+        Returns:
+            list
+            See compare_list_topk().
+        """
+
+        sort_key = cls.__get_sort_key(arg_return_type)
+
+        heap = []
+        heap_matches = set()
+
+        for score in arg_scores:
+            if score[cls.MATCH] in heap_matches:
+                continue
+
+            # Matches in the heap are unique, so entries never tie on keys.
+            heap_entry = (sort_key(score), score)
+
+            if len(heap) < arg_k:
+                heapq.heappush(heap, heap_entry)
+                heap_matches.add(score[cls.MATCH])
+            elif heap_entry[0] > heap[0][0]:
+                removed_entry = heapq.heapreplace(heap, heap_entry)
+                heap_matches.discard(removed_entry[1][cls.MATCH])
+                heap_matches.add(score[cls.MATCH])
+
+        return [score for key, score in sorted(heap, reverse=True)]
+
+    # --------------------------------------------------------------------------
+    @classmethod
+    def __count_comparisons(cls, arg_scores):
+        """Passes on a stream of scores, counting them as comparisons.
+
+        Args:
+            arg_scores:             iterable
+                                    The (reference string or index, score)
+                                    tuples to pass on.
+
+        Yields:
+            tuple
+            Each tuple of arg_scores. The number of tuples is reported to the
+            metrics once the stream ends or is abandoned.
+        """
+
+        comparisons = 0
+
+        try:
+            for score in arg_scores:
+                comparisons += 1
+
+                yield score
+        finally:
+            if cls.__metrics is not None:
+                cls.__metrics.increment("comparisons", comparisons)
+
+    # --------------------------------------------------------------------------
+    @classmethod
+    def __rank_scores(
+        cls,
+        arg_scores,
+        arg_return_type=ReturnBy.STRING,
+        arg_return_scores=ReturnScope.TOP
+    ):
+        """Ranks the scores of compare_list() and compare_list_async().
+
+        Args:
+            arg_scores:             dict
+                                    The score of each reference string (or
+                                    index).
+
+            arg_return_type:        int (optional)
+                                    Desired return type. See compare_list().
+
+            arg_return_scores:      int (optional)
+                                    Desired scores to include. See
+                                    compare_list().
+
+        Returns:
+            list
+            See compare_list().
+        """
+
+        metrics = cls.__metrics
+
+        if metrics is not None:
+            start = time.perf_counter()
+
+        if arg_return_scores == cls.ReturnScope.TOP and arg_scores:
+            top_score = max(arg_scores.values())
+
+            arg_scores = {
+                match: score for match, score in arg_scores.items() if (
+                    score >= top_score
+                )
+            }
+
+        ranked_scores = sorted(
+            arg_scores.items(),
+            key=cls.__get_sort_key(arg_return_type),
+            reverse=True
+        )
+
+        if metrics is not None:
+            metrics.record_time("sorting", time.perf_counter() - start)
+
+        return ranked_scores
+
+    # --------------------------------------------------------------------------
+    @classmethod
+    def __iter_reference_set_scores(
+        cls,
+        arg_reference_set,
+        arg_input_string,
+        arg_scoring_method=Scoring.PERCENTAGE,
+        arg_return_type=ReturnBy.STRING,
+        arg_min_score=None
+    ):
+        """Scores an input string against each string of a reference set.
+
+        See __iter_scores(). Only the input string is profiled; the reference
+        side uses the frozen profiles of the set as they are. The ngrams shared
+        with each reference string are found with a set intersection of the
+        input keys and the reference keys, and the reference count of each
+        shared ngram is found by bisecting the sorted reference keys, which is
+        considerably faster in Python than a full merge join when the input
+        string is short. If arg_min_score is given, only the buckets of
+        reference strings whose ngram totals can reach it, given the input
+        ngram total, are scanned, in reference order; the other buckets are
+        skipped without looking at a single reference string.
+
+        Args:
+            arg_reference_set:      CharNgramReferenceSet
+                                    The reference set to compare against.
+
+            arg_input_string:       str
+                                    The input string to be compared.
+
+            arg_scoring_method:     int (optional)
+                                    Desired scoring method. See
+                                    compare_list().
+
+            arg_return_type:        int (optional)
+                                    Desired return type. See compare_list().
+
+            arg_min_score:          number|None (optional)
+                                    See __iter_scores().
+                                    Defaults to None.
+
+        Yields:
+            tuple
+            A reference string (or its index) and its corresponding score.
+        """
+
+        input_profile = CharNgramProfile(
+            cls.__generate_ngrams(
+                arg_input_string,
+                arg_reference_set.ngram_size,
+                CharNgramCache.Role.QUERY
+            )
+        )
+
+        input_counts = dict(zip(input_profile.keys, input_profile.counts))
+
+        references = arg_reference_set.references
+        profiles = arg_reference_set.profiles
+
+        if arg_return_type == cls.ReturnBy.STRING:
+            reference_ids = arg_reference_set.unique_ids
+            buckets = arg_reference_set.unique_buckets
+        else:
+            reference_ids = range(len(references))
+            buckets = arg_reference_set.buckets
+
+        if arg_min_score is not None:
+            # Reference strings sharing a total share their minimum matches,
+            # so whole buckets either can reach arg_min_score or cannot.
+            reference_ids = heapq.merge(
+                *[
+                    bucket for total, bucket in buckets.items()
+                    if cls.__get_min_matches(
+                        total,
+                        arg_min_score,
+                        arg_scoring_method,
+                        input_profile.total
+                    ) <= min(total, input_profile.total)
+                ]
+            )
+
+        for reference_id in reference_ids:
+            profile = profiles[reference_id]
+            reference_keys = profile.keys
+            reference_counts = profile.counts
+
+            matches = 0
+
+            for key in input_counts.keys() & reference_keys:
+                reference_count = reference_counts[
+                    bisect.bisect_left(reference_keys, key)
+                ]
+
+                if reference_count < input_counts[key]:
+                    matches += reference_count
+                else:
+                    matches += input_counts[key]
+
+            score = cls.__score_matches(
+                matches,
+                profile.total,
+                arg_scoring_method,
+                input_profile.total
+            )
+
+            if arg_min_score is not None and score < arg_min_score:
+                continue
+
+            if arg_return_type == cls.ReturnBy.STRING:
+                yield references[reference_id], score
+            else:
+                yield reference_id, score
+
+    # --------------------------------------------------------------------------
+    @classmethod
+    def __iter_index_scores(
+        cls,
+        arg_index,
+        arg_input_string,
+        arg_scoring_method=Scoring.PERCENTAGE,
+        arg_return_type=ReturnBy.STRING,
+        arg_min_results=None,
+        arg_min_score=None
+    ):
+        """Scores an input string against each string of an index or matrix.
+
+        See __iter_scores(). Reference strings sharing ngrams with the input
+        string are generated first, ascending by reference id, followed by the
+        remaining (zero-scoring) reference strings if needed. The latter are
+        never generated if arg_min_score is above 0.
+
+        Args:
+            arg_index:              CharNgramIndex|CharNgramMappedIndex|
+                                    CharNgramMatrix
+                                    The index or matrix of reference strings to
+                                    compare against.
+
+            arg_input_string:       str
+                                    The input string to be compared.
+
+            arg_scoring_method:     int (optional)
+                                    Desired scoring method. See
+                                    compare_list().
+
+            arg_return_type:        int (optional)
+                                    Desired return type. See compare_list().
+
+            arg_min_results:        int|None (optional)
+                                    See __iter_scores().
+                                    Defaults to None.
+
+            arg_min_score:          number|None (optional)
+                                    See __iter_scores().
+                                    Defaults to None.
+
+        Yields:
+            tuple
+            A reference string (or its index) and its corresponding score.
+
+        Raises:
+            CharNgramException: if arg_index is empty, e.g. after every
+                                reference string has been removed.
+        """
+
+        if len(arg_index) == 0:
+            raise CharNgramException("arg_reference_list is not populated")
+
+        input_ngrams = cls.__generate_ngrams(
+            arg_input_string,
+            arg_index.ngram_size,
+            CharNgramCache.Role.QUERY
+        )
+
+        matches = arg_index.get_matches(input_ngrams)
+        input_total = sum(input_ngrams.values())
+
+        scored = set()
+        generated = 0
+
+        for reference_id in sorted(matches):
+            if arg_return_type == cls.ReturnBy.STRING:
+                match = arg_index.get_reference(reference_id)
+
+                if match in scored:
+                    continue
+            else:
+                match = reference_id
+
+            scored.add(match)
+
+            score = cls.__score_matches(
+                matches[reference_id],
+                arg_index.get_total(reference_id),
+                arg_scoring_method,
+                input_total
+            )
+
+            if arg_min_score is not None and score < arg_min_score:
+                continue
+
+            generated += 1
+
+            yield match, score
+
+        if arg_min_results is not None and generated >= arg_min_results:
+            return
+
+        # No matches always score 0.
+        if arg_min_score is not None and arg_min_score > 0:
+            return
+
+        if isinstance(arg_index, CharNgramIndex):
+            reference_ids = arg_index.get_reference_ids()
+        else:
+            reference_ids = range(len(arg_index))
+
+        for reference_id in reference_ids:
+            if reference_id in matches:
+                continue
+
+            if arg_return_type == cls.ReturnBy.STRING:
+                match = arg_index.get_reference(reference_id)
+
+                if match in scored:
+                    continue
+
+                scored.add(match)
+            else:
+                match = reference_id
+
+            yield match, cls.__score_matches(
+                0,
+                arg_index.get_total(reference_id),
+                arg_scoring_method,
+                input_total
+            )
+
+    # --------------------------------------------------------------------------
+    @classmethod
+    def __iter_candidate_scores(
+        cls,
+        arg_index,
+        arg_input_string,
+        arg_scoring_method=Scoring.PERCENTAGE,
+        arg_return_type=ReturnBy.STRING,
+        arg_min_results=None,
+        arg_min_score=None
+    ):
+        """Scores an input string against the candidates of an inexact index.
+
+        See __iter_scores(). The candidates, i.e. the reference strings sharing
+        an LSH bucket with the input string or having a nearby SimHash
+        fingerprint, are scored exactly, as plain reference lists are,
+        ascending by reference id. They are followed by the remaining reference
+        strings, all scoring 0, if needed. The latter are never generated if
+        arg_min_score is above 0.
+
+        Args:
+            arg_index:              CharNgramMinHashIndex or
+                                    CharNgramSimHashIndex
+                                    The index of reference strings to compare
+                                    against.
+
+            arg_input_string:       str
+                                    The input string to be compared.
+
+            arg_scoring_method:     int (optional)
+                                    Desired scoring method. See
+                                    compare_list().
+
+            arg_return_type:        int (optional)
+                                    Desired return type. See compare_list().
+
+            arg_min_results:        int|None (optional)
+                                    See __iter_scores().
+                                    Defaults to None.
+
+            arg_min_score:          number|None (optional)
+                                    See __iter_scores().
+                                    Defaults to None.
+
+        Yields:
+            tuple
+            A reference string (or its index) and its corresponding score.
+        """
+
+        input_ngrams = cls.__generate_ngrams(
+            arg_input_string,
+            arg_index.ngram_size,
+            CharNgramCache.Role.QUERY
+        )
+
+        input_total = sum(input_ngrams.values())
+        candidates = arg_index.get_candidates(input_ngrams)
+
+        scored = set()
+        generated = 0
+
+        for reference_id in candidates:
+            reference_string = arg_index.get_reference(reference_id)
+
+            if arg_return_type == cls.ReturnBy.STRING:
+                if reference_string in scored:
+                    continue
+
+                match = reference_string
+            else:
+                match = reference_id
+
+            scored.add(match)
+
+            score = cls.__compare_ngrams(
+                cls.__generate_ngrams(reference_string, arg_index.ngram_size),
+                input_ngrams,
+                arg_scoring_method,
+                arg_min_score,
+                input_total
+            )
+
+            if score is None:
+                continue
+
+            generated += 1
+
+            yield match, score
+
+        if arg_min_results is not None and generated >= arg_min_results:
+            return
+
+        # Non-candidates are deemed to share no ngrams, so always score 0.
+        if arg_min_score is not None and arg_min_score > 0:
+            return
+
+        candidates = set(candidates)
+
+        for reference_id in range(len(arg_index)):
+            if reference_id in candidates:
+                continue
+
+            if arg_return_type == cls.ReturnBy.STRING:
+                match = arg_index.get_reference(reference_id)
+
+                if match in scored:
+                    continue
+
+                scored.add(match)
+            else:
+                match = reference_id
+
+            yield match, cls.__score_matches(
+                0,
+                arg_index.get_total(reference_id),
+                arg_scoring_method,
+                input_total
+            )
+
+    # --------------------------------------------------------------------------
+    @classmethod
+    def __get_sort_key(cls, arg_return_type=ReturnBy.STRING):
+        """Returns the key function used to rank compare_list() tuples.
+
+        Tuples are ranked descending by score when sorted in reverse. In case
+        of ReturnBy.STRING, ties are broken ascending by string length and then
+        descending by string. In case of ReturnBy.INDEX, ties are broken
+        ascending by index.
+
+        Args:
+            arg_return_type:        int (optional)
+                                    Desired return type. See compare_list().
+                                    Defaults to class attribute
+                                    ReturnBy.STRING.
+
+        Returns:
+            function
+            A function mapping a (match, score) tuple to a sortable key.
+        """
+
+        if arg_return_type == cls.ReturnBy.STRING:
+            return lambda x: (
+                x[cls.SCORE],
+                -len(x[cls.MATCH]),
+                x[cls.MATCH]
+            )
+        else:
+            return lambda x: (
+                x[cls.SCORE],
+                -x[cls.MATCH]
+            )
+
+    # --------------------------------------------------------------------------
+    @classmethod
+    def __compare_ngrams(
+        cls,
+        arg_reference_ngrams,
+        arg_input_ngrams,
+        arg_scoring_method=Scoring.PERCENTAGE,
+        arg_min_score=None,
+        arg_input_total=None
+    ):
+        """Compares two dicts of ngrams.
+
+        Compares an input dict of ngrams against a reference dict and returns
+        the result either as a percentage match or as an absolute number of
+        matches. For instance, "test" is calculated as a 50.0% match against
+        "testing", and scores a 3 in terms of number of matches given an ngram
+        size of 2. Tuples of dicts generated for several ngram sizes are
+        compared size by size, returning a tuple of scores.
+
+        Args:
+            arg_reference_ngrams:   dict|tuple
+                                    The reference string to compare against.
+
+            arg_input_ngrams:       dict|tuple
+                                    The input string to be compared.
+
+            arg_scoring_method:     int|tuple (optional)
+                                    Desired scoring method, or a tuple of
+                                    them. Valid values are the members of
+                                    Scoring, see compare_string().
+                                    Defaults to class attribute
+                                    Scoring.PERCENTAGE.
+
+            arg_min_score:          number|None (optional)
+                                    The minimum score of interest. If given,
+                                    comparison stops as soon as the reference
+                                    ngrams left to compare cannot lift the
+                                    score to arg_min_score, and None is
+                                    returned instead of the score.
+                                    Defaults to None.
+
+            arg_input_total:        int|None (optional)
+                                    The total number of input ngrams, if
+                                    already known.
+                                    Defaults to None.
+
+        Returns:
+            number|tuple|None
+            A number reflecting the result of the comparison (float for
+            Scoring.PERCENTAGE, int for Scoring.MATCHES), a tuple of them if
+            arg_scoring_method is a tuple, or None if it is below
+            arg_min_score.
+
+            Example (Scoring.PERCENTAGE):
+            50.0
+
+            Example (Scoring.MATCHES):
+            3
+
+        Raises:
+            CharNgramException: if arg_reference_ngrams is not populated, if
+                                arg_input_ngrams is not populated, or if
+                                scoring method is invalid.
+        """
+
+        if isinstance(arg_reference_ngrams, tuple):
+            return tuple(
+                cls.__compare_ngrams(
+                    reference_ngrams,
+                    input_ngrams,
+                    arg_scoring_method
+                )
+                for reference_ngrams, input_ngrams in zip(
+                    arg_reference_ngrams,
+                    arg_input_ngrams
+                )
+            )
+
+        if arg_min_score is not None:
+            return cls.__compare_ngrams_above(
+                arg_reference_ngrams,
+                arg_input_ngrams,
+                arg_scoring_method,
+                arg_min_score,
+                arg_input_total
+            )
+
+        try:
+            max_matches = sum(arg_reference_ngrams.values())
+        except AttributeError:
+            raise CharNgramException("arg_reference_ngrams is not populated")
+
+        matches = 0
+
+        if max_matches > 0:
+            for ngram in arg_reference_ngrams:
+                try:
+                    if ngram in arg_input_ngrams:
+                        max_ngram_score = arg_input_ngrams[ngram]
+                        if max_ngram_score > arg_reference_ngrams[ngram]:
+                            max_ngram_score = arg_reference_ngrams[ngram]
+
+                        delta = arg_reference_ngrams[ngram] - max_ngram_score
+                        matches += arg_reference_ngrams[ngram] - delta
+                except TypeError:
+                    raise CharNgramException(
+                        "arg_input_ngrams is not populated"
+                    )
+
+        if arg_input_total is None:
+            try:
+                arg_input_total = cls.__get_input_total(
+                    arg_input_ngrams,
+                    arg_scoring_method,
+                    None
+                )
+            except AttributeError:
+                raise CharNgramException("arg_input_ngrams is not populated")
+
+        return cls.__score_matches(
+            matches,
+            max_matches,
+            arg_scoring_method,
+            arg_input_total
+        )
+
+    # --------------------------------------------------------------------------
+    @classmethod
+    def __compare_ngrams_above(
+        cls,
+        arg_reference_ngrams,
+        arg_input_ngrams,
+        arg_scoring_method,
+        arg_min_score,
+        arg_input_total=None
+    ):
+        """Compares two dicts of ngrams, giving up below a minimum score.
+
+        See __compare_ngrams(). The reference string is skipped without
+        comparing any ngrams if even a complete match of the smaller of the two
+        ngram totals could not reach arg_min_score. Otherwise the comparison
+        stops as soon as the matches found so far plus the reference ngrams
+        left to compare cannot reach it.
+
+        Returns:
+            number|None
+            The score, or None if it is below arg_min_score.
+        """
+
+        try:
+            max_matches = sum(arg_reference_ngrams.values())
+        except AttributeError:
+            raise CharNgramException("arg_reference_ngrams is not populated")
+
+        try:
+            if arg_input_total is None:
+                arg_input_total = sum(arg_input_ngrams.values())
+        except AttributeError:
+            raise CharNgramException("arg_input_ngrams is not populated")
+
+        min_matches = cls.__get_min_matches(
+            max_matches,
+            arg_min_score,
+            arg_scoring_method,
+            arg_input_total
+        )
+
+        if min_matches > min(max_matches, arg_input_total):
+            return None
+
+        matches = 0
+        remaining = max_matches
+
+        for ngram, reference_count in arg_reference_ngrams.items():
+            remaining -= reference_count
+
+            if ngram in arg_input_ngrams:
+                if reference_count > arg_input_ngrams[ngram]:
+                    matches += arg_input_ngrams[ngram]
+                else:
+                    matches += reference_count
+
+            if matches + remaining < min_matches:
+                return None
+
+        return cls.__score_matches(
+            matches,
+            max_matches,
+            arg_scoring_method,
+            arg_input_total
+        )
+
+    # --------------------------------------------------------------------------
+    @classmethod
+    def __get_input_total(
+        cls,
+        arg_input_ngrams,
+        arg_scoring_method,
+        arg_min_score
+    ):
+        """Returns the ngram total of an input string, if it will be needed.
+
+        The total is needed by every scoring method other than
+        Scoring.PERCENTAGE and Scoring.MATCHES, and to skip reference strings
+        below arg_min_score. Computing it once per input string spares
+        __compare_ngrams() from summing the input ngrams for every reference
+        string. Raises CharNgramException for multi-size profiles given
+        arg_min_score, whose tuples of scores it cannot bound.
+
+        Returns:
+            int|None
+            The total, or None if not needed or if arg_input_ngrams is a
+            multi-size profile.
+        """
+
+        if arg_min_score is None and arg_scoring_method in (
+            cls.Scoring.PERCENTAGE,
+            cls.Scoring.MATCHES
+        ):
+            return None
+
+        if isinstance(arg_input_ngrams, tuple):
+            if arg_min_score is not None:
+                raise CharNgramException(
+                    "arg_min_score is not supported with several ngram sizes"
+                )
+
+            return None
+
+        return sum(arg_input_ngrams.values())
+
+    # --------------------------------------------------------------------------
+    @staticmethod
+    def __is_match(arg_score):
+        """Returns whether a score, or any score of a tuple, is above 0."""
+
+        if isinstance(arg_score, tuple):
+            return any(CharNgram.__is_match(score) for score in arg_score)
+
+        return arg_score > 0
+
+    # --------------------------------------------------------------------------
+    @staticmethod
+    def __check_ngram_size(arg_ngram_size):
+        """Raises CharNgramException if arg_ngram_size is a tuple of sizes.
+
+        Compiled reference lists and profiles hold ngrams of a single size.
+        """
+
+        if isinstance(arg_ngram_size, tuple):
+            raise CharNgramException("arg_ngram_size must be type int")
+
+    # --------------------------------------------------------------------------
+    @classmethod
+    def __check_engine_id(cls, arg_engine_id, arg_subject="file was saved"):
+        """Raises CharNgramException unless something was compiled by cls.
+
+        Saved files and compiled reference lists hold the ngrams of the class
+        that compiled them, which any other class would silently fail to match.
+        arg_subject starts the message of the exception.
+        """
+
+        if arg_engine_id != cls._ENGINE_ID:
+            raise CharNgramException(
+                "%s by a different class than %s" % (arg_subject, cls.__name__)
+            )
+
+    # --------------------------------------------------------------------------
+    @classmethod
+    def __check_index(cls, arg_index):
+        """Raises CharNgramException unless arg_index is an index of cls.
+
+        An index built by another class holds ngrams that cls would neither
+        generate nor match, so it must not be mixed with those of cls.
+        """
+
+        if not isinstance(arg_index, CharNgramIndex):
+            raise CharNgramException("arg_index must be type CharNgramIndex")
+
+        cls.__check_engine_id(arg_index.engine_id, "arg_index was built")
+
+    # --------------------------------------------------------------------------
+    @staticmethod
+    def __check_min_score(arg_min_score, arg_scoring_method=None):
+        """Raises CharNgramException unless arg_min_score is a number or None.
+
+        Also raises if arg_min_score is given along with a tuple of scoring
+        methods, whose tuples of scores it cannot bound.
+        """
+
+        if arg_min_score is None:
+            return
+
+        if isinstance(arg_scoring_method, tuple):
+            raise CharNgramException(
+                "arg_min_score is not supported with several scoring methods"
+            )
+
+        try:
+            arg_min_score < 0
+        except TypeError:
+            raise CharNgramException("arg_min_score must be type int or float")
+
+    # --------------------------------------------------------------------------
+    @classmethod
+    def __get_min_matches(
+        cls,
+        arg_max_matches,
+        arg_min_score,
+        arg_scoring_method=Scoring.PERCENTAGE,
+        arg_input_total=None
+    ):
+        """Computes the fewest ngram matches needed to reach a minimum score.
+
+        Args:
+            arg_max_matches:        int
+                                    The number of ngrams in the reference
+                                    string.
+
+            arg_min_score:          number|None
+                                    The minimum score. None means any score.
+
+            arg_scoring_method:     int (optional)
+                                    Desired scoring method. See
+                                    __score_matches().
+                                    Defaults to class attribute
+                                    Scoring.PERCENTAGE.
+
+            arg_input_total:        int|None (optional)
+                                    The number of ngrams in the input string.
+                                    See __score_matches().
+                                    Defaults to None.
+
+        Returns:
+            int
+            The smallest number of matches whose score, as computed by
+            __score_matches(), is at least arg_min_score, or arg_max_matches + 1
+            if no number of matches reaches it.
+
+        Raises:
+            CharNgramException: if scoring method is invalid.
+        """
+
+        if arg_min_score is None:
+            return 0
+
+        # Raises on an invalid scoring method, just like scoring would.
+        if cls.__score_matches(
+            0,
+            arg_max_matches,
+            arg_scoring_method,
+            arg_input_total
+        ) >= arg_min_score:
+            return 0
+
+        if arg_max_matches == 0:
+            return 1
+
+        # Solves each scoring formula of __score_matches() for the matches.
+        if arg_scoring_method == cls.Scoring.PERCENTAGE:
+            estimate = arg_min_score * arg_max_matches / 100
+        elif arg_scoring_method == cls.Scoring.MATCHES:
+            estimate = arg_min_score
+        elif arg_scoring_method == cls.Scoring.INPUT_PERCENTAGE:
+            estimate = arg_min_score * arg_input_total / 100
+        elif arg_scoring_method == cls.Scoring.DICE:
+            estimate = arg_min_score * (arg_max_matches + arg_input_total) / 200
+        elif arg_scoring_method == cls.Scoring.JACCARD:
+            estimate = arg_min_score * (arg_max_matches + arg_input_total) / (
+                100 + arg_min_score
+            )
+        else:
+            estimate = arg_min_score * math.sqrt(
+                arg_max_matches * arg_input_total
+            ) / 100
+
+        if estimate > arg_max_matches:
+            return arg_max_matches + 1
+
+        # The estimate may be off by one due to rounding, so settle on the
+        # exact value using the same arithmetic as the scoring itself.
+        min_matches = max(math.ceil(estimate), 1)
+
+        while min_matches > 1 and cls.__score_matches(
+            min_matches - 1,
+            arg_max_matches,
+            arg_scoring_method,
+            arg_input_total
+        ) >= arg_min_score:
+            min_matches -= 1
+
+        while min_matches <= arg_max_matches and cls.__score_matches(
+            min_matches,
+            arg_max_matches,
+            arg_scoring_method,
+            arg_input_total
+        ) < arg_min_score:
+            min_matches += 1
+
+        return min_matches
+
+    # --------------------------------------------------------------------------
+    @classmethod
+    def __score_matches(
+        cls,
+        arg_matches,
+        arg_max_matches,
+        arg_scoring_method=Scoring.PERCENTAGE,
+        arg_input_total=None
+    ):
+        """Converts a number of ngram matches into a score.
+
+        See compare_string() for the formula of each scoring method.
+
+        Args:
+            arg_matches:            int
+                                    The number of ngram matches found.
+
+            arg_max_matches:        int
+                                    The number of ngrams in the reference
+                                    string, i.e. the maximum possible number of
+                                    matches.
+
+            arg_scoring_method:     int|tuple (optional)
+                                    Desired scoring method, or a tuple of them.
+                                    See compare_string().
+                                    Defaults to class attribute
+                                    Scoring.PERCENTAGE.
+
+            arg_input_total:        int|None (optional)
+                                    The number of ngrams in the input string.
+                                    Required by every scoring method other
+                                    than Scoring.PERCENTAGE and
+                                    Scoring.MATCHES.
+                                    Defaults to None.
+
+        Returns:
+            number|tuple
+            A number reflecting the result of the comparison (float for
+            Scoring.PERCENTAGE, int for Scoring.MATCHES), or a tuple of them,
+            one per scoring method. Always 0 if arg_max_matches is 0.
+
+        Raises:
+            CharNgramException: if scoring method is invalid.
+        """
+
+        if isinstance(arg_scoring_method, tuple):
+            if not arg_scoring_method:
+                raise CharNgramException("arg_scoring_method is invalid")
+
+            return tuple(
+                cls.__score_matches(
+                    arg_matches,
+                    arg_max_matches,
+                    scoring_method,
+                    arg_input_total
+                )
+                for scoring_method in arg_scoring_method
+            )
+
+        if arg_max_matches > 0:
+            if arg_scoring_method == cls.Scoring.PERCENTAGE:
+                percentage_match = (arg_matches / arg_max_matches) * 100
+
+                return percentage_match
+            elif arg_scoring_method == cls.Scoring.MATCHES:
+                return arg_matches
+            elif arg_scoring_method == cls.Scoring.INPUT_PERCENTAGE:
+                numerator = arg_matches
+                denominator = arg_input_total
+            elif arg_scoring_method == cls.Scoring.DICE:
+                numerator = 2 * arg_matches
+                denominator = arg_max_matches + arg_input_total
+            elif arg_scoring_method == cls.Scoring.JACCARD:
+                numerator = arg_matches
+                denominator = arg_max_matches + arg_input_total - arg_matches
+            elif arg_scoring_method == cls.Scoring.COSINE:
+                numerator = arg_matches
+                denominator = math.sqrt(arg_max_matches * arg_input_total)
+            else:
+                raise CharNgramException("arg_scoring_method is invalid")
+
+            if denominator > 0:
+                return (numerator / denominator) * 100
+
+        return 0
+
+    # --------------------------------------------------------------------------
+    @classmethod
+    def _count_ngrams(cls, arg_string, arg_ngram_size):
+        """Counts the character ngrams of a lowercase string.
+
+        Called by __generate_ngrams() on every cache miss. Subclasses generating
+        other kinds of ngrams, such as WordNgram, override this method and
+        inherit everything else.
+
+        Args:
+            arg_string:             str
+                                    The lowercase string to generate ngrams
+                                    from.
+
+            arg_ngram_size:         int
+                                    The ngram size to use, at least
+                                    __MIN_NGRAM_SIZE.
+
+        Returns:
+            dict
+            A dict containing the ngrams generated from the string. A string
+            shorter than arg_ngram_size is its own single ngram.
+        """
+
+        string_length = len(arg_string)
+        last_ngram_offset = string_length - (arg_ngram_size - 1)
+
+        ngrams = {}
+
+        if string_length >= arg_ngram_size:
+            for i in range(0, last_ngram_offset):
+                ngram = arg_string[i:i + arg_ngram_size]
+
+                if ngram in ngrams:
+                    ngrams[ngram] += 1
+                else:
+                    ngrams[ngram] = 1
+        elif string_length > 0:
+            ngrams[arg_string] = 1
+
+        return ngrams
+
+    # --------------------------------------------------------------------------
+    @classmethod
+    def _count_ngram_sizes(cls, arg_string, arg_ngram_sizes):
+        """Counts the character ngrams of several sizes in a single scan.
+
+        Called by __generate_ngrams() on every cache miss of a multi-size
+        profile. Produces the same ngrams as calling _count_ngrams() once per
+        size, but visits every position of the string only once.
+
+        Args:
+            arg_string:             str
+                                    The lowercase string to generate ngrams
+                                    from.
+
+            arg_ngram_sizes:        tuple
+                                    The ngram sizes to use, each at least
+                                    __MIN_NGRAM_SIZE.
+
+        Returns:
+            tuple
+            A dict of the ngrams generated from the string per ngram size, in
+            the order of arg_ngram_sizes.
+        """
+
+        string_length = len(arg_string)
+
+        profiles = tuple({} for ngram_size in arg_ngram_sizes)
+        sized_profiles = list(zip(arg_ngram_sizes, profiles))
+
+        for i in range(0, string_length):
+            remaining_length = string_length - i
+
+            for ngram_size, ngrams in sized_profiles:
+                if ngram_size > remaining_length:
+                    continue
+
+                ngram = arg_string[i:i + ngram_size]
+
+                if ngram in ngrams:
+                    ngrams[ngram] += 1
+                else:
+                    ngrams[ngram] = 1
+
+        for ngram_size, ngrams in sized_profiles:
+            if 0 < string_length < ngram_size:
+                ngrams[arg_string] = 1
+
+        return profiles
+
+    # --------------------------------------------------------------------------
+    @classmethod
+    def __get_ngram_size(cls, arg_ngram_size):
+        """Validates an ngram size, raising sizes below __MIN_NGRAM_SIZE."""
+
+        try:
+            if arg_ngram_size < cls.__MIN_NGRAM_SIZE:
+                return cls.__MIN_NGRAM_SIZE
+        except TypeError:
+            raise CharNgramException("arg_ngram_size must be type int")
+
+        return arg_ngram_size
+
+    # --------------------------------------------------------------------------
+    @classmethod
+    def __generate_ngrams(
+        cls,
+        arg_string,
+        arg_ngram_size=__DEFAULT_NGRAM_SIZE,
+        arg_role=CharNgramCache.Role.REFERENCE
+    ):
+        """Generates a dict of lowercase ngrams from a string.
+
+        Creates a dict of ngrams where each ngram is the key and the value
+        reflects how many instances of that ngram were found in the string.
+        A class cache attribute is used to cache previously generated ngrams;
+        if the ngrams for the string already exist in the cache, they are
+        simply fetched from there. Forces ngrams to lowercase.
+
+        Given a tuple of ngram sizes, generates the ngrams of every size in a
+        single scan of the string and returns them as a tuple of dicts, one
+        per size, cached together as a single entry.
+
+        Args:
+            arg_string:             str
+                                    The string to generate ngrams from.
+
+            arg_ngram_size:         int|tuple (optional)
+                                    The ngram size to use, or a tuple of them.
+                                    The minimum valid value is 1.
+                                    Defaults to class attribute
+                                    __DEFAULT_NGRAM_SIZE.
+
+            arg_role:               int (optional)
+                                    The role the string plays in the
+                                    comparison, which decides how it is
+                                    cached. Valid values are
+                                    CharNgramCache.Role.REFERENCE and
+                                    CharNgramCache.Role.QUERY.
+                                    Defaults to
+                                    CharNgramCache.Role.REFERENCE.
+
+        Returns:
+            dict|tuple
+            A dict containing the ngrams generated from the string, or a tuple
+            of them if arg_ngram_size is a tuple.
+
+            Example:
+            {
+                "te": 1,
+                "es": 1,
+                "st": 1
+            }
+
+        Raises:
+            CharNgramException: if either arg type is invalid.
+        """
+
+        metrics = cls.__metrics
+
+        if cls.__cache is not None:
+            ngrams = cls.__cache.get(arg_ngram_size, arg_string, arg_role)
+
+            if metrics is not None:
+                if ngrams is None:
+                    metrics.increment("cache_misses")
+                else:
+                    metrics.increment("cache_hits")
+
+            if ngrams is not None:
+                return ngrams
+
+        ngrams = cls.__count_string_ngrams(arg_string, arg_ngram_size)
+
+        if cls.__cache is not None:
+            cls.__cache.put(arg_ngram_size, arg_string, ngrams, arg_role)
+
+        return ngrams
+
+    # --------------------------------------------------------------------------
+    @classmethod
+    def __count_string_ngrams(
+        cls,
+        arg_string,
+        arg_ngram_size=__DEFAULT_NGRAM_SIZE
+    ):
+        """Generates a dict of lowercase ngrams from a string, uncached.
+
+        See __generate_ngrams(), which calls this on every cache miss. Used
+        directly when compiling reference lists, whose ngrams are kept by the
+        compiled form and would only crowd the cache.
+
+        Raises:
+            CharNgramException: if either arg type is invalid.
+        """
+
+        metrics = cls.__metrics
+
+        if metrics is not None:
+            start = time.perf_counter()
+
+        try:
+            string = arg_string.lower()
+        except AttributeError:
+            raise CharNgramException("arg_string must be type str")
+
+        if isinstance(arg_ngram_size, tuple):
+            if not arg_ngram_size:
+                raise CharNgramException("arg_ngram_size must not be empty")
+
+            ngrams = cls._count_ngram_sizes(
+                string,
+                tuple(cls.__get_ngram_size(size) for size in arg_ngram_size)
+            )
+            ngram_count = sum(sum(sized.values()) for sized in ngrams)
+        else:
+            ngrams = cls._count_ngrams(
+                string,
+                cls.__get_ngram_size(arg_ngram_size)
+            )
+            ngram_count = sum(ngrams.values())
+
+        if metrics is not None:
+            metrics.record_time("profiling", time.perf_counter() - start)
+            metrics.increment("strings_profiled")
+            metrics.increment("ngrams_generated", ngram_count)
+
+        return ngrams
+
+# ------------------------------------------------------------------------------
+class WordNgram(CharNgram):
+    """Provides methods for fuzzy string searches using word ngrams.
+
+    Works exactly like CharNgram, with the same methods, arguments, scoring
+    and compiled reference lists, but splits strings into word ngrams rather
+    than character ngrams. A word is a run of letters, digits and underscores;
+    everything else separates words and is otherwise ignored. With an ngram
+    size of 1, strings are thus compared by their words, regardless of word
+    order, punctuation and spacing, and with larger sizes by runs of
+    consecutive words.
+
+    Long strings such as addresses or product titles have far fewer word
+    ngrams than character ngrams, so they are profiled, cached, indexed and
+    scored far more cheaply, and unrelated strings rarely share a word ngram
+    by chance. Words are interned, so the ngrams of many strings share their
+    word objects.
+
+    Reference lists compiled by WordNgram, e.g. with WordNgram.build_index(),
+    hold word ngrams and must only be compared against using WordNgram. Saved
+    ones can only be loaded with WordNgram.load() and WordNgram.open_index().
+    CharNgramShardPool takes the class to use as an argument.
+
+    WordNgram keeps its own ngram cache, separate from that of CharNgram, see
+    CharNgram.set_cache().
+
+    Example:
+        WordNgram.compare_string(
+            "12 Main Street",
+            "12 main st",
+            arg_ngram_size=1
+        )
+        -> 66.66666666666666
+
+    Author:
+        Juan Irming
+    """
+
+    # --------------------------------------------------------------------------
+    _ENGINE_ID = 1
+
+    __WORD_PATTERN = re.compile(r"\w+")
+
+    # --------------------------------------------------------------------------
+    @classmethod
+    def _count_ngrams(cls, arg_string, arg_ngram_size):
+        """Counts the word ngrams of a lowercase string.
+
+        Word ngrams are the words of the string joined by single spaces. Like
+        character ngrams, a string with fewer words than arg_ngram_size has all
+        of its words as its single ngram.
+
+        Args:
+            arg_string:             str
+                                    The lowercase string to generate ngrams
+                                    from.
+
+            arg_ngram_size:         int
+                                    The number of words per ngram, at least 1.
+
+        Returns:
+            dict
+            A dict containing the ngrams generated from the string.
+
+            Example (arg_ngram_size 2):
+            {
+                "12 main": 1,
+                "main street": 1
+            }
+        """
+
+        return cls.__count_word_ngrams(
+            cls.__split_words(arg_string),
+            arg_ngram_size
+        )
+
+    # --------------------------------------------------------------------------
+    @classmethod
+    def _count_ngram_sizes(cls, arg_string, arg_ngram_sizes):
+        """Counts the word ngrams of several sizes, splitting words only once.
+
+        See CharNgram._count_ngram_sizes().
+        """
+
+        words = cls.__split_words(arg_string)
+
+        return tuple(
+            cls.__count_word_ngrams(words, ngram_size)
+            for ngram_size in arg_ngram_sizes
+        )
+
+    # --------------------------------------------------------------------------
+    @classmethod
+    def __split_words(cls, arg_string):
+        """Splits a string into a list of interned words."""
+
+        return [
+            sys.intern(word) for word in cls.__WORD_PATTERN.findall(arg_string)
+        ]
+
+    # --------------------------------------------------------------------------
+    @staticmethod
+    def __count_word_ngrams(arg_words, arg_ngram_size):
+        """Counts the ngrams of a list of words. See _count_ngrams()."""
+
+        ngrams = {}
+
+        if len(arg_words) >= arg_ngram_size:
+            for i in range(0, len(arg_words) - (arg_ngram_size - 1)):
+                if arg_ngram_size == 1:
+                    ngram = arg_words[i]
+                else:
+                    ngram = sys.intern(
+                        " ".join(arg_words[i:i + arg_ngram_size])
+                    )
+
+                if ngram in ngrams:
+                    ngrams[ngram] += 1
+                else:
+                    ngrams[ngram] = 1
+        elif arg_words:
+            ngrams[sys.intern(" ".join(arg_words))] = 1
+
+        return ngrams
+
+# ------------------------------------------------------------------------------
+class CharNgramProfile(object):
+    """A compact, integer-encoded ngram profile of a string.
+
+    Stores the ngrams of a string as a sorted array of 64-bit integer keys,
+    see encode(), with a parallel array of counts, instead of a dict of short
+    strings. A profile therefore costs two arrays rather than one str object
+    per distinct ngram plus dict overhead, and two profiles are compared with
+    a merge join of their sorted keys, see CharNgram.compare_profiles().
+
+    Instances are normally created with CharNgram.build_profile().
+
+    Attributes:
+        keys:       array
+                    The encoded ngrams, sorted ascending.
+
+        counts:     array
+                    The number of occurrences of each encoded ngram.
+
+        total:      int
+                    The total number of ngrams, i.e. the sum of counts.
+
+    Author:
+        Juan Irming
+    """
+
+    __slots__ = ("keys", "counts", "total")
+
+    # --------------------------------------------------------------------------
+    __CODE_POINT_BITS = 21      # Enough for every Unicode code point + 1.
+    __MAX_PACKED_LENGTH = 3     # The longest ngram packed without hashing.
+    __HASHED_FLAG = 1 << 63     # Set on hashed keys, never on packed ones.
+
+    # --------------------------------------------------------------------------
+    def __init__(self, arg_ngrams):
+        """Encodes a dict of ngrams.
+
+        Args:
+            arg_ngrams:             dict
+                                    The ngrams to encode, as generated by
+                                    CharNgram.
+        """
+
+        encoded = sorted(
+            (self.encode(ngram), count) for ngram, count in arg_ngrams.items()
+        )
+
+        self.keys = array("Q", [key for key, count in encoded])
+        self.counts = array("I", [count for key, count in encoded])
+        self.total = sum(self.counts)
+
+    # --------------------------------------------------------------------------
+    def __len__(self):
+        """Returns the number of distinct ngrams."""
+
+        return len(self.keys)
+
+    # --------------------------------------------------------------------------
+    @classmethod
+    def from_arrays(cls, arg_keys, arg_counts, arg_total=None):
+        """Creates a profile from already encoded ngrams.
+
+        Args:
+            arg_keys:               array
+                                    The encoded ngrams, sorted ascending.
+
+            arg_counts:             array
+                                    The number of occurrences of each encoded
+                                    ngram.
+
+            arg_total:              int|None (optional)
+                                    The sum of arg_counts, if already known.
+                                    Defaults to None.
+
+        Returns:
+            CharNgramProfile
+            A profile holding the given arrays as they are.
+        """
+
+        profile = cls.__new__(cls)
+        profile.keys = arg_keys
+        profile.counts = arg_counts
+
+        if arg_total is None:
+            profile.total = sum(arg_counts)
+        else:
+            profile.total = arg_total
+
+        return profile
+
+    # --------------------------------------------------------------------------
+    @classmethod
+    def encode(cls, arg_ngram):
+        """Encodes an ngram as a 64-bit integer key.
+
+        Ngrams of up to three characters are packed exactly, 21 bits per code
+        point, so that e.g. all bigrams and trigrams get distinct keys. Longer
+        ngrams are hashed to 63 bits with BLAKE2b and flagged with the top bit;
+        distinct long ngrams thus only share a key in the astronomically
+        unlikely case of a hash collision. Keys are stable across processes.
+
+        Args:
+            arg_ngram:              str
+                                    The ngram to encode.
+
+        Returns:
+            int
+            The ngram's key, in the range [0, 2**64).
+
+            Example:
+            "te" -> 245366886
+        """
+
+        if len(arg_ngram) <= cls.__MAX_PACKED_LENGTH:
+            key = 0
+
+            for character in arg_ngram:
+                key = (key << cls.__CODE_POINT_BITS) | (ord(character) + 1)
+
+            return key
+
+        digest = hashlib.blake2b(
+            arg_ngram.encode("utf-8", "surrogatepass"),
+            digest_size=8
+        ).digest()
+
+        return int.from_bytes(digest, "little") | cls.__HASHED_FLAG
+
+# ------------------------------------------------------------------------------
+class CharNgramReferenceSet(object):
+    """A frozen list of reference strings with precompiled ngram profiles.
+
+    Holds every reference string together with its CharNgramProfile and its
+    total number of ngrams, all computed once when the set is compiled and
+    never modified afterwards. Attributes cannot be reassigned and only hold
+    tuples, read-only mappings and read-only memoryviews, including the keys
+    and counts of the profiles. Comparing against a reference set thus only
+    profiles the input string.
+
+    Reference strings are also partitioned into buckets by ngram total. Since
+    the score bound of a reference string only depends on its ngram total and
+    that of the input string, comparisons with a minimum score only scan the
+    buckets that can reach it, without touching the profiles of the others.
+    A short input string is thus never scored against long reference strings
+    it cannot match closely enough, and vice versa.
+
+    Instances are normally created with CharNgram.compile() and passed to
+    CharNgram.compare_list() and friends in place of a reference list.
+
+    Attributes:
+        ngram_size: int
+                    The ngram size the profiles were built with.
+
+        references: tuple
+                    The reference strings, in their original order.
+
+        profiles:   tuple
+                    The CharNgramProfile of each reference string, with
+                    read-only memoryviews as keys and counts.
+
+        totals:     memoryview
+                    The total number of ngrams of each reference string,
+                    read-only.
+
+        unique_ids: tuple
+                    The reference id of the first occurrence of each distinct
+                    reference string, ascending.
+
+        buckets:    mappingproxy
+                    The reference ids of the reference strings of each ngram
+                    total, ascending, as read-only memoryviews keyed by ngram
+                    total.
+
+        unique_buckets:
+                    mappingproxy
+                    Likewise, but only the reference ids in unique_ids.
+
+        engine_id:  int
+                    The _ENGINE_ID of the CharNgram class that built the
+                    profiles.
+
+    Author:
+        Juan Irming
+    """
+
+    __slots__ = (
+        "ngram_size", "references", "profiles", "totals",
+        "unique_ids", "buckets", "unique_buckets", "engine_id"
+    )
+
+    # --------------------------------------------------------------------------
+    def __init__(
+        self,
+        arg_ngram_size,
+        arg_reference_list,
+        arg_reference_profiles,
+        arg_engine_id=0
+    ):
+        """Freezes reference strings and their profiles.
+
+        Args:
+            arg_ngram_size:         int
+                                    The ngram size the profiles were built
+                                    with.
+
+            arg_reference_list:     list
+                                    The reference strings. The reference id of
+                                    each is its position in the list.
+
+            arg_reference_profiles: list
+                                    The CharNgramProfile of each reference
+                                    string, in the same order.
+
+            arg_engine_id:          int (optional)
+                                    The _ENGINE_ID of the CharNgram class that
+                                    built the profiles.
+                                    Defaults to 0, i.e. CharNgram.
+        """
+
+        first_ids = {}
+
+        for reference_id, reference_string in enumerate(arg_reference_list):
+            first_ids.setdefault(reference_string, reference_id)
+
+        object.__setattr__(self, "ngram_size", arg_ngram_size)
+        object.__setattr__(self, "engine_id", arg_engine_id)
+        object.__setattr__(self, "references", tuple(arg_reference_list))
+        object.__setattr__(
+            self,
+            "profiles",
+            tuple(
+                CharNgramProfile.from_arrays(
+                    memoryview(profile.keys).toreadonly(),
+                    memoryview(profile.counts).toreadonly(),
+                    profile.total
+                )
+                for profile in arg_reference_profiles
+            )
+        )
+        object.__setattr__(
+            self,
+            "totals",
+            memoryview(
+                array(
+                    "I",
+                    [profile.total for profile in arg_reference_profiles]
+                )
+            ).toreadonly()
+        )
+        object.__setattr__(
+            self,
+            "unique_ids",
+            tuple(sorted(first_ids.values()))
+        )
+        object.__setattr__(
+            self,
+            "buckets",
+            self.__get_buckets(range(len(self.references)))
+        )
+        object.__setattr__(
+            self,
+            "unique_buckets",
+            self.__get_buckets(self.unique_ids)
+        )
+
+    # --------------------------------------------------------------------------
+    def __setattr__(self, arg_name, arg_value):
+        """Prevents modification of the frozen reference set."""
+
+        raise AttributeError("CharNgramReferenceSet is frozen")
+
+    # --------------------------------------------------------------------------
+    def __delattr__(self, arg_name):
+        """Prevents modification of the frozen reference set."""
+
+        raise AttributeError("CharNgramReferenceSet is frozen")
+
+    # --------------------------------------------------------------------------
+    def __len__(self):
+        """Returns the number of reference strings."""
+
+        return len(self.references)
+
+    # --------------------------------------------------------------------------
+    def save(self, arg_path):
+        """Saves the reference set to a file.
+
+        Writes the reference strings, their ngram totals and the keys and
+        counts of every profile as flat arrays, see _write_file(), so that
+        CharNgram.load() can restore the set without generating any ngrams.
+
+        Args:
+            arg_path:               str
+                                    The path of the file to write. An existing
+                                    file is replaced.
+
+        Raises:
+            OSError:                if the file cannot be written.
+        """
+
+        profile_offsets = array("Q", [0])
+        keys = array("Q")
+        counts = array("I")
+
+        for profile in self.profiles:
+            keys.extend(profile.keys)
+            counts.extend(profile.counts)
+            profile_offsets.append(len(keys))
+
+        string_offsets, strings = _encode_strings(self.references)
+
+        _write_file(
+            arg_path,
+            _FILE_KIND_REFERENCE_SET,
+            self.engine_id,
+            self.ngram_size,
+            [string_offsets, strings, array("I", self.totals), profile_offsets,
+             keys, counts]
+        )
+
+    # --------------------------------------------------------------------------
+    @classmethod
+    def from_bytes(cls, arg_data):
+        """Restores a reference set from the contents of a saved file.
+
+        Args:
+            arg_data:               bytes
+                                    The contents of a file written by save().
+
+        Returns:
+            CharNgramReferenceSet
+            The restored reference set.
+
+        Raises:
+            CharNgramException: if arg_data is not a valid reference set file.
+        """
+
+        ngram_size, engine_id, sections = _read_file(
+            arg_data,
+            _FILE_KIND_REFERENCE_SET,
+            "QBIQQI"
+        )
+
+        string_offsets, strings, totals, profile_offsets, keys, counts = [
+            _to_array(section) for section in sections
+        ]
+
+        references = _decode_strings(string_offsets, strings)
+
+        if len(totals) != len(references) or (
+            len(profile_offsets) != len(references) + 1
+        ) or len(keys) != len(counts) or not _is_offsets(
+            profile_offsets,
+            len(keys)
+        ):
+            raise CharNgramException("file is corrupt")
+
+        profiles = [
+            CharNgramProfile.from_arrays(
+                keys[start:end],
+                counts[start:end],
+                total
+            )
+            for start, end, total in zip(
+                profile_offsets,
+                profile_offsets[1:],
+                totals
+            )
+        ]
+
+        return cls(ngram_size, references, profiles, engine_id)
+
+    # --------------------------------------------------------------------------
+    def __get_buckets(self, arg_reference_ids):
+        """Partitions reference ids by the ngram total of their strings.
+
+        Args:
+            arg_reference_ids:      iterable
+                                    The reference ids to partition, ascending.
+
+        Returns:
+            mappingproxy
+            A read-only mapping of each ngram total to a read-only memoryview
+            of the reference ids of that total, ascending.
+        """
+
+        buckets = {}
+
+        for reference_id in arg_reference_ids:
+            total = self.totals[reference_id]
+
+            if total not in buckets:
+                buckets[total] = array("I")
+
+            buckets[total].append(reference_id)
+
+        return MappingProxyType(
+            {
+                total: memoryview(bucket).toreadonly()
+                for total, bucket in buckets.items()
+            }
+        )
+
+# ------------------------------------------------------------------------------
+class CharNgramIndex(object):
+    """An inverted index of reference strings keyed by ngram.
+
+    Maps every ngram to a posting list of reference ids and counts, where the
+    reference id is the position of the reference string in the list the index
+    was built from and the count is how many times the ngram occurs in that
+    reference string. Ngrams are keyed by their CharNgramProfile.encode()
+    integer and posting lists are stored as pairs of compact arrays. Also
+    keeps the total number of ngrams of each reference string so that
+    percentage scores can be computed without regenerating any ngrams.
+
+    Instances are normally created with CharNgram.build_index() and passed to
+    CharNgram.compare_list() in place of a reference list.
+
+    An index can also be kept up to date as its reference strings change, with
+    CharNgram.add_reference(), CharNgram.remove_reference() and
+    CharNgram.update_reference(), in time proportional to the number of ngrams
+    of the reference string. Reference ids are then any int from 0 to
+    2**32 - 1, e.g. a product number, and are what ReturnBy.INDEX returns.
+    Internally, every reference string added occupies a new slot at the end of
+    the posting lists, and removing it only leaves a tombstone there, which
+    queries skip. Once tombstones outnumber the reference strings, the index
+    is compacted, see compact(). Queries return the same results as against
+    an index built from scratch from the current reference strings.
+
+    Attributes:
+        ngram_size: int
+                    The ngram size the index was built with.
+
+        engine_id:  int
+                    The _ENGINE_ID of the CharNgram class that built the index.
+
+    Author:
+        Juan Irming
+    """
+
+    # --------------------------------------------------------------------------
+    __NO_POSTINGS = (array("I"), array("I"))    # Posting list of ngrams that
+                                                # occur in no reference string.
+
+    __MAX_REFERENCE_ID = 2 ** 32 - 1            # Posting lists store reference
+                                                # ids as unsigned 32-bit ints.
+
+    # --------------------------------------------------------------------------
+    def __init__(self, arg_ngram_size, arg_engine_id=0):
+        """Creates an empty index.
+
+        Args:
+            arg_ngram_size:         int
+                                    The ngram size the indexed ngrams were
+                                    generated with.
+
+            arg_engine_id:          int (optional)
+                                    The _ENGINE_ID of the CharNgram class that
+                                    generated the indexed ngrams.
+                                    Defaults to 0, i.e. CharNgram.
+        """
+
+        self.ngram_size = arg_ngram_size
+        self.engine_id = arg_engine_id
+
+        self.__references = []  # slot -> reference string, None if removed
+        self.__totals = []      # slot -> ngram total, 0 if removed
+        self.__postings = {}    # encoded ngram -> (slots, counts)
+
+        # While every slot holds the reference string whose reference id is
+        # the slot itself, as in indexes built by CharNgram.build_index(),
+        # both of these are None. Otherwise they map slots to reference ids
+        # (None if removed) and reference ids to slots.
+        self.__ids = None
+        self.__slots = None
+
+        self.__next_id = 0      # Reference id used by append() if __ids.
+        self.__tombstones = 0   # Number of slots of removed reference strings.
+
+    # --------------------------------------------------------------------------
+    def __len__(self):
+        """Returns the number of indexed reference strings."""
+
+        return len(self.__references) - self.__tombstones
+
+    # --------------------------------------------------------------------------
+    def __contains__(self, arg_reference_id):
+        """Returns whether a reference id is in the index.
+
+        Like add() and remove(), does not accept bools as reference ids.
+        """
+
+        if isinstance(arg_reference_id, bool):
+            return False
+
+        if self.__slots is not None:
+            return arg_reference_id in self.__slots
+
+        return (
+            isinstance(arg_reference_id, int)
+            and 0 <= arg_reference_id < len(self.__references)
+        )
+
+    # --------------------------------------------------------------------------
+    def append(self, arg_reference_string, arg_reference_ngrams):
+        """Adds a reference string to the end of the index.
+
+        Args:
+            arg_reference_string:   str
+                                    The reference string to add. Its reference
+                                    id is one above the highest reference id
+                                    ever added, i.e. its position in the index
+                                    unless reference strings have been added
+                                    with add() or removed.
+
+            arg_reference_ngrams:   dict
+                                    The ngrams generated from the reference
+                                    string.
+        """
+
+        if self.__ids is None:
+            reference_id = len(self.__references)
+        else:
+            reference_id = self.__next_id
+
+        self.add(reference_id, arg_reference_string, arg_reference_ngrams)
+
+    # --------------------------------------------------------------------------
+    def add(self, arg_reference_id, arg_reference_string, arg_reference_ngrams):
+        """Adds a reference string to the index under a given reference id.
+
+        Args:
+            arg_reference_id:       int
+                                    The reference id of the reference string,
+                                    from 0 to 2**32 - 1, not yet in the index.
+
+            arg_reference_string:   str
+                                    The reference string to add.
+
+            arg_reference_ngrams:   dict
+                                    The ngrams generated from the reference
+                                    string.
+
+        Raises:
+            CharNgramException: if arg_reference_id is invalid or already in
+                                the index.
+        """
+
+        if (
+            not isinstance(arg_reference_id, int)
+            or isinstance(arg_reference_id, bool)
+        ):
+            raise CharNgramException("arg_reference_id must be type int")
+
+        if not 0 <= arg_reference_id <= self.__MAX_REFERENCE_ID:
+            raise CharNgramException(
+                "arg_reference_id must be from 0 to %d"
+                % self.__MAX_REFERENCE_ID
+            )
+
+        if arg_reference_id in self:
+            raise CharNgramException(
+                "reference id %d is already in the index" % arg_reference_id
+            )
+
+        slot = len(self.__references)
+
+        if self.__ids is None and arg_reference_id != slot:
+            self.__map_slots()
+
+        self.__references.append(arg_reference_string)
+        self.__totals.append(sum(arg_reference_ngrams.values()))
+
+        if self.__ids is not None:
+            self.__ids.append(arg_reference_id)
+            self.__slots[arg_reference_id] = slot
+            self.__next_id = max(self.__next_id, arg_reference_id + 1)
+
+        for ngram, count in arg_reference_ngrams.items():
+            key = CharNgramProfile.encode(ngram)
+
+            if key not in self.__postings:
+                self.__postings[key] = (array("I"), array("I"))
+
+            slots, counts = self.__postings[key]
+            slots.append(slot)
+            counts.append(count)
+
+    # --------------------------------------------------------------------------
+    def remove(self, arg_reference_id):
+        """Removes a reference string from the index.
+
+        Only marks the slot of the reference string as a tombstone, leaving its
+        posting list entries in place until the index is compacted. Compacts
+        the index once tombstones outnumber the remaining reference strings, so
+        that the cost of compaction is spread over the removals leading up to
+        it.
+
+        Args:
+            arg_reference_id:       int
+                                    The reference id of the reference string to
+                                    remove.
+
+        Raises:
+            CharNgramException: if arg_reference_id is not in the index.
+        """
+
+        if arg_reference_id not in self:
+            raise CharNgramException(
+                "reference id %r is not in the index" % (arg_reference_id,)
+            )
+
+        if self.__ids is None:
+            self.__map_slots()
+
+        slot = self.__slots.pop(arg_reference_id)
+
+        self.__ids[slot] = None
+        self.__references[slot] = None
+        self.__totals[slot] = 0
+        self.__tombstones += 1
+
+        if self.__tombstones > len(self):
+            self.compact()
+
+    # --------------------------------------------------------------------------
+    def compact(self):
+        """Drops the tombstones of removed reference strings.
+
+        Rebuilds the posting lists without the slots of removed reference
+        strings, with the remaining reference strings in ascending order of
+        reference id. Takes time proportional to the total length of all
+        posting lists.
+        """
+
+        if self.__ids is None:
+            return
+
+        live = sorted(self.__slots.items())   # (reference id, old slot)
+
+        new_slots = [None] * len(self.__references)
+
+        for new_slot, (reference_id, old_slot) in enumerate(live):
+            new_slots[old_slot] = new_slot
+
+        postings = {}
+
+        for key, (slots, counts) in self.__postings.items():
+            entries = sorted(
+                (new_slots[slot], count)
+                for slot, count in zip(slots, counts)
+                if new_slots[slot] is not None
+            )
+
+            if entries:
+                postings[key] = (
+                    array("I", [slot for slot, count in entries]),
+                    array("I", [count for slot, count in entries])
+                )
+
+        self.__references = [self.__references[slot] for _, slot in live]
+        self.__totals = [self.__totals[slot] for _, slot in live]
+        self.__postings = postings
+        self.__tombstones = 0
+
+        if all(
+            reference_id == new_slot
+            for new_slot, (reference_id, _) in enumerate(live)
+        ):
+            self.__ids = None
+            self.__slots = None
+        else:
+            self.__ids = [reference_id for reference_id, _ in live]
+            self.__slots = {
+                reference_id: new_slot
+                for new_slot, reference_id in enumerate(self.__ids)
+            }
+
+    # --------------------------------------------------------------------------
+    def get_matches(self, arg_input_ngrams):
+        """Counts the ngram matches of an input string per reference string.
+
+        Walks the posting list of each input ngram, so only reference strings
+        sharing at least one ngram with the input string are visited.
+
+        Args:
+            arg_input_ngrams:       dict
+                                    The ngrams generated from the input string.
+
+        Returns:
+            dict
+            A dict mapping the reference id of each reference string sharing
+            at least one ngram with the input string to its number of ngram
+            matches, as counted by CharNgram.compare_string() with
+            Scoring.MATCHES.
+
+            Example:
+            {
+                0: 1,
+                8: 2
+            }
+        """
+
+        matches = {}
+
+        for ngram, input_count in arg_input_ngrams.items():
+            for slot, reference_count in zip(
+                *self.__postings.get(
+                    CharNgramProfile.encode(ngram),
+                    self.__NO_POSTINGS
+                )
+            ):
+                if reference_count > input_count:
+                    reference_count = input_count
+
+                matches[slot] = matches.get(slot, 0) + reference_count
+
+        if self.__ids is None:
+            return matches
+
+        ids = self.__ids
+
+        return {
+            ids[slot]: slot_matches
+            for slot, slot_matches in matches.items()
+            if ids[slot] is not None
+        }
+
+    # --------------------------------------------------------------------------
+    def get_postings(self, arg_ngram):
+        """Returns the posting list of an ngram.
+
+        Args:
+            arg_ngram:              str
+                                    The ngram to look up.
+
+        Returns:
+            tuple
+            Two arrays of equal length: the reference ids, ascending, and the
+            number of times the ngram occurs in each of those reference
+            strings. Both are empty if the ngram does not occur in any
+            reference string.
+        """
+
+        postings = self.__postings.get(
+            CharNgramProfile.encode(arg_ngram),
+            self.__NO_POSTINGS
+        )
+
+        if self.__ids is None:
+            return postings
+
+        entries = sorted(
+            (self.__ids[slot], count)
+            for slot, count in zip(*postings)
+            if self.__ids[slot] is not None
+        )
+
+        return (
+            array("I", [reference_id for reference_id, count in entries]),
+            array("I", [count for reference_id, count in entries])
+        )
+
+    # --------------------------------------------------------------------------
+    def get_reference(self, arg_reference_id):
+        """Returns the reference string with the given reference id."""
+
+        if self.__slots is None:
+            return self.__references[arg_reference_id]
+
+        return self.__references[self.__slots[arg_reference_id]]
+
+    # --------------------------------------------------------------------------
+    def get_reference_ids(self):
+        """Returns the reference ids of the index, ascending."""
+
+        if self.__slots is None:
+            return range(len(self.__references))
+
+        return sorted(self.__slots)
+
+    # --------------------------------------------------------------------------
+    def get_total(self, arg_reference_id):
+        """Returns the number of ngrams of the given reference string."""
+
+        if self.__slots is None:
+            return self.__totals[arg_reference_id]
+
+        return self.__totals[self.__slots[arg_reference_id]]
+
+    # --------------------------------------------------------------------------
+    def __map_slots(self):
+        """Starts mapping slots to reference ids and back.
+
+        Called the first time a reference string is removed or added out of
+        order. Until then, every slot is its own reference id.
+        """
+
+        self.__ids = list(range(len(self.__references)))
+        self.__slots = {slot: slot for slot in self.__ids}
+        self.__next_id = len(self.__references)
+
+    # --------------------------------------------------------------------------
+    def save(self, arg_path):
+        """Saves the index to a file.
+
+        Writes the reference strings, their ngram totals and every posting
+        list as flat arrays, see _write_file(). Posting lists are written in
+        ascending order of their encoded ngrams and delimited by an array of
+        offsets, so that CharNgram.load() can restore the index without
+        generating any ngrams.
+
+        Args:
+            arg_path:               str
+                                    The path of the file to write. An existing
+                                    file is replaced.
+
+        Raises:
+            CharNgramException: if the reference ids are not 0 to
+                                len(self) - 1. Removed reference strings are
+                                compacted away first, see compact().
+            OSError:            if the file cannot be written.
+        """
+
+        if self.__ids is not None:
+            self.compact()
+
+            if self.__ids is not None:
+                raise CharNgramException(
+                    "only indexes with reference ids 0 to len - 1 can be saved"
+                )
+
+        keys = array("Q", sorted(self.__postings))
+        posting_offsets = array("Q", [0])
+        reference_ids = array("I")
+        counts = array("I")
+
+        for key in keys:
+            key_reference_ids, key_counts = self.__postings[key]
+            reference_ids.extend(key_reference_ids)
+            counts.extend(key_counts)
+            posting_offsets.append(len(reference_ids))
+
+        string_offsets, strings = _encode_strings(self.__references)
+
+        _write_file(
+            arg_path,
+            _FILE_KIND_INDEX,
+            self.engine_id,
+            self.ngram_size,
+            [string_offsets, strings, array("I", self.__totals), keys,
+             posting_offsets, reference_ids, counts]
+        )
+
+    # --------------------------------------------------------------------------
+    @classmethod
+    def from_bytes(cls, arg_data):
+        """Restores an index from the contents of a saved file.
+
+        Args:
+            arg_data:               bytes
+                                    The contents of a file written by save().
+
+        Returns:
+            CharNgramIndex
+            The restored index.
+
+        Raises:
+            CharNgramException: if arg_data is not a valid index file.
+        """
+
+        ngram_size, engine_id, sections = _read_file(
+            arg_data,
+            _FILE_KIND_INDEX,
+            "QBIQQII"
+        )
+
+        (
+            string_offsets, strings, totals, keys, posting_offsets,
+            reference_ids, counts
+        ) = [_to_array(section) for section in sections]
+
+        _check_index_sections(
+            string_offsets, strings, totals, keys, posting_offsets,
+            reference_ids, counts
+        )
+
+        references = _decode_strings(string_offsets, strings)
+
+        index = cls(ngram_size, engine_id)
+        index.__references = references
+        index.__totals = totals.tolist()
+        index.__postings = {
+            key: (reference_ids[start:end], counts[start:end])
+            for key, start, end in zip(
+                keys,
+                posting_offsets,
+                posting_offsets[1:]
+            )
+        }
+
+        return index
+
+# ------------------------------------------------------------------------------
+class CharNgramMappedIndex(object):
+    """A read-only inverted index read in place from a memory-mapped file.
+
+    Provides the same lookups as CharNgramIndex, but over a file written by
+    CharNgramIndex.save() rather than over Python dicts and lists. The sorted
+    ngram keys, posting lists, ngram totals and reference strings are all
+    zero-copy memoryview casts of the mapped file; a posting list is found by
+    bisecting the keys and reference strings are only decoded when asked
+    for. Memory use is thus bounded by the pages the operating system keeps
+    cached, rather than by the size of the reference list.
+
+    Instances are normally created with CharNgram.open_index() and passed to
+    CharNgram.compare_list() in place of a reference list. They can be used
+    as context managers, closing the mapping on exit.
+
+    Attributes:
+        ngram_size: int
+                    The ngram size the index was built with.
+
+        engine_id:  int
+                    The _ENGINE_ID of the CharNgram class that built the index.
+
+    Author:
+        Juan Irming
+    """
+
+    # --------------------------------------------------------------------------
+    def __init__(self, arg_path):
+        """Memory-maps an index file.
+
+        Args:
+            arg_path:               str
+                                    The path of a file written by
+                                    CharNgramIndex.save().
+
+        Raises:
+            CharNgramException: if the file is not a valid index file, its
+                                format version is not supported or the
+                                platform is big-endian.
+            OSError:            if the file cannot be opened.
+        """
+
+        if sys.byteorder == "big":
+            raise CharNgramException(
+                "memory-mapped indexes require a little-endian platform"
+            )
+
+        self.__views = []
+
+        with open(arg_path, "rb") as file:
+            try:
+                self.__mmap = mmap.mmap(
+                    file.fileno(),
+                    0,
+                    access=mmap.ACCESS_READ
+                )
+            except ValueError:  # Raised for empty files.
+                raise CharNgramException("file is not a fuzzjunkie file")
+
+        sections = []
+
+        try:
+            self.ngram_size, self.engine_id, sections = _read_file(
+                self.__mmap,
+                _FILE_KIND_INDEX,
+                "QBIQQII"
+            )
+
+            for typecode, data in sections:
+                self.__views.append(data.cast(typecode))
+
+            for typecode, data in sections:
+                data.release()
+
+            (
+                self.__string_offsets, self.__strings, self.__totals,
+                self.__keys, self.__posting_offsets, self.__reference_ids,
+                self.__counts
+            ) = self.__views
+
+            _check_index_sections(*self.__views)
+        except BaseException:
+            # Whatever went wrong, the mapping must not outlive the failure,
+            # and it cannot be closed while views of it exist.
+            for typecode, data in sections:
+                data.release()
+
+            self.close()
+            raise
+
+    # --------------------------------------------------------------------------
+    def __len__(self):
+        """Returns the number of indexed reference strings."""
+
+        return len(self.__totals)
+
+    # --------------------------------------------------------------------------
+    def __enter__(self):
+        """Returns the index itself."""
+
+        return self
+
+    # --------------------------------------------------------------------------
+    def __exit__(self, arg_type, arg_value, arg_traceback):
+        """Closes the index."""
+
+        self.close()
+
+    # --------------------------------------------------------------------------
+    def close(self):
+        """Releases the views of the file and unmaps it.
+
+        Posting lists returned by get_postings() must not be used afterwards.
+        """
+
+        for view in self.__views:
+            view.release()
+
+        self.__views = []
+        self.__mmap.close()
+
+    # --------------------------------------------------------------------------
+    def get_matches(self, arg_input_ngrams):
+        """Counts the ngram matches of an input string per reference string.
+
+        See CharNgramIndex.get_matches().
+        """
+
+        matches = {}
+
+        for ngram, input_count in arg_input_ngrams.items():
+            for reference_id, reference_count in zip(*self.get_postings(ngram)):
+                if reference_count > input_count:
+                    reference_count = input_count
+
+                matches[reference_id] = (
+                    matches.get(reference_id, 0) + reference_count
+                )
+
+        return matches
+
+    # --------------------------------------------------------------------------
+    def get_postings(self, arg_ngram):
+        """Returns the posting list of an ngram.
+
+        See CharNgramIndex.get_postings(). The two sequences returned are
+        memoryviews of the mapped file rather than arrays.
+
+        Raises:
+            ValueError: if the index is closed.
+        """
+
+        key = CharNgramProfile.encode(arg_ngram)
+        position = bisect.bisect_left(self.__keys, key)
+
+        if position == len(self.__keys) or self.__keys[position] != key:
+            return (), ()
+
+        start = self.__posting_offsets[position]
+        end = self.__posting_offsets[position + 1]
+
+        return self.__reference_ids[start:end], self.__counts[start:end]
+
+    # --------------------------------------------------------------------------
+    def get_reference(self, arg_reference_id):
+        """Returns the reference string with the given reference id."""
+
+        return str(
+            self.__strings[
+                self.__string_offsets[arg_reference_id]:
+                self.__string_offsets[arg_reference_id + 1]
+            ],
+            "utf-8",
+            "surrogatepass"
+        )
+
+    # --------------------------------------------------------------------------
+    def get_total(self, arg_reference_id):
+        """Returns the number of ngrams of the given reference string."""
+
+        return self.__totals[arg_reference_id]
+
+# ------------------------------------------------------------------------------
+class CharNgramMatrix(object):
+    """A sparse matrix of ngram counts of reference strings.
+
+    Stores the ngram counts of a list of reference strings as a compressed
+    sparse row (CSR) matrix of numpy arrays, with one row per reference string
+    and one column per distinct ngram. The ngram matches of an input string
+    against every reference string are counted by taking the element-wise
+    minimum of each stored count and the input string's count of the same
+    ngram, and summing the minimums per row, all in vectorized numpy code.
+
+    Instances are normally created with CharNgram.build_matrix() and passed to
+    CharNgram.compare_list() in place of a reference list. Requires numpy.
+
+    Attributes:
+        ngram_size: int
+                    The ngram size the matrix was built with.
+
+        engine_id:  int
+                    The _ENGINE_ID of the CharNgram class that built the
+                    matrix.
+
+    Author:
+        Juan Irming
+    """
+
+    # --------------------------------------------------------------------------
+    def __init__(
+        self,
+        arg_ngram_size,
+        arg_reference_list,
+        arg_reference_ngrams,
+        arg_engine_id=0
+    ):
+        """Encodes reference strings and their ngrams as a matrix.
+
+        Args:
+            arg_ngram_size:         int
+                                    The ngram size the ngrams were generated
+                                    with.
+
+            arg_reference_list:     list
+                                    The reference strings. The reference id of
+                                    each is its position in the list.
+
+            arg_reference_ngrams:   list
+                                    The ngram dict of each reference string,
+                                    in the same order.
+
+            arg_engine_id:          int (optional)
+                                    The _ENGINE_ID of the CharNgram class that
+                                    generated the reference ngrams.
+                                    Defaults to 0, i.e. CharNgram.
+
+        Raises:
+            CharNgramException: if numpy is not installed.
+        """
+
+        if numpy is None:
+            raise CharNgramException("CharNgramMatrix requires numpy")
+
+        self.ngram_size = arg_ngram_size
+        self.engine_id = arg_engine_id
+
+        self.__references = list(arg_reference_list)
+        self.__totals = []
+        self.__columns = {}     # ngram -> column
+
+        row_lengths = []
+        columns = []
+        counts = []
+
+        for reference_ngrams in arg_reference_ngrams:
+            for ngram, count in reference_ngrams.items():
+                if ngram not in self.__columns:
+                    self.__columns[ngram] = len(self.__columns)
+
+                columns.append(self.__columns[ngram])
+                counts.append(count)
+
+            row_lengths.append(len(reference_ngrams))
+            self.__totals.append(sum(reference_ngrams.values()))
+
+        # The column and count of every stored count, row by row as in CSR,
+        # plus its row, so that counts can be summed per row with a single
+        # bincount.
+        self.__indices = numpy.array(columns, dtype=numpy.int64)
+        self.__data = numpy.array(counts, dtype=numpy.int64)
+        self.__rows = numpy.repeat(
+            numpy.arange(len(row_lengths), dtype=numpy.int64),
+            row_lengths
+        )
+
+    # --------------------------------------------------------------------------
+    def __len__(self):
+        """Returns the number of encoded reference strings."""
+
+        return len(self.__references)
+
+    # --------------------------------------------------------------------------
+    def get_matches(self, arg_input_ngrams):
+        """Counts the ngram matches of an input string per reference string.
+
+        Args:
+            arg_input_ngrams:       dict
+                                    The ngrams generated from the input string.
+
+        Returns:
+            dict
+            A dict mapping the reference id of each reference string sharing
+            at least one ngram with the input string to its number of ngram
+            matches. See CharNgramIndex.get_matches().
+        """
+
+        input_counts = numpy.zeros(len(self.__columns), dtype=numpy.int64)
+
+        for ngram, count in arg_input_ngrams.items():
+            column = self.__columns.get(ngram)
+
+            if column is not None:
+                input_counts[column] = count
+
+        row_matches = numpy.bincount(
+            self.__rows,
+            weights=numpy.minimum(self.__data, input_counts[self.__indices]),
+            minlength=len(self.__references)
+        ).astype(numpy.int64)
+
+        reference_ids = numpy.flatnonzero(row_matches)
+
+        return dict(
+            zip(reference_ids.tolist(), row_matches[reference_ids].tolist())
+        )
+
+    # --------------------------------------------------------------------------
+    def get_reference(self, arg_reference_id):
+        """Returns the reference string with the given reference id."""
+
+        return self.__references[arg_reference_id]
+
+    # --------------------------------------------------------------------------
+    def get_total(self, arg_reference_id):
+        """Returns the number of ngrams of the given reference string."""
+
+        return self.__totals[arg_reference_id]
+
+# ------------------------------------------------------------------------------
+class CharNgramMinHashIndex(object):
+    """An approximate index of reference strings using MinHash and LSH.
+
+    Summarizes the set of distinct ngrams of every reference string as a
+    MinHash signature of bands * rows hash values and files the signature
+    under one bucket per band, each bucket keyed by the band's rows of hash
+    values (banded locality-sensitive hashing). A query hashes the input
+    string the same way and only looks up its own bucket in every band; the
+    reference strings found there are the candidates, which CharNgram then
+    scores exactly, just like compare_list() would. Reference strings that
+    are not candidates are treated as if they shared no ngram with the input
+    string.
+
+    The chance that a reference string becomes a candidate only depends on
+    the Jaccard similarity s of its set of distinct ngrams and that of the
+    input string (not to be confused with Scoring.JACCARD, which counts
+    repeated ngrams), and is 1 - (1 - s**rows)**bands, see get_recall().
+    With the default 32 bands of 4 rows:
+
+        s       0.2     0.3     0.4     0.5     0.6     0.7     0.8
+        recall  0.050   0.229   0.564   0.873   0.988   0.9998  1.0
+
+    More bands raise the recall at the cost of larger tables and more
+    candidates to score, while more rows per band cut the candidates of low
+    similarity at the cost of recall. Results are deterministic for a given
+    arg_seed.
+
+    Instances are normally created with CharNgram.build_minhash_index() and
+    passed to CharNgram.compare_list() in place of a reference list. Uses
+    numpy, if installed, to compute signatures.
+
+    Attributes:
+        ngram_size: int
+                    The ngram size the index was built with.
+
+        bands:      int
+                    The number of bands of each signature.
+
+        rows:       int
+                    The number of hash values per band.
+
+        engine_id:  int
+                    The _ENGINE_ID of the CharNgram class that built the index.
+
+    Author:
+        Juan Irming
+    """
+
+    # --------------------------------------------------------------------------
+    __HASH_MASK = 2 ** 64 - 1   # Hash values are computed modulo 2**64.
+    __HASH_SHIFT = 32           # And only their top 32 bits are kept.
+
+    # --------------------------------------------------------------------------
+    def __init__(
+        self,
+        arg_ngram_size,
+        arg_bands=32,
+        arg_rows=4,
+        arg_seed=0,
+        arg_engine_id=0
+    ):
+        """Creates an empty index.
+
+        Args:
+            arg_ngram_size:         int
+                                    The ngram size the indexed ngrams were
+                                    generated with.
+
+            arg_bands:              int (optional)
+                                    The number of bands, i.e. of buckets each
+                                    reference string is filed under.
+                                    Defaults to 32.
+
+            arg_rows:               int (optional)
+                                    The number of hash values per band.
+                                    Defaults to 4.
+
+            arg_seed:               int (optional)
+                                    The seed of the hash functions.
+                                    Defaults to 0.
+
+            arg_engine_id:          int (optional)
+                                    The _ENGINE_ID of the CharNgram class that
+                                    generated the indexed ngrams.
+                                    Defaults to 0, i.e. CharNgram.
+
+        Raises:
+            CharNgramException: if arg_bands or arg_rows is invalid.
+        """
+
+        for name, value in [("arg_bands", arg_bands), ("arg_rows", arg_rows)]:
+            try:
+                if value < 1:
+                    raise CharNgramException("%s must be at least 1" % name)
+            except TypeError:
+                raise CharNgramException("%s must be type int" % name)
+
+        self.ngram_size = arg_ngram_size
+        self.bands = arg_bands
+        self.rows = arg_rows
+        self.engine_id = arg_engine_id
+
+        # Hash function i maps an encoded ngram x to the top bits of
+        # (multipliers[i] * x + increments[i]) modulo 2**64.
+        generator = random.Random(arg_seed)
+        self.__multipliers = [
+            generator.getrandbits(64) | 1 for i in range(arg_bands * arg_rows)
+        ]
+        self.__increments = [
+            generator.getrandbits(64) for i in range(arg_bands * arg_rows)
+        ]
+
+        if numpy is not None:
+            self.__numpy_multipliers = numpy.array(
+                self.__multipliers,
+                dtype=numpy.uint64
+            )
+            self.__numpy_increments = numpy.array(
+                self.__increments,
+                dtype=numpy.uint64
+            )
+
+        self.__references = []
+        self.__totals = array("I")
+        self.__tables = [{} for band in range(arg_bands)]
+
+    # --------------------------------------------------------------------------
+    def __len__(self):
+        """Returns the number of indexed reference strings."""
+
+        return len(self.__references)
+
+    # --------------------------------------------------------------------------
+    def append(self, arg_reference_string, arg_reference_ngrams):
+        """Adds a reference string to the end of the index.
+
+        Args:
+            arg_reference_string:   str
+                                    The reference string to add. Its reference
+                                    id is its position in the index.
+
+            arg_reference_ngrams:   dict
+                                    The ngrams generated from the reference
+                                    string.
+        """
+
+        reference_id = len(self.__references)
+
+        self.__references.append(arg_reference_string)
+        self.__totals.append(sum(arg_reference_ngrams.values()))
+
+        for table, key in zip(
+            self.__tables,
+            self.__get_band_keys(arg_reference_ngrams)
+        ):
+            if key not in table:
+                table[key] = array("I")
+
+            table[key].append(reference_id)
+
+    # --------------------------------------------------------------------------
+    def get_candidates(self, arg_input_ngrams):
+        """Finds the reference strings sharing a bucket with an input string.
+
+        Args:
+            arg_input_ngrams:       dict
+                                    The ngrams generated from the input string.
+
+        Returns:
+            list
+            The reference ids of the candidates, ascending.
+        """
+
+        candidates = set()
+
+        for table, key in zip(
+            self.__tables,
+            self.__get_band_keys(arg_input_ngrams)
+        ):
+            if key in table:
+                candidates.update(table[key])
+
+        return sorted(candidates)
+
+    # --------------------------------------------------------------------------
+    def get_recall(self, arg_similarity):
+        """Returns the chance that a reference string becomes a candidate.
+
+        Args:
+            arg_similarity:         float
+                                    The Jaccard similarity, from 0 to 1, of the
+                                    sets of distinct ngrams of the reference
+                                    string and the input string.
+
+        Returns:
+            float
+            1 - (1 - arg_similarity**rows)**bands.
+        """
+
+        return 1 - (1 - arg_similarity ** self.rows) ** self.bands
+
+    # --------------------------------------------------------------------------
+    def get_reference(self, arg_reference_id):
+        """Returns the reference string with the given reference id."""
+
+        return self.__references[arg_reference_id]
+
+    # --------------------------------------------------------------------------
+    def get_signature(self, arg_ngrams):
+        """Computes the MinHash signature of a set of ngrams.
+
+        Args:
+            arg_ngrams:             dict
+                                    The ngrams of a string. Only their keys
+                                    are used.
+
+        Returns:
+            list
+            The bands * rows minimum hash values of the encoded ngrams, one per
+            hash function, or an empty list if there are no ngrams.
+        """
+
+        if not arg_ngrams:
+            return []
+
+        keys = [CharNgramProfile.encode(ngram) for ngram in arg_ngrams]
+
+        if numpy is not None:
+            hashes = numpy.array(keys, dtype=numpy.uint64)[:, None]
+            hashes = hashes * self.__numpy_multipliers
+            hashes += self.__numpy_increments
+            hashes >>= numpy.uint64(self.__HASH_SHIFT)
+
+            return hashes.min(axis=0).tolist()
+
+        mask = self.__HASH_MASK
+        shift = self.__HASH_SHIFT
+
+        return [
+            min(
+                ((multiplier * key + increment) & mask) >> shift
+                for key in keys
+            )
+            for multiplier, increment in zip(
+                self.__multipliers,
+                self.__increments
+            )
+        ]
+
+    # --------------------------------------------------------------------------
+    def get_total(self, arg_reference_id):
+        """Returns the number of ngrams of the given reference string."""
+
+        return self.__totals[arg_reference_id]
+
+    # --------------------------------------------------------------------------
+    def __get_band_keys(self, arg_ngrams):
+        """Returns the bucket key of every band of a string's signature.
+
+        Strings without ngrams have no signature and thus no bucket.
+        """
+
+        signature = self.get_signature(arg_ngrams)
+
+        if not signature:
+            return []
+
+        rows = self.rows
+
+        return [
+            hash(tuple(signature[start:start + rows]))
+            for start in range(0, len(signature), rows)
+        ]
+
+# ------------------------------------------------------------------------------
+class CharNgramSimHashIndex(object):
+    """An index of 64-bit SimHash fingerprints for near-duplicate search.
+
+    Summarizes the ngram profile of every reference string as a 64-bit SimHash
+    fingerprint, see get_fingerprint(), so that strings with similar ngram
+    profiles get fingerprints differing in few bits. Fingerprints within
+    max_distance bits of each other are found without comparing against every
+    fingerprint: the 64 bits are split into max_distance + 1 blocks, and by
+    the pigeonhole principle two fingerprints differing in at most
+    max_distance bits agree on at least one whole block. The index keeps one
+    table per block, mapping the bits of that block to the reference strings
+    having them, which amounts to the permuted tables of Manku et al. with
+    every block moved to the front in turn. A query looks up its own bits in
+    every table and keeps the reference strings whose fingerprints are within
+    max_distance bits of its own.
+
+    Those candidates are then scored exactly by CharNgram, just like
+    compare_list() would, so fingerprints only ever preselect near-duplicates
+    and never decide them. Reference strings that are not candidates are
+    treated as if they shared no ngram with the input string.
+
+    Instances are normally created with CharNgram.build_simhash_index() and
+    passed to CharNgram.compare_list() in place of a reference list, typically
+    with a high arg_min_score. Uses numpy, if installed, to compute
+    fingerprints.
+
+    Attributes:
+        ngram_size:     int
+                        The ngram size the index was built with.
+
+        max_distance:   int
+                        The largest number of differing bits of the
+                        fingerprints of a candidate and the input string.
+
+        engine_id:      int
+                        The _ENGINE_ID of the CharNgram class that built the
+                        index.
+
+    Author:
+        Juan Irming
+    """
+
+    # --------------------------------------------------------------------------
+    __FINGERPRINT_BITS = 64
+    __HASH_MASK = 2 ** 64 - 1
+
+    # --------------------------------------------------------------------------
+    def __init__(self, arg_ngram_size, arg_max_distance=3, arg_engine_id=0):
+        """Creates an empty index.
+
+        Args:
+            arg_ngram_size:         int
+                                    The ngram size the indexed ngrams were
+                                    generated with.
+
+            arg_max_distance:       int (optional)
+                                    The largest number of differing bits of
+                                    the fingerprints of a candidate and the
+                                    input string, from 0 to 63. Every
+                                    additional bit adds a table and makes
+                                    the blocks, and thus the table keys,
+                                    shorter.
+                                    Defaults to 3.
+
+            arg_engine_id:          int (optional)
+                                    The _ENGINE_ID of the CharNgram class that
+                                    generated the indexed ngrams.
+                                    Defaults to 0, i.e. CharNgram.
+
+        Raises:
+            CharNgramException: if arg_max_distance is invalid.
+        """
+
+        try:
+            if not 0 <= arg_max_distance < self.__FINGERPRINT_BITS:
+                raise CharNgramException(
+                    "arg_max_distance must be from 0 to %d"
+                    % (self.__FINGERPRINT_BITS - 1)
+                )
+        except TypeError:
+            raise CharNgramException("arg_max_distance must be type int")
+
+        self.ngram_size = arg_ngram_size
+        self.max_distance = arg_max_distance
+        self.engine_id = arg_engine_id
+
+        # (shift, mask) of every block, splitting the bits as evenly as
+        # possible.
+        block_count = arg_max_distance + 1
+        boundaries = [
+            self.__FINGERPRINT_BITS * block // block_count
+            for block in range(block_count + 1)
+        ]
+        self.__blocks = [
+            (start, (1 << (end - start)) - 1)
+            for start, end in zip(boundaries, boundaries[1:])
+        ]
+
+        self.__references = []
+        self.__totals = array("I")
+        self.__fingerprints = array("Q")
+        self.__tables = [{} for block in self.__blocks]
+
+    # --------------------------------------------------------------------------
+    def __len__(self):
+        """Returns the number of indexed reference strings."""
+
+        return len(self.__references)
+
+    # --------------------------------------------------------------------------
+    def append(self, arg_reference_string, arg_reference_ngrams):
+        """Adds a reference string to the end of the index.
+
+        Args:
+            arg_reference_string:   str
+                                    The reference string to add. Its reference
+                                    id is its position in the index.
+
+            arg_reference_ngrams:   dict
+                                    The ngrams generated from the reference
+                                    string.
+        """
+
+        reference_id = len(self.__references)
+        fingerprint = self.get_fingerprint(arg_reference_ngrams)
+
+        self.__references.append(arg_reference_string)
+        self.__totals.append(sum(arg_reference_ngrams.values()))
+        self.__fingerprints.append(fingerprint)
+
+        for table, (shift, mask) in zip(self.__tables, self.__blocks):
+            key = (fingerprint >> shift) & mask
+
+            if key not in table:
+                table[key] = array("I")
+
+            table[key].append(reference_id)
+
+    # --------------------------------------------------------------------------
+    def get_candidates(self, arg_input_ngrams):
+        """Finds the reference strings with fingerprints near an input string's.
+
+        Args:
+            arg_input_ngrams:       dict
+                                    The ngrams generated from the input string.
+
+        Returns:
+            list
+            The reference ids of the reference strings whose fingerprints
+            differ from that of the input string in at most max_distance bits,
+            ascending.
+        """
+
+        fingerprint = self.get_fingerprint(arg_input_ngrams)
+        fingerprints = self.__fingerprints
+
+        candidates = set()
+
+        for table, (shift, mask) in zip(self.__tables, self.__blocks):
+            candidates.update(table.get((fingerprint >> shift) & mask, ()))
+
+        return sorted(
+            reference_id for reference_id in candidates
+            if bin(fingerprint ^ fingerprints[reference_id]).count("1")
+            <= self.max_distance
+        )
+
+    # --------------------------------------------------------------------------
+    @classmethod
+    def get_fingerprint(cls, arg_ngrams):
+        """Computes the 64-bit SimHash fingerprint of an ngram profile.
+
+        Hashes every ngram to 64 bits and sums, per bit, the ngram's count if
+        its hash has the bit set and minus its count otherwise. The fingerprint
+        has the bits whose sums are positive set. Ngram hashes are the
+        CharNgramProfile.encode() keys passed through the SplitMix64 finalizer,
+        so that fingerprints are stable across processes.
+
+        Args:
+            arg_ngrams:             dict
+                                    The ngrams of a string and their counts.
+
+        Returns:
+            int
+            The fingerprint, in the range [0, 2**64). 0 if there are no ngrams.
+        """
+
+        if not arg_ngrams:
+            return 0
+
+        keys = [CharNgramProfile.encode(ngram) for ngram in arg_ngrams]
+        counts = list(arg_ngrams.values())
+
+        if numpy is not None:
+            hashes = numpy.array(keys, dtype=numpy.uint64)
+            hashes += numpy.uint64(0x9E3779B97F4A7C15)
+            hashes ^= hashes >> numpy.uint64(30)
+            hashes *= numpy.uint64(0xBF58476D1CE4E5B9)
+            hashes ^= hashes >> numpy.uint64(27)
+            hashes *= numpy.uint64(0x94D049BB133111EB)
+            hashes ^= hashes >> numpy.uint64(31)
+
+            bits = numpy.arange(cls.__FINGERPRINT_BITS, dtype=numpy.uint64)
+            signs = (hashes[:, None] >> bits) & numpy.uint64(1)
+            signs = signs.astype(numpy.int64) * 2 - 1
+            weights = numpy.array(counts, dtype=numpy.int64)[:, None]
+            sums = (signs * weights).sum(axis=0)
+
+            return int(
+                numpy.bitwise_or.reduce(
+                    (sums > 0).astype(numpy.uint64) << bits
+                )
+            )
+
+        mask = cls.__HASH_MASK
+        sums = [0] * cls.__FINGERPRINT_BITS
+
+        for key, count in zip(keys, counts):
+            hashed = (key + 0x9E3779B97F4A7C15) & mask
+            hashed = ((hashed ^ (hashed >> 30)) * 0xBF58476D1CE4E5B9) & mask
+            hashed = ((hashed ^ (hashed >> 27)) * 0x94D049BB133111EB) & mask
+            hashed ^= hashed >> 31
+
+            for bit in range(cls.__FINGERPRINT_BITS):
+                if (hashed >> bit) & 1:
+                    sums[bit] += count
+                else:
+                    sums[bit] -= count
+
+        fingerprint = 0
+
+        for bit, bit_sum in enumerate(sums):
+            if bit_sum > 0:
+                fingerprint |= 1 << bit
+
+        return fingerprint
+
+    # --------------------------------------------------------------------------
+    def get_reference(self, arg_reference_id):
+        """Returns the reference string with the given reference id."""
+
+        return self.__references[arg_reference_id]
+
+    # --------------------------------------------------------------------------
+    def get_total(self, arg_reference_id):
+        """Returns the number of ngrams of the given reference string."""
+
+        return self.__totals[arg_reference_id]
+
+# ------------------------------------------------------------------------------
+class CharNgramShardPool(object):
+    """A pool of processes, each holding an index of a shard of a list.
+
+    Splits a list of reference strings into contiguous shards and starts one
+    worker process per shard. Each worker builds a CharNgramIndex of its shard
+    once, when it starts, and keeps it for its lifetime. A comparison sends
+    the input string to every worker, each worker scores its own shard and
+    returns only its local top scores, and the results are merged in the
+    calling process.
+
+    Instances can be passed to CharNgram.compare_list(),
+    CharNgram.compare_list_topk(), CharNgram.get_best_list_match() and
+    CharNgram.get_best_list_match_index() in place of the reference list, and
+    produce exactly the same results. The pool should be closed once no longer
+    needed, either by calling close() or by using it as a context manager.
+
+    Attributes:
+        ngram_size: int
+                    The ngram size the shards were indexed with.
+
+        engine_id:  int
+                    The _ENGINE_ID of the class the shards were indexed with.
+
+    Author:
+        Juan Irming
+    """
+
+    # --------------------------------------------------------------------------
+    def __init__(
+        self,
+        arg_reference_list,
+        arg_ngram_size=None,
+        arg_shards=None,
+        arg_engine=CharNgram
+    ):
+        """Splits a list of strings into shards and starts their workers.
+
+        Args:
+            arg_reference_list:     list
+                                    The list of reference strings to shard.
+
+            arg_ngram_size:         int|None (optional)
+                                    The ngram size to use. The minimum valid
+                                    value is 1. None means the default ngram
+                                    size of arg_engine.
+                                    Defaults to None.
+
+            arg_shards:             int|None (optional)
+                                    The number of shards and worker processes.
+                                    None means one per CPU. Never more than the
+                                    number of reference strings.
+                                    Defaults to None.
+
+            arg_engine:             class (optional)
+                                    The class whose ngrams the shards are
+                                    indexed and compared with, CharNgram or a
+                                    subclass such as WordNgram.
+                                    Defaults to CharNgram.
+
+        Raises:
+            CharNgramException: if arg_reference_list is not populated or if
+                                arg_shards is invalid.
+        """
+
+        if not arg_reference_list:
+            raise CharNgramException("arg_reference_list is not populated")
+
+        reference_list = list(arg_reference_list)
+
+        if arg_ngram_size is None:
+            arg_ngram_size = arg_engine._DEFAULT_NGRAM_SIZE
+
+        if arg_shards is None:
+            shards = os.cpu_count() or 1
+        else:
+            try:
+                if arg_shards < 1:
+                    raise CharNgramException("arg_shards must be at least 1")
+            except TypeError:
+                raise CharNgramException("arg_shards must be type int")
+
+            shards = arg_shards
+
+        shards = min(shards, len(reference_list))
+        shard_length = -(-len(reference_list) // shards)
+
+        self.ngram_size = arg_ngram_size
+        self.engine_id = arg_engine._ENGINE_ID
+
+        self.__length = len(reference_list)
+        self.__executors = []
+
+        for offset in range(0, len(reference_list), shard_length):
+            self.__executors.append(
+                ProcessPoolExecutor(
+                    max_workers=1,
+                    initializer=_init_shard,
+                    initargs=(
+                        reference_list[offset:offset + shard_length],
+                        offset,
+                        arg_ngram_size,
+                        arg_engine
+                    )
+                )
+            )
+
+    # --------------------------------------------------------------------------
+    def __len__(self):
+        """Returns the number of reference strings across all shards."""
+
+        return self.__length
+
+    # --------------------------------------------------------------------------
+    def __enter__(self):
+        """Returns the pool itself when used as a context manager."""
+
+        return self
+
+    # --------------------------------------------------------------------------
+    def __exit__(self, arg_type, arg_value, arg_traceback):
+        """Closes the pool when leaving the context manager."""
+
+        self.close()
+
+    # --------------------------------------------------------------------------
+    def close(self):
+        """Shuts down all worker processes."""
+
+        for executor in self.__executors:
+            executor.shutdown()
+
+        self.__executors = []
+
+    # --------------------------------------------------------------------------
+    def compare_shards(
+        self,
+        arg_input_string,
+        arg_scoring_method,
+        arg_return_type,
+        arg_return_scores,
+        arg_k=None,
+        arg_min_score=None
+    ):
+        """Compares a string against every shard in parallel.
+
+        Args:
+            arg_input_string:       str
+                                    The input string to be compared.
+
+            arg_scoring_method:     int
+                                    Desired scoring method. See
+                                    CharNgram.compare_list().
+
+            arg_return_type:        int
+                                    Desired return type. See
+                                    CharNgram.compare_list(). Indexes refer to
+                                    the unsharded reference list.
+
+            arg_return_scores:      int
+                                    Desired scores to include from each shard.
+                                    See CharNgram.compare_list().
+
+            arg_k:                  int|None (optional)
+                                    If given, only the best arg_k tuples of
+                                    each shard are returned, as by
+                                    CharNgram.compare_list_topk(), and
+                                    arg_return_scores is ignored.
+                                    Defaults to None.
+
+            arg_min_score:          number|None (optional)
+                                    The minimum score of the tuples to return.
+                                    See CharNgram.compare_list().
+                                    Defaults to None.
+
+        Returns:
+            list
+            A list with one list of (reference string or index, score) tuples
+            per shard.
+
+        Raises:
+            CharNgramException: if the pool is closed, or as raised by
+                                CharNgram.compare_list().
+        """
+
+        if not self.__executors:
+            raise CharNgramException("the shard pool is closed")
+
+        futures = [
+            executor.submit(
+                _compare_shard,
+                arg_input_string,
+                arg_scoring_method,
+                arg_return_type,
+                arg_return_scores,
+                arg_k,
+                arg_min_score
+            )
+            for executor in self.__executors
+        ]
+
+        return [future.result() for future in futures]
+
+# ------------------------------------------------------------------------------
+# State of a CharNgramShardPool worker process: the index of its shard, the
+# position of the shard in the unsharded reference list and the class whose
+# ngrams the shard is indexed and compared with.
+_shard_index = None
+_shard_offset = 0
+_shard_engine = None
+
+# ------------------------------------------------------------------------------
+def _init_shard(arg_reference_list, arg_offset, arg_ngram_size, arg_engine):
+    """Builds the index of a CharNgramShardPool worker's shard."""
+
+    global _shard_index, _shard_offset, _shard_engine
+
+    _shard_index = arg_engine.build_index(arg_reference_list, arg_ngram_size)
+    _shard_offset = arg_offset
+    _shard_engine = arg_engine
+
+# ------------------------------------------------------------------------------
+def _compare_shard(
+    arg_input_string,
+    arg_scoring_method,
+    arg_return_type,
+    arg_return_scores,
+    arg_k,
+    arg_min_score=None
+):
+    """Scores an input string against a CharNgramShardPool worker's shard.
+
+    See CharNgramShardPool.compare_shards().
+    """
+
+    if arg_k is None:
+        scores = _shard_engine.compare_list(
+            _shard_index,
+            arg_input_string,
+            arg_scoring_method,
+            _shard_index.ngram_size,
+            arg_return_type,
+            arg_return_scores,
+            arg_min_score
+        )
+    else:
+        scores = _shard_engine.compare_list_topk(
+            _shard_index,
+            arg_input_string,
+            arg_k,
+            arg_scoring_method,
+            _shard_index.ngram_size,
+            arg_return_type,
+            arg_min_score
+        )
+
+    if arg_return_type == CharNgram.ReturnBy.INDEX:
+        scores = [
+            (index + _shard_offset, score) for index, score in scores
+        ]
+
+    return scores
+
+# ------------------------------------------------------------------------------
+# Layout of files written by CharNgramReferenceSet.save() and
+# CharNgramIndex.save(): a header followed by a number of sections, each a
+# section header and a flat little-endian array padded to a multiple of 8
+# bytes. Sections therefore start 8-byte aligned and can be read in place.
+# The low byte of the kind field is the kind of data and the high byte the
+# _ENGINE_ID of the CharNgram class that generated its ngrams.
+_FILE_MAGIC = b"FZJK"
+_FILE_VERSION = 1
+_FILE_KIND_REFERENCE_SET = 1
+_FILE_KIND_INDEX = 2
+_FILE_HEADER = struct.Struct("<4sHHII")     # Magic, version, kind, ngram size
+                                            # and number of sections.
+_SECTION_HEADER = struct.Struct("<c7xQ")    # Array typecode and length.
+
+# ------------------------------------------------------------------------------
+def _write_file(
+    arg_path,
+    arg_kind,
+    arg_engine_id,
+    arg_ngram_size,
+    arg_sections
+):
+    """Writes arrays to a file in the layout described above.
+
+    The file is written to a uniquely named temporary file next to arg_path
+    first and then moved into place, so that processes loading arg_path never
+    see a partially written file and concurrent saves to the same path never
+    write to the same temporary file.
+    """
+
+    descriptor, temporary_path = tempfile.mkstemp(
+        dir=os.path.dirname(arg_path) or ".",
+        prefix=os.path.basename(arg_path) + ".",
+        suffix=".tmp"
+    )
+
+    try:
+        with open(descriptor, "wb") as file:
+            file.write(
+                _FILE_HEADER.pack(
+                    _FILE_MAGIC,
+                    _FILE_VERSION,
+                    arg_kind | arg_engine_id << 8,
+                    arg_ngram_size,
+                    len(arg_sections)
+                )
+            )
+
+            for section in arg_sections:
+                if sys.byteorder == "big":
+                    section = array(section.typecode, section)
+                    section.byteswap()
+
+                file.write(
+                    _SECTION_HEADER.pack(
+                        section.typecode.encode("ascii"),
+                        len(section)
+                    )
+                )
+                file.write(section.tobytes())
+                file.write(bytes(-len(section) * section.itemsize % 8))
+
+        os.replace(temporary_path, arg_path)
+    finally:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+
+# ------------------------------------------------------------------------------
+def _read_file_kind(arg_data):
+    """Validates the header of a file's contents.
+
+    Returns the kind of data the file holds and the _ENGINE_ID of the class
+    that generated its ngrams.
+    """
+
+    try:
+        magic, version, kind, ngram_size, section_count = (
+            _FILE_HEADER.unpack_from(arg_data)
+        )
+    except struct.error:
+        raise CharNgramException("file is not a fuzzjunkie file")
+
+    if magic != _FILE_MAGIC:
+        raise CharNgramException("file is not a fuzzjunkie file")
+
+    if version != _FILE_VERSION:
+        raise CharNgramException(
+            "file format version %d is not supported" % version
+        )
+
+    return kind & 0xFF, kind >> 8
+
+# ------------------------------------------------------------------------------
+def _read_file(arg_data, arg_kind, arg_typecodes):
+    """Splits a file's contents into its sections.
+
+    Returns the ngram size, the engine id and a list of (typecode, memoryview)
+    tuples, one per expected section typecode in arg_typecodes, each view
+    covering the raw bytes of its array without copying them.
+    """
+
+    kind, engine_id = _read_file_kind(arg_data)
+
+    if kind != arg_kind:
+        raise CharNgramException("file holds a different kind of data")
+
+    magic, version, kind, ngram_size, section_count = (
+        _FILE_HEADER.unpack_from(arg_data)
+    )
+
+    if section_count != len(arg_typecodes):
+        raise CharNgramException("file is corrupt")
+
+    data = memoryview(arg_data)
+    position = _FILE_HEADER.size
+    sections = []
+
+    try:
+        for expected_typecode in arg_typecodes:
+            try:
+                typecode, length = _SECTION_HEADER.unpack_from(data, position)
+            except struct.error:
+                raise CharNgramException("file is truncated")
+
+            typecode = typecode.decode("ascii", "replace")
+
+            if typecode != expected_typecode:
+                raise CharNgramException("file is corrupt")
+
+            position += _SECTION_HEADER.size
+            size = length * array(typecode).itemsize
+
+            if position + size > len(data):
+                raise CharNgramException("file is truncated")
+
+            sections.append((typecode, data[position:position + size]))
+            position += size + (-size % 8)
+    except CharNgramException:
+        # Memory-mapped files cannot be closed while views of them exist.
+        for typecode, section in sections:
+            section.release()
+
+        data.release()
+        raise
+
+    return ngram_size, engine_id, sections
+
+# ------------------------------------------------------------------------------
+def _to_array(arg_section):
+    """Copies a (typecode, memoryview) section into an array."""
+
+    typecode, data = arg_section
+
+    section = array(typecode)
+    section.frombytes(data)
+
+    if sys.byteorder == "big":
+        section.byteswap()
+
+    return section
+
+# ------------------------------------------------------------------------------
+def _encode_strings(arg_strings):
+    """Encodes strings as an array of byte offsets and an array of bytes."""
+
+    offsets = array("Q", [0])
+    encoded = []
+
+    for string in arg_strings:
+        encoded.append(string.encode("utf-8", "surrogatepass"))
+        offsets.append(offsets[-1] + len(encoded[-1]))
+
+    return offsets, array("B", b"".join(encoded))
+
+# ------------------------------------------------------------------------------
+def _is_offsets(arg_offsets, arg_length):
+    """Returns whether an array delimits consecutive slices of arg_length items.
+
+    That is, whether it starts at 0, never decreases and ends at arg_length.
+    """
+
+    return (
+        len(arg_offsets) > 0
+        and arg_offsets[0] == 0
+        and arg_offsets[-1] == arg_length
+        and all(
+            start <= end for start, end in zip(arg_offsets, arg_offsets[1:])
+        )
+    )
+
+# ------------------------------------------------------------------------------
+def _check_index_sections(
+    arg_string_offsets,
+    arg_strings,
+    arg_totals,
+    arg_keys,
+    arg_posting_offsets,
+    arg_reference_ids,
+    arg_counts
+):
+    """Raises CharNgramException unless the sections of an index file agree.
+
+    Checks that every offset array delimits the array it indexes and that
+    every posting refers to an existing reference string, so that neither
+    CharNgramIndex.from_bytes() nor CharNgramMappedIndex ever reads past a
+    section. Takes arrays or memoryviews alike.
+    """
+
+    if (
+        len(arg_string_offsets) != len(arg_totals) + 1
+        or not _is_offsets(arg_string_offsets, len(arg_strings))
+        or len(arg_posting_offsets) != len(arg_keys) + 1
+        or len(arg_reference_ids) != len(arg_counts)
+        or not _is_offsets(arg_posting_offsets, len(arg_reference_ids))
+        or (
+            len(arg_reference_ids) > 0
+            and max(arg_reference_ids) >= len(arg_totals)
+        )
+    ):
+        raise CharNgramException("file is corrupt")
+
+# ------------------------------------------------------------------------------
+def _decode_strings(arg_offsets, arg_strings):
+    """Decodes strings encoded by _encode_strings()."""
+
+    strings = arg_strings.tobytes()
+
+    if not _is_offsets(arg_offsets, len(strings)):
+        raise CharNgramException("file is corrupt")
+
+    return [
+        strings[start:end].decode("utf-8", "surrogatepass")
+        for start, end in zip(arg_offsets, arg_offsets[1:])
+    ]
+
+# ------------------------------------------------------------------------------
+class CharNgramException(Exception):
+    """Exception."""
+    pass
+
+# ------------------------------------------------------------------------------
+# State of a main() matching process: the compiled reference list to match
+# against and the matching options.
+_matcher_references = None
+_matcher_options = None
+
+# ------------------------------------------------------------------------------
+def _init_matcher(arg_references, arg_options):
+    """Sets up a main() matching process.
+
+    arg_references is either a compiled reference list or the path of a file
+    saved by CharNgramReferenceSet.save() or CharNgramIndex.save(). Saved
+    indexes are memory-mapped, so that worker processes share their pages.
+    """
+
+    global _matcher_references, _matcher_options
+
+    if isinstance(arg_references, str):
+        engine = WordNgram if arg_options["words"] else CharNgram
+
+        with open(arg_references, "rb") as file:
+            kind, engine_id = _read_file_kind(file.read(_FILE_HEADER.size))
+
+        if kind == _FILE_KIND_INDEX:
+            arg_references = engine.open_index(arg_references)
+        else:
+            arg_references = engine.load(arg_references)
+
+    _matcher_references = arg_references
+    _matcher_options = arg_options
+
+# ------------------------------------------------------------------------------
+def _match_lines(arg_queries):
+    """Matches query strings in a main() matching process.
+
+    Returns the formatted matches of all query strings as a single string, so
+    that they can be written with a single call.
+    """
+
+    references = _matcher_references
+    options = _matcher_options
+    engine = WordNgram if options["words"] else CharNgram
+
+    lines = []
+
+    for query in arg_queries:
+        for index, score in engine.compare_list_topk(
+            references,
+            query,
+            options["top_k"],
+            CharNgram.Scoring[options["scoring"].upper()],
+            references.ngram_size,
+            CharNgram.ReturnBy.INDEX,
+            options["threshold"]
+        ):
+            if score <= 0:
+                continue
+
+            if isinstance(references, CharNgramReferenceSet):
+                reference = references.references[index]
+            else:
+                reference = references.get_reference(index)
+
+            if options["format"] == "jsonl":
+                lines.append(
+                    json.dumps(
+                        {
+                            "query": query,
+                            "reference": reference,
+                            "index": index,
+                            "score": score
+                        },
+                        ensure_ascii=False
+                    )
+                )
+            else:
+                lines.append(
+                    "\t".join(
+                        [
+                            _escape_tsv(query),
+                            _escape_tsv(reference),
+                            str(index),
+                            str(score)
+                        ]
+                    )
+                )
+
+    return "".join(line + "\n" for line in lines)
+
+# ------------------------------------------------------------------------------
+def _escape_tsv(arg_string):
+    """Escapes backslashes, tabs and carriage returns for TSV output."""
+
+    escaped = arg_string.replace("\\", "\\\\")
+    escaped = escaped.replace("\t", "\\t")
+    escaped = escaped.replace("\r", "\\r")
+
+    return escaped
+
+# ------------------------------------------------------------------------------
+def _read_chunks(arg_file, arg_chunk_size):
+    """Reads lines from a text file, arg_chunk_size lines at a time.
+
+    Lines are stripped of their line ending, be it "\n" or "\r\n".
+    """
+
+    while True:
+        chunk = [
+            line.rstrip("\r\n")
+            for line in itertools.islice(arg_file, arg_chunk_size)
+        ]
+
+        if not chunk:
+            return
+
+        yield chunk
+
+# ------------------------------------------------------------------------------
+def main(arg_argv=None):
+    """Matches query strings against reference strings from the command line.
+
+    Reads reference strings, one per line, from a text file, or loads a
+    reference set or index saved by CharNgramReferenceSet.save() or
+    CharNgramIndex.save(). Then streams query strings, one per line, from a
+    file or stdin, and writes the best matches of each to a file or stdout,
+    as tab-separated values (query, reference string, reference index, score)
+    or as JSON lines. Matches scoring 0 are never written. Reference indexes
+    count lines from 0.
+
+    Queries are read and matches written in chunks of lines. Given more than
+    one worker, chunks are matched in worker processes, at most two chunks
+    per worker in flight, and written in input order. Reference strings read
+    from a text file are then indexed once and saved to a temporary file
+    that every worker memory-maps.
+
+    Run "python -m fuzzjunkie --help" for the command-line options.
+
+    Args:
+        arg_argv:                   list|None (optional)
+                                    The command-line arguments, without the
+                                    program name. None uses sys.argv.
+                                    Defaults to None.
+
+    Returns:
+        int
+        The exit status: 0 on success, 1 on failure. Invalid arguments exit
+        with status 2.
+    """
+
+    parser = argparse.ArgumentParser(
+        prog="fuzzjunkie",
+        description="Fuzzy-match query strings against reference strings "
+        + "using character or word ngrams."
+    )
+    parser.add_argument(
+        "references",
+        help="file of reference strings, one per line, or a reference set "
+        + "or index saved by fuzzjunkie"
+    )
+    parser.add_argument(
+        "-i", "--input",
+        default="-",
+        help="file of query strings, one per line (default: stdin)"
+    )
+    parser.add_argument(
+        "-o", "--output",
+        default="-",
+        help="file to write matches to (default: stdout)"
+    )
+    parser.add_argument(
+        "-n", "--ngram-size",
+        type=int,
+        default=2,
+        help="ngram size, ignored for saved files (default: 2)"
+    )
+    parser.add_argument(
+        "--words",
+        action="store_true",
+        help="use word ngrams instead of character ngrams, also for saved "
+        + "files, which must have been built with word ngrams"
+    )
+    parser.add_argument(
+        "-s", "--scoring",
+        choices=[
+            "percentage", "matches", "input_percentage", "dice", "jaccard",
+            "cosine"
+        ],
+        default="percentage",
+        help="scoring method (default: percentage)"
+    )
+    parser.add_argument(
+        "-t", "--threshold",
+        type=float,
+        default=None,
+        help="minimum score of the matches to write (default: none)"
+    )
+    parser.add_argument(
+        "-k", "--top-k",
+        type=int,
+        default=1,
+        help="number of best matches to write per query (default: 1)"
+    )
+    parser.add_argument(
+        "-f", "--format",
+        choices=["tsv", "jsonl"],
+        default="tsv",
+        help="output format (default: tsv)"
+    )
+    parser.add_argument(
+        "-w", "--workers",
+        type=int,
+        default=1,
+        help="number of worker processes, 0 for one per CPU (default: 1)"
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=1000,
+        help="number of query lines read, matched and written at a time "
+        + "(default: 1000)"
+    )
+    parser.add_argument(
+        "--encoding",
+        default="utf-8",
+        help="encoding of all files (default: utf-8)"
+    )
+
+    arguments = parser.parse_args(arg_argv)
+
+    if arguments.ngram_size < 1:
+        parser.error("argument -n/--ngram-size: must be at least 1")
+
+    if arguments.top_k < 1:
+        parser.error("argument -k/--top-k: must be at least 1")
+
+    if arguments.workers < 0:
+        parser.error("argument -w/--workers: must be at least 0")
+
+    if arguments.chunk_size < 1:
+        parser.error("argument --chunk-size: must be at least 1")
+
+    workers = arguments.workers or os.cpu_count() or 1
+
+    options = {
+        "scoring": arguments.scoring,
+        "threshold": arguments.threshold,
+        "top_k": arguments.top_k,
+        "format": arguments.format,
+        "words": arguments.words
+    }
+
+    try:
+        with contextlib.ExitStack() as stack:
+            with open(arguments.references, "rb") as file:
+                is_saved = file.read(len(_FILE_MAGIC)) == _FILE_MAGIC
+
+            if is_saved:
+                references = arguments.references
+            else:
+                with open(
+                    arguments.references,
+                    encoding=arguments.encoding,
+                    errors="surrogateescape"
+                ) as file:
+                    engine = WordNgram if arguments.words else CharNgram
+                    references = engine.build_index(
+                        [line.rstrip("\r\n") for line in file],
+                        arguments.ngram_size
+                    )
+
+                if workers > 1:
+                    directory = stack.enter_context(
+                        tempfile.TemporaryDirectory()
+                    )
+                    path = os.path.join(directory, "references.fzj")
+                    references.save(path)
+                    references = path
+
+            if arguments.input == "-":
+                input_file = stack.enter_context(
+                    open(
+                        sys.stdin.fileno(),
+                        encoding=arguments.encoding,
+                        errors="surrogateescape",
+                        closefd=False
+                    )
+                )
+            else:
+                input_file = stack.enter_context(
+                    open(
+                        arguments.input,
+                        encoding=arguments.encoding,
+                        errors="surrogateescape"
+                    )
+                )
+
+            if arguments.output == "-":
+                sys.stdout.flush()
+                output_file = stack.enter_context(
+                    open(
+                        sys.stdout.fileno(),
+                        "w",
+                        encoding=arguments.encoding,
+                        errors="surrogateescape",
+                        closefd=False
+                    )
+                )
+            else:
+                output_file = stack.enter_context(
+                    open(
+                        arguments.output,
+                        "w",
+                        encoding=arguments.encoding,
+                        errors="surrogateescape"
+                    )
+                )
+
+            chunks = _read_chunks(input_file, arguments.chunk_size)
+
+            if workers == 1:
+                _init_matcher(references, options)
+
+                # Worker processes unmap their index when they exit, but this
+                # process goes on after main() returns.
+                if isinstance(_matcher_references, CharNgramMappedIndex):
+                    stack.enter_context(_matcher_references)
+
+                for chunk in chunks:
+                    output_file.write(_match_lines(chunk))
+            else:
+                executor = stack.enter_context(
+                    ProcessPoolExecutor(
+                        workers,
+                        initializer=_init_matcher,
+                        initargs=(references, options)
+                    )
+                )
+
+                pending = deque()
+
+                for chunk in chunks:
+                    pending.append(executor.submit(_match_lines, chunk))
+
+                    if len(pending) >= 2 * workers:
+                        output_file.write(pending.popleft().result())
+
+                while pending:
+                    output_file.write(pending.popleft().result())
+    except (CharNgramException, OSError) as error:
+        print("fuzzjunkie: error: %s" % error, file=sys.stderr)
+
+        return 1
+
+    return 0
 
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,699 @@
+#!/usr/bin/env python3
+
+"""fuzzjunkie_benchmark.py
+
+fuzzjunkie v3.1 for Python 3
+
+Benchmarks for fuzzjunkie.py. Times compare_string(), compare_list() and
+get_best_list_match() over synthetic corpora of various sizes, string lengths
+and ngram sizes, with the ngram cache cold and warm, and against compiled
+reference lists. Results are saved as JSON so that two versions can be
+compared:
+
+    python fuzzjunkie_benchmark.py run --output before.json
+    (change fuzzjunkie.py)
+    python fuzzjunkie_benchmark.py run --output after.json
+    python fuzzjunkie_benchmark.py compare before.json after.json
+
+The comparison reports every case that got slower or faster than the given
+tolerance and exits with status 1 if any case got slower. Each result file
+records the git revision of fuzzjunkie.py, if it is in a git checkout, and an
+optional --label, so that runs of two builds of the same version can be told
+apart.
+
+The benchmarks also run against versions of fuzzjunkie.py that predate the
+ngram cache API (CharNgramCache, set_cache() and clear_cache()) or compiled
+reference lists (compile() and build_index()). Cases needing a missing API,
+i.e. cold cache cases and compiled reference cases, are then skipped and
+reported as only in the other result file.
+
+Author:
+    Juan Irming
+
+--------------------------------------------------------------------------------
+
+Copyright 1997-2017 Juan Irming
+
+This file is part of fuzzjunkie.
+
+fuzzjunkie is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+fuzzjunkie is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with fuzzjunkie.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+__version__ = "3.1"
+__status__ = "Production"
+__license__ = "GPL"
+__author__ = "Juan Irming"
+__copyright__ = "Juan Irming"
+__maintainer__ = "Juan Irming"
+
+# ------------------------------------------------------------------------------
+import argparse
+import datetime
+import json
+import platform
+import random
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import fuzzjunkie
+
+from fuzzjunkie import CharNgram
+
+# ------------------------------------------------------------------------------
+RESULTS_FORMAT = 1      # Version of the JSON results layout.
+
+ALPHABET = "abcdefghijklmnopqrstuvwxyz      "  # Spaces make for word breaks.
+
+STRING_PAIRS = 200      # String pairs compared per compare_string() sample.
+QUERIES = 10            # Input strings compared per compare_list() sample.
+
+# Older versions of fuzzjunkie.py cannot clear or replace their ngram cache,
+# nor compile reference lists.
+HAS_CACHE_API = (
+    hasattr(fuzzjunkie, "CharNgramCache")
+    and hasattr(CharNgram, "set_cache")
+    and hasattr(CharNgram, "clear_cache")
+)
+HAS_COMPILE_API = (
+    hasattr(CharNgram, "compile")
+    and hasattr(CharNgram, "build_index")
+)
+
+# ------------------------------------------------------------------------------
+def make_corpus(arg_size, arg_length, arg_seed=0):
+    """Generates a list of random reference strings.
+
+    Args:
+        arg_size:                   int
+                                    The number of strings to generate.
+
+        arg_length:                 int
+                                    The average string length. Lengths vary
+                                    uniformly by up to half of it either way.
+
+        arg_seed:                   int (optional)
+                                    The random seed, so that every run
+                                    benchmarks the same corpus.
+                                    Defaults to 0.
+
+    Returns:
+        list
+        The generated strings.
+    """
+
+    generator = random.Random(arg_seed)
+
+    return [
+        "".join(
+            generator.choice(ALPHABET) for i in range(
+                generator.randint(
+                    max(arg_length // 2, 1),
+                    arg_length + arg_length // 2
+                )
+            )
+        )
+        for i in range(arg_size)
+    ]
+
+# ------------------------------------------------------------------------------
+def make_queries(arg_corpus, arg_count, arg_seed=0):
+    """Generates misspelled copies of random reference strings.
+
+    Every query is a reference string with roughly one in ten characters
+    substituted, deleted or duplicated, like a typo-ridden search.
+
+    Args:
+        arg_corpus:                 list
+                                    The reference strings to pick from.
+
+        arg_count:                  int
+                                    The number of queries to generate.
+
+        arg_seed:                   int (optional)
+                                    The random seed.
+                                    Defaults to 0.
+
+    Returns:
+        list
+        The generated queries.
+    """
+
+    generator = random.Random(arg_seed)
+
+    queries = []
+
+    for i in range(arg_count):
+        characters = []
+
+        for character in generator.choice(arg_corpus):
+            roll = generator.random()
+
+            if roll < 0.04:
+                characters.append(generator.choice(ALPHABET))
+            elif roll < 0.07:
+                continue
+            elif roll < 0.10:
+                characters.append(character * 2)
+            else:
+                characters.append(character)
+
+        queries.append("".join(characters))
+
+    return queries
+
+# ------------------------------------------------------------------------------
+def iter_cases(arg_quick=False, arg_seed=0):
+    """Generates the benchmark cases.
+
+    Args:
+        arg_quick:                  bool (optional)
+                                    Whether to leave out the largest corpora
+                                    and strings, for a run of about a minute.
+                                    Defaults to False.
+
+        arg_seed:                   int (optional)
+                                    The random seed of the corpora.
+                                    Defaults to 0.
+
+    Yields:
+        tuple
+        The name of the benchmarked method, a dict of case parameters, the
+        number of operations per sample and a function running one sample.
+        Cases the benchmarked version of fuzzjunkie.py lacks the API for are
+        left out.
+    """
+
+    if HAS_CACHE_API:
+        caches = ["cold", "warm"]
+    else:
+        caches = ["warm"]   # The cache cannot be cleared between samples.
+
+    if arg_quick:
+        string_lengths = [10, 100]
+        corpus_sizes = [1000, 10000]
+    else:
+        string_lengths = [10, 100, 1000]
+        corpus_sizes = [1000, 10000, 100000]
+
+    # --------------------------------------------------------------------------
+    for length in string_lengths:
+        strings = make_corpus(STRING_PAIRS, length, arg_seed)
+        queries = make_queries(strings, STRING_PAIRS, arg_seed)
+        pairs = list(zip(strings, queries))
+
+        for ngram_size in [1, 2, 3]:
+            for cache in caches:
+                def compare_strings(arg_pairs=pairs, arg_ngram_size=ngram_size):
+                    for reference_string, input_string in arg_pairs:
+                        CharNgram.compare_string(
+                            reference_string,
+                            input_string,
+                            CharNgram.Scoring.PERCENTAGE,
+                            arg_ngram_size
+                        )
+
+                yield (
+                    "compare_string",
+                    {"length": length, "ngram": ngram_size, "cache": cache},
+                    STRING_PAIRS,
+                    compare_strings
+                )
+
+    # --------------------------------------------------------------------------
+    for size in corpus_sizes:
+        for length in [10, 50]:
+            corpus = make_corpus(size, length, arg_seed)
+            queries = make_queries(corpus, QUERIES, arg_seed)
+
+            for ngram_size in [2, 3]:
+                compiled_lists = [("list", corpus)]
+
+                if HAS_COMPILE_API:
+                    compiled_lists += [
+                        ("compiled", CharNgram.compile(corpus, ngram_size)),
+                        ("index", CharNgram.build_index(corpus, ngram_size))
+                    ]
+
+                for reference, reference_list in compiled_lists:
+                    if reference == "list":
+                        list_caches = caches
+                    else:
+                        list_caches = ["warm"]  # Compiled lists bypass the
+                                                # cache.
+
+                    for cache in list_caches:
+                        def compare_lists(
+                            arg_reference_list=reference_list,
+                            arg_queries=queries,
+                            arg_ngram_size=ngram_size
+                        ):
+                            for input_string in arg_queries:
+                                CharNgram.compare_list(
+                                    arg_reference_list,
+                                    input_string,
+                                    CharNgram.Scoring.PERCENTAGE,
+                                    arg_ngram_size
+                                )
+
+                        yield (
+                            "compare_list",
+                            {
+                                "corpus": size,
+                                "length": length,
+                                "ngram": ngram_size,
+                                "reference": reference,
+                                "cache": cache
+                            },
+                            QUERIES,
+                            compare_lists
+                        )
+
+                for cache in caches:
+                    def get_best_matches(
+                        arg_reference_list=corpus,
+                        arg_queries=queries,
+                        arg_ngram_size=ngram_size
+                    ):
+                        for input_string in arg_queries:
+                            CharNgram.get_best_list_match(
+                                arg_reference_list,
+                                input_string,
+                                CharNgram.Scoring.PERCENTAGE,
+                                arg_ngram_size
+                            )
+
+                    yield (
+                        "get_best_list_match",
+                        {
+                            "corpus": size,
+                            "length": length,
+                            "ngram": ngram_size,
+                            "reference": "list",
+                            "cache": cache
+                        },
+                        QUERIES,
+                        get_best_matches
+                    )
+
+# ------------------------------------------------------------------------------
+def get_case_key(arg_name, arg_params):
+    """Returns the string identifying a case across result files.
+
+    Example:
+        "compare_list[cache=warm,corpus=1000,length=10,ngram=2,reference=list]"
+    """
+
+    return "%s[%s]" % (
+        arg_name,
+        ",".join(
+            "%s=%s" % (param, value)
+            for param, value in sorted(arg_params.items())
+        )
+    )
+
+# ------------------------------------------------------------------------------
+def time_case(arg_function, arg_cache, arg_repeat):
+    """Times a benchmark case.
+
+    Args:
+        arg_function:               callable
+                                    The function running one sample.
+
+        arg_cache:                  str
+                                    "cold" to clear the ngram cache before
+                                    every sample, or "warm" to run one untimed
+                                    sample first and never clear it.
+
+        arg_repeat:                 int
+                                    The number of timed samples.
+
+    Returns:
+        list
+        The duration of each sample, in seconds.
+    """
+
+    if HAS_CACHE_API:
+        CharNgram.clear_cache()
+
+    if arg_cache == "warm":
+        arg_function()
+
+    samples = []
+
+    for i in range(arg_repeat):
+        if arg_cache == "cold":
+            CharNgram.clear_cache()
+
+        start = time.perf_counter()
+        arg_function()
+        samples.append(time.perf_counter() - start)
+
+    return samples
+
+# ------------------------------------------------------------------------------
+def get_revision():
+    """Returns the git revision of fuzzjunkie.py, or None if unknown.
+
+    Example:
+        "b93586b-dirty"
+    """
+
+    try:
+        process = subprocess.run(
+            ["git", "describe", "--always", "--dirty"],
+            cwd=os.path.dirname(os.path.abspath(fuzzjunkie.__file__)),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            universal_newlines=True
+        )
+    except OSError:     # Raised if git is not installed.
+        return None
+
+    if process.returncode != 0:
+        return None
+
+    return process.stdout.strip() or None
+
+# ------------------------------------------------------------------------------
+def run(
+    arg_quick=False,
+    arg_repeat=5,
+    arg_filter=None,
+    arg_seed=0,
+    arg_label=None
+):
+    """Runs the benchmark cases.
+
+    The ngram cache is replaced with an unbounded one for the duration of the
+    run, so that warm runs never miss because of evictions. Versions of
+    fuzzjunkie.py without the cache API keep their own cache.
+
+    Args:
+        arg_quick:                  bool (optional)
+                                    See iter_cases().
+                                    Defaults to False.
+
+        arg_repeat:                 int (optional)
+                                    The number of timed samples per case.
+                                    Defaults to 5.
+
+        arg_filter:                 str|None (optional)
+                                    If given, only cases whose key contains it
+                                    are run.
+                                    Defaults to None.
+
+        arg_seed:                   int (optional)
+                                    The random seed of the corpora.
+                                    Defaults to 0.
+
+        arg_label:                  str|None (optional)
+                                    A name for the benchmarked build, shown
+                                    by compare(). None uses the git revision
+                                    of fuzzjunkie.py, or failing that its
+                                    version.
+                                    Defaults to None.
+
+    Returns:
+        dict
+        The results, ready to be saved as JSON.
+    """
+
+    revision = get_revision()
+
+    if HAS_CACHE_API:
+        CharNgram.set_cache(fuzzjunkie.CharNgramCache(None, None))
+
+    results = []
+
+    try:
+        for name, params, operations, function in iter_cases(
+            arg_quick,
+            arg_seed
+        ):
+            key = get_case_key(name, params)
+
+            if arg_filter is not None and arg_filter not in key:
+                continue
+
+            samples = time_case(function, params["cache"], arg_repeat)
+
+            results.append(
+                {
+                    "key": key,
+                    "name": name,
+                    "params": params,
+                    "operations": operations,
+                    "samples": samples,
+                    "min": min(samples),
+                    "median": statistics.median(samples)
+                }
+            )
+
+            print(
+                "%-80s %10.3f ms/op" % (
+                    key,
+                    statistics.median(samples) / operations * 1000
+                ),
+                file=sys.stderr
+            )
+    finally:
+        if HAS_CACHE_API:
+            CharNgram.set_cache(fuzzjunkie.CharNgramCache())
+
+    return {
+        "format": RESULTS_FORMAT,
+        "fuzzjunkie": fuzzjunkie.__version__,
+        "revision": revision,
+        "label": arg_label or revision or fuzzjunkie.__version__,
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.platform(),
+        "date": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "quick": arg_quick,
+        "repeat": arg_repeat,
+        "seed": arg_seed,
+        "results": results
+    }
+
+# ------------------------------------------------------------------------------
+def compare(arg_baseline, arg_candidate, arg_tolerance=0.1):
+    """Compares two sets of results.
+
+    Compares the median duration of every case found in both sets. A case
+    counts as a regression if the candidate's median exceeds the baseline's
+    by more than arg_tolerance, and as an improvement if the baseline's
+    median exceeds the candidate's by more than arg_tolerance.
+
+    Args:
+        arg_baseline:               dict
+                                    The results to compare against, as
+                                    returned by run().
+
+        arg_candidate:              dict
+                                    The results to compare.
+
+        arg_tolerance:              float (optional)
+                                    The relative change to tolerate as noise.
+                                    Defaults to 0.1 (10%).
+
+    Returns:
+        tuple
+        The report as a list of lines, and the number of regressions.
+    """
+
+    baseline = {result["key"]: result for result in arg_baseline["results"]}
+    candidate = {result["key"]: result for result in arg_candidate["results"]}
+
+    lines = [
+        "baseline:  fuzzjunkie %s (%s), Python %s, %s" % (
+            arg_baseline["fuzzjunkie"],
+            arg_baseline.get("label") or "unlabeled",
+            arg_baseline["python"],
+            arg_baseline["date"]
+        ),
+        "candidate: fuzzjunkie %s (%s), Python %s, %s" % (
+            arg_candidate["fuzzjunkie"],
+            arg_candidate.get("label") or "unlabeled",
+            arg_candidate["python"],
+            arg_candidate["date"]
+        ),
+        "",
+        "%-80s %12s %12s %8s  %s" % (
+            "case", "base ms/op", "cand ms/op", "ratio", "status"
+        )
+    ]
+
+    regressions = 0
+    improvements = 0
+
+    for key in sorted(baseline.keys() & candidate.keys()):
+        base_median = baseline[key]["median"] / baseline[key]["operations"]
+        candidate_median = (
+            candidate[key]["median"] / candidate[key]["operations"]
+        )
+
+        if base_median > 0:
+            ratio = candidate_median / base_median
+        else:
+            ratio = 1.0
+
+        if ratio > 1 + arg_tolerance:
+            status = "SLOWER"
+            regressions += 1
+        elif ratio < 1 / (1 + arg_tolerance):
+            status = "faster"
+            improvements += 1
+        else:
+            status = ""
+
+        lines.append(
+            "%-80s %12.3f %12.3f %7.2fx  %s" % (
+                key,
+                base_median * 1000,
+                candidate_median * 1000,
+                ratio,
+                status
+            )
+        )
+
+    for key in sorted(baseline.keys() - candidate.keys()):
+        lines.append("%-80s only in baseline" % key)
+
+    for key in sorted(candidate.keys() - baseline.keys()):
+        lines.append("%-80s only in candidate" % key)
+
+    lines.append("")
+    lines.append(
+        "%d slower, %d faster, %d within %.0f%%" % (
+            regressions,
+            improvements,
+            len(baseline.keys() & candidate.keys())
+            - regressions
+            - improvements,
+            arg_tolerance * 100
+        )
+    )
+
+    return lines, regressions
+
+# ------------------------------------------------------------------------------
+def main(arg_argv=None):
+    """Runs or compares benchmarks from the command line.
+
+    Args:
+        arg_argv:                   list|None (optional)
+                                    The command-line arguments, without the
+                                    program name. None uses sys.argv.
+                                    Defaults to None.
+
+    Returns:
+        int
+        The exit status: 1 if a comparison found regressions, 0 otherwise.
+    """
+
+    parser = argparse.ArgumentParser(
+        prog="fuzzjunkie_benchmark",
+        description="Benchmark fuzzjunkie and compare benchmark results."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run the benchmarks")
+    run_parser.add_argument(
+        "-o", "--output",
+        help="file to save the JSON results to (default: stdout)"
+    )
+    run_parser.add_argument(
+        "-q", "--quick",
+        action="store_true",
+        help="leave out the largest corpora and strings"
+    )
+    run_parser.add_argument(
+        "-r", "--repeat",
+        type=int,
+        default=5,
+        help="timed samples per case (default: 5)"
+    )
+    run_parser.add_argument(
+        "-k", "--filter",
+        help="only run cases whose key contains this string"
+    )
+    run_parser.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="random seed of the synthetic corpora (default: 0)"
+    )
+    run_parser.add_argument(
+        "-l", "--label",
+        help="name of the benchmarked build, shown when comparing "
+             "(default: the git revision of fuzzjunkie.py)"
+    )
+
+    compare_parser = commands.add_parser(
+        "compare",
+        help="compare two saved results"
+    )
+    compare_parser.add_argument("baseline", help="results to compare against")
+    compare_parser.add_argument("candidate", help="results to compare")
+    compare_parser.add_argument(
+        "-t", "--tolerance",
+        type=float,
+        default=0.1,
+        help="relative change tolerated as noise (default: 0.1)"
+    )
+
+    arguments = parser.parse_args(arg_argv)
+
+    if arguments.command == "run":
+        if arguments.repeat < 1:
+            parser.error("argument -r/--repeat: must be at least 1")
+
+        results = run(
+            arguments.quick,
+            arguments.repeat,
+            arguments.filter,
+            arguments.seed,
+            arguments.label
+        )
+
+        if arguments.output is None:
+            json.dump(results, sys.stdout, indent=2)
+            print()
+        else:
+            with open(arguments.output, "w") as file:
+                json.dump(results, file, indent=2)
+
+        return 0
+
+    with open(arguments.baseline) as file:
+        baseline = json.load(file)
+
+    with open(arguments.candidate) as file:
+        candidate = json.load(file)
+
+    for results in [baseline, candidate]:
+        if results.get("format") != RESULTS_FORMAT:
+            parser.error("unsupported results format")
+
+    lines, regressions = compare(baseline, candidate, arguments.tolerance)
+
+    print("\n".join(lines))
+
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
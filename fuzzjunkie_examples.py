@@ -417,6 +417,36 @@ def main():
         + str(best_match_index) + " (index of best by # ngram matches)"
     )
 
+    ############################################################################
+    print(
+        os.linesep + "Comparing an input string against an index of reference "
+        + "strings, getting ranked matches:" + os.linesep
+    )
+
+    # --------------------------------------------------------------------------
+    reference_strings = [
+        "Hydrogen", "Helium", "Lithium", "Beryllium", "Boron",
+        "Carbon", "Nitrogen", "Oxygen", "Fluorine", "Neon"
+    ]
+    ngram_size = 2
+    reference_index = CharNgram.build_index(reference_strings, ngram_size)
+    input_string = "floreen"
+    scoring_method = CharNgram.Scoring.PERCENTAGE
+    return_type = CharNgram.ReturnBy.STRING
+    return_scores = CharNgram.ReturnScope.ALL
+    ranked_matches = CharNgram.compare_list(
+        reference_index,
+        input_string,
+        scoring_method,
+        ngram_size,
+        return_type,
+        return_scores
+    )
+    print(
+        'Comparing "' + input_string + '" to reference index (% match):'
+    )
+    print(ranked_matches)
+
 if __name__ == "__main__":
     main()
 
@@ -37,9 +37,26 @@ __copyright__ = "Juan Irming"
 __maintainer__ = "Juan Irming"
 
 # ------------------------------------------------------------------------------
+import asyncio
+import contextlib
+import io
+import json
+import os
+import struct
+import tempfile
+import threading
 import unittest
 
-from fuzzjunkie import CharNgram, CharNgramException
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from fuzzjunkie import (
+    CharNgram, CharNgramCache, CharNgramException, CharNgramMetrics,
+    CharNgramProfile, CharNgramShardPool, CharNgramSimHashIndex, WordNgram,
+    main
+)
 
 # ------------------------------------------------------------------------------
 class TestCharNgramMethods(unittest.TestCase):
@@ -433,6 +450,88 @@ class TestCharNgramMethods(unittest.TestCase):
             1
         )
 
+        for scoring_method in CharNgram.Scoring:
+            for ngram_sizes in [(1,), (1, 2, 3), (3, 1), (2, 100)]:
+                for reference_string, input_string in [
+                    ("testing", "test"),
+                    ("Test", "tEST"),
+                    ("testing", ""),
+                    ("", "")
+                ]:
+                    self.assertEqual(
+                        CharNgram.compare_string(
+                            reference_string,
+                            input_string,
+                            scoring_method,
+                            ngram_sizes
+                        ),
+                        tuple(
+                            CharNgram.compare_string(
+                                reference_string,
+                                input_string,
+                                scoring_method,
+                                ngram_size
+                            )
+                            for ngram_size in ngram_sizes
+                        )
+                    )
+
+        with self.assertRaises(CharNgramException):
+            CharNgram.compare_string("testing", "test", arg_ngram_size=())
+
+        with self.assertRaises(CharNgramException):
+            CharNgram.compare_string("testing", "test", arg_ngram_size=(1, "2"))
+
+        self.assertEqual(
+            [
+                CharNgram.compare_string("testing", "test", scoring_method)
+                for scoring_method in CharNgram.Scoring
+            ],
+            [50.0, 3, 100.0, 2 / 3 * 100, 50.0, 3 / 18 ** 0.5 * 100]
+        )
+
+        self.assertEqual(
+            CharNgram.compare_string(
+                "testing",
+                "test",
+                (
+                    CharNgram.Scoring.DICE,
+                    CharNgram.Scoring.JACCARD,
+                    CharNgram.Scoring.MATCHES
+                )
+            ),
+            (2 / 3 * 100, 50.0, 3)
+        )
+
+        self.assertEqual(
+            CharNgram.compare_string(
+                "testing",
+                "",
+                (CharNgram.Scoring.INPUT_PERCENTAGE, CharNgram.Scoring.DICE)
+            ),
+            (0, 0.0)
+        )
+
+        self.assertEqual(
+            CharNgram.compare_string(
+                "testing",
+                "test",
+                (CharNgram.Scoring.COSINE, CharNgram.Scoring.MATCHES),
+                (1, 2)
+            ),
+            ((4 / 28 ** 0.5 * 100, 4), (3 / 18 ** 0.5 * 100, 3))
+        )
+
+        with self.assertRaises(CharNgramException):
+            CharNgram.compare_string("testing", "test", ())
+
+        with self.assertRaises(CharNgramException):
+            CharNgram.compare_string(
+                "testing",
+                "test",
+                (CharNgram.Scoring.DICE, 1337)
+            )
+
     # --------------------------------------------------------------------------
     def test_compare_list(self):
         """Tests for CharNgram.compare_list."""
@@ -697,6 +796,728 @@ class TestCharNgramMethods(unittest.TestCase):
                 ("Beryllium", 0)
             ]
 
+        reference_list = ["Hydrogen", "Helium", "Neon", "hydrogen", "Nitrogen"]
+
+        self.assertEqual(
+            CharNgram.compare_list(
+                reference_list,
+                "hidrogen",
+                CharNgram.Scoring.PERCENTAGE,
+                (2, 1),
+                CharNgram.ReturnBy.INDEX,
+                CharNgram.ReturnScope.ALL
+            ),
+            [
+                (0, (5 / 7 * 100, 87.5)),
+                (3, (5 / 7 * 100, 87.5)),
+                (4, (4 / 7 * 100, 75.0)),
+                (2, (0.0, 75.0)),
+                (1, (0.0, 50.0))
+            ]
+        )
+
+        self.assertEqual(
+            CharNgram.compare_list(
+                reference_list,
+                "hidrogen",
+                CharNgram.Scoring.MATCHES,
+                (1, 3)
+            ),
+            [
+                ("hydrogen", (7, 4)),
+                ("Hydrogen", (7, 4))
+            ]
+        )
+
+        self.assertEqual(
+            CharNgram.get_best_list_match(
+                reference_list,
+                "zzz",
+                arg_ngram_size=(1, 2)
+            ),
+            None
+        )
+
+        with self.assertRaises(CharNgramException):
+            CharNgram.compare_list(
+                reference_list,
+                "hidrogen",
+                CharNgram.Scoring.PERCENTAGE,
+                (2, 1),
+                arg_min_score=50
+            )
+
+        with self.assertRaises(CharNgramException):
+            CharNgram.build_index(reference_list, (2, 1))
+
+        scoring_methods = (CharNgram.Scoring.JACCARD, CharNgram.Scoring.DICE)
+
+        for compiled in [
+            reference_list,
+            CharNgram.compile(reference_list),
+            CharNgram.build_index(reference_list)
+        ]:
+            self.assertEqual(
+                CharNgram.compare_list(
+                    compiled,
+                    "hidrogens",
+                    scoring_methods,
+                    2,
+                    CharNgram.ReturnBy.INDEX,
+                    CharNgram.ReturnScope.ALL
+                ),
+                [
+                    (0, (50.0, 2 / 3 * 100)),
+                    (3, (50.0, 2 / 3 * 100)),
+                    (4, (4 / 11 * 100, 8 / 15 * 100)),
+                    (1, (0.0, 0.0)),
+                    (2, (0.0, 0.0))
+                ]
+            )
+
+            for scoring_method in scoring_methods:
+                self.assertEqual(
+                    CharNgram.compare_list(
+                        compiled,
+                        "hidrogens",
+                        scoring_method,
+                        2,
+                        CharNgram.ReturnBy.STRING,
+                        CharNgram.ReturnScope.ALL,
+                        40
+                    ),
+                    [
+                        (
+                            "hydrogen",
+                            CharNgram.compare_string(
+                                "hydrogen",
+                                "hidrogens",
+                                scoring_method
+                            )
+                        ),
+                        (
+                            "Hydrogen",
+                            CharNgram.compare_string(
+                                "Hydrogen",
+                                "hidrogens",
+                                scoring_method
+                            )
+                        )
+                    ] + (
+                        [("Nitrogen", 8 / 15 * 100)]
+                        if scoring_method == CharNgram.Scoring.DICE
+                        else []
+                    )
+                )
+
+        with self.assertRaises(CharNgramException):
+            CharNgram.compare_list(
+                reference_list,
+                "hidrogen",
+                scoring_methods,
+                arg_min_score=50
+            )
+
+    # --------------------------------------------------------------------------
+    @unittest.skipIf(numpy is None, "numpy is not installed")
+    def test_build_matrix(self):
+        """Tests for CharNgram.build_matrix."""
+
+        self.maxDiff = None
+
+        reference_list = [
+            "Hydrogen",
+            "Helium",
+            "Lithium",
+            "Beryllium",
+            "Boron",
+            "Carbon",
+            "Nitrogen",
+            "Oxygen",
+            "Fluorine",
+            "Neon",
+            "",
+            "Neon"
+        ]
+
+        for ngram_size in [1, 2, 3]:
+            matrix = CharNgram.build_matrix(reference_list, ngram_size)
+
+            self.assertEqual(len(matrix), len(reference_list))
+            self.assertEqual(matrix.ngram_size, ngram_size)
+
+            for input_string in ["floreen", "um", "zazozuzezizy", ""]:
+                for scoring_method in CharNgram.Scoring:
+                    for return_type in CharNgram.ReturnBy:
+                        for return_scores in CharNgram.ReturnScope:
+                            self.assertEqual(
+                                CharNgram.compare_list(
+                                    matrix,
+                                    input_string,
+                                    scoring_method,
+                                    ngram_size,
+                                    return_type,
+                                    return_scores
+                                ),
+                                CharNgram.compare_list(
+                                    reference_list,
+                                    input_string,
+                                    scoring_method,
+                                    ngram_size,
+                                    return_type,
+                                    return_scores
+                                )
+                            )
+
+        matrix = CharNgram.build_matrix(reference_list)
+
+        self.assertEqual(
+            CharNgram.get_best_list_match(matrix, "floreen"),
+            "Fluorine"
+        )
+
+        self.assertEqual(
+            CharNgram.get_best_list_match_index(matrix, "floreen"),
+            8
+        )
+
+        with self.assertRaises(CharNgramException):
+            CharNgram.build_matrix([])
+
+        with self.assertRaises(CharNgramException):
+            CharNgram.build_matrix(["testing", None])
+
+    # --------------------------------------------------------------------------
+    def test_compare_list_topk(self):
+        """Tests for CharNgram.compare_list_topk."""
+
+        self.maxDiff = None
+
+        reference_list = [
+            "Hydrogen",
+            "Helium",
+            "Lithium",
+            "Beryllium",
+            "Boron",
+            "Carbon",
+            "Nitrogen",
+            "Oxygen",
+            "Fluorine",
+            "Neon",
+            "Neon"
+        ]
+
+        self.assertEqual(
+            CharNgram.compare_list_topk(
+                reference_list,
+                "floreen",
+                2,
+                CharNgram.Scoring.PERCENTAGE,
+                2,
+                CharNgram.ReturnBy.STRING
+            ),
+            [
+                ("Fluorine", 2 / 7 * 100),
+                ("Boron", 1 / 4 * 100)
+            ]
+        )
+
+        self.assertEqual(
+            CharNgram.compare_list_topk(
+                reference_list,
+                "floreen",
+                3,
+                CharNgram.Scoring.MATCHES,
+                2,
+                CharNgram.ReturnBy.INDEX
+            ),
+            [
+                (8, 2),
+                (0, 1),
+                (4, 1)
+            ]
+        )
+
+        index = CharNgram.build_index(reference_list)
+
+        for k in range(1, len(reference_list) + 2):
+            for input_string in ["floreen", "um", "zazozuzezizy"]:
+                for scoring_method in CharNgram.Scoring:
+                    for return_type in CharNgram.ReturnBy:
+                        expected = CharNgram.compare_list(
+                            reference_list,
+                            input_string,
+                            scoring_method,
+                            2,
+                            return_type,
+                            CharNgram.ReturnScope.ALL
+                        )[:k]
+
+                        self.assertEqual(
+                            CharNgram.compare_list_topk(
+                                reference_list,
+                                input_string,
+                                k,
+                                scoring_method,
+                                2,
+                                return_type
+                            ),
+                            expected
+                        )
+
+                        self.assertEqual(
+                            CharNgram.compare_list_topk(
+                                index,
+                                input_string,
+                                k,
+                                scoring_method,
+                                2,
+                                return_type
+                            ),
+                            expected
+                        )
+
+        with self.assertRaises(CharNgramException):
+            CharNgram.compare_list_topk([], "floreen", 1)
+
+        with self.assertRaises(CharNgramException):
+            CharNgram.compare_list_topk(None, "floreen", 1)
+
+        with self.assertRaises(CharNgramException):
+            CharNgram.compare_list_topk(reference_list, "floreen", 0)
+
+        with self.assertRaises(CharNgramException):
+            CharNgram.compare_list_topk(reference_list, "floreen", None)
+
+        with self.assertRaises(CharNgramException):
+            CharNgram.compare_list_topk(
+                reference_list,
+                "floreen",
+                1,
+                CharNgram.Scoring.PERCENTAGE,
+                2,
+                1337
+            )
+
+    # --------------------------------------------------------------------------
+    def test_compare_list_min_score(self):
+        """Tests for the arg_min_score of CharNgram.compare_list."""
+
+        self.maxDiff = None
+
+        reference_list = [
+            "Hydrogen",
+            "Helium",
+            "Lithium",
+            "Beryllium",
+            "Boron",
+            "Carbon",
+            "Nitrogen",
+            "Oxygen",
+            "Fluorine",
+            "Neon",
+            "Neon",
+            ""
+        ]
+
+        self.assertEqual(
+            CharNgram.compare_list(
+                reference_list,
+                "Flourine",
+                CharNgram.Scoring.PERCENTAGE,
+                2,
+                CharNgram.ReturnBy.STRING,
+                CharNgram.ReturnScope.ALL,
+                20
+            ),
+            [
+                ("Fluorine", 4 / 7 * 100),
+                ("Neon", 1 / 3 * 100)
+            ]
+        )
+
+        self.assertEqual(
+            CharNgram.compare_list(
+                reference_list,
+                "Flourine",
+                CharNgram.Scoring.MATCHES,
+                2,
+                CharNgram.ReturnBy.INDEX,
+                CharNgram.ReturnScope.ALL,
+                1
+            ),
+            [
+                (8, 4),
+                (9, 1),
+                (10, 1)
+            ]
+        )
+
+        self.assertEqual(
+            CharNgram.compare_list(
+                reference_list,
+                "Flourine",
+                CharNgram.Scoring.PERCENTAGE,
+                2,
+                CharNgram.ReturnBy.STRING,
+                CharNgram.ReturnScope.TOP,
+                100
+            ),
+            []
+        )
+
+        compiled_lists = [
+            reference_list,
+            CharNgram.compile(reference_list),
+            CharNgram.build_index(reference_list)
+        ]
+
+        if numpy is not None:
+            compiled_lists.append(CharNgram.build_matrix(reference_list))
+
+        for input_string in ["Flourine", "um", "zazozuzezizy", ""]:
+            for scoring_method in CharNgram.Scoring:
+                for return_type in CharNgram.ReturnBy:
+                    scores = CharNgram.compare_list(
+                        reference_list,
+                        input_string,
+                        scoring_method,
+                        2,
+                        return_type,
+                        CharNgram.ReturnScope.ALL
+                    )
+
+                    for min_score in [-1, 0, 1, 2, 25, 100 / 3, 50, 100, 101]:
+                        expected = [
+                            score for score in scores if score[1] >= min_score
+                        ]
+
+                        if expected:
+                            expected_top = [
+                                score for score in expected if (
+                                    score[1] >= expected[0][1]
+                                )
+                            ]
+                        else:
+                            expected_top = []
+
+                        for compiled_list in compiled_lists:
+                            self.assertEqual(
+                                CharNgram.compare_list(
+                                    compiled_list,
+                                    input_string,
+                                    scoring_method,
+                                    2,
+                                    return_type,
+                                    CharNgram.ReturnScope.ALL,
+                                    min_score
+                                ),
+                                expected
+                            )
+
+                            self.assertEqual(
+                                CharNgram.compare_list(
+                                    compiled_list,
+                                    input_string,
+                                    scoring_method,
+                                    2,
+                                    return_type,
+                                    CharNgram.ReturnScope.TOP,
+                                    min_score
+                                ),
+                                expected_top
+                            )
+
+                            self.assertEqual(
+                                CharNgram.compare_list_topk(
+                                    compiled_list,
+                                    input_string,
+                                    2,
+                                    scoring_method,
+                                    2,
+                                    return_type,
+                                    min_score
+                                ),
+                                expected[:2]
+                            )
+
+        with self.assertRaises(CharNgramException):
+            CharNgram.compare_list(
+                reference_list,
+                "Flourine",
+                CharNgram.Scoring.PERCENTAGE,
+                2,
+                CharNgram.ReturnBy.STRING,
+                CharNgram.ReturnScope.ALL,
+                "50"
+            )
+
+        with self.assertRaises(CharNgramException):
+            CharNgram.compare_list(
+                reference_list,
+                "Flourine",
+                1337,
+                2,
+                CharNgram.ReturnBy.STRING,
+                CharNgram.ReturnScope.ALL,
+                50
+            )
+
+    # --------------------------------------------------------------------------
+    def test_iter_compare(self):
+        """Tests for CharNgram.iter_compare."""
+
+        self.maxDiff = None
+
+        reference_list = [
+            "Hydrogen",
+            "Helium",
+            "Lithium",
+            "Beryllium",
+            "Boron",
+            "Carbon",
+            "Nitrogen",
+            "Oxygen",
+            "Fluorine",
+            "Neon",
+            "Neon"
+        ]
+
+        self.assertEqual(
+            list(
+                CharNgram.iter_compare(
+                    iter(reference_list),
+                    "neon",
+                    CharNgram.Scoring.MATCHES,
+                    2,
+                    CharNgram.ReturnBy.STRING,
+                    1
+                )
+            ),
+            [
+                ("Boron", 1),
+                ("Carbon", 1),
+                ("Fluorine", 1),
+                ("Neon", 3),
+                ("Neon", 3)
+            ]
+        )
+
+        for input_string in ["floreen", "um", "zazozuzezizy"]:
+            for scoring_method in CharNgram.Scoring:
+                self.assertEqual(
+                    list(
+                        CharNgram.iter_compare(
+                            (string for string in reference_list),
+                            input_string,
+                            scoring_method,
+                            2,
+                            CharNgram.ReturnBy.INDEX
+                        )
+                    ),
+                    sorted(
+                        CharNgram.compare_list(
+                            reference_list,
+                            input_string,
+                            scoring_method,
+                            2,
+                            CharNgram.ReturnBy.INDEX,
+                            CharNgram.ReturnScope.ALL
+                        )
+                    )
+                )
+
+        self.assertEqual(
+            list(CharNgram.iter_compare(iter([]), "floreen")),
+            []
+        )
+
+        with self.assertRaises(CharNgramException):
+            list(CharNgram.iter_compare(iter([None]), "floreen"))
+
+        with self.assertRaises(CharNgramException):
+            list(
+                CharNgram.iter_compare(
+                    iter(reference_list),
+                    "floreen",
+                    CharNgram.Scoring.PERCENTAGE,
+                    2,
+                    1337
+                )
+            )
+
+    # --------------------------------------------------------------------------
+    def test_compare_iterable_topk(self):
+        """Tests for CharNgram.compare_iterable_topk."""
+
+        self.maxDiff = None
+
+        reference_list = [
+            "Neon",
+            "Hydrogen",
+            "Helium",
+            "Lithium",
+            "Beryllium",
+            "Boron",
+            "Carbon",
+            "Nitrogen",
+            "Oxygen",
+            "Fluorine",
+            "Neon",
+            "Neon"
+        ]
+
+        for k in range(1, len(reference_list) + 2):
+            for input_string in ["floreen", "neon", "um", "zazozuzezizy"]:
+                for scoring_method in CharNgram.Scoring:
+                    for return_type in CharNgram.ReturnBy:
+                        for min_score in [None, 1, 30]:
+                            self.assertEqual(
+                                CharNgram.compare_iterable_topk(
+                                    iter(reference_list),
+                                    input_string,
+                                    k,
+                                    scoring_method,
+                                    2,
+                                    return_type,
+                                    min_score
+                                ),
+                                CharNgram.compare_list_topk(
+                                    reference_list,
+                                    input_string,
+                                    k,
+                                    scoring_method,
+                                    2,
+                                    return_type,
+                                    min_score
+                                )
+                            )
+
+        with self.assertRaises(CharNgramException):
+            CharNgram.compare_iterable_topk(iter(reference_list), "floreen", 0)
+
+    # --------------------------------------------------------------------------
+    def test_compare_many(self):
+        """Tests for CharNgram.compare_many."""
+
+        self.maxDiff = None
+
+        reference_list = [
+            "Hydrogen",
+            "Helium",
+            "Lithium",
+            "Beryllium",
+            "Boron",
+            "Carbon",
+            "Nitrogen",
+            "Oxygen",
+            "Fluorine",
+            "Neon"
+        ]
+
+        self.assertEqual(
+            CharNgram.compare_many(
+                ["testing", "test"],
+                ["test", "testing", "test"],
+                CharNgram.Scoring.MATCHES,
+                2
+            ),
+            CharNgram.BatchScores(
+                None,
+                [
+                    [3, 3],
+                    [6, 3],
+                    [3, 3]
+                ]
+            )
+        )
+
+        self.assertEqual(
+            CharNgram.compare_many(
+                reference_list,
+                ["floreen", "um"],
+                CharNgram.Scoring.MATCHES,
+                2,
+                2
+            ),
+            CharNgram.BatchScores(
+                [
+                    [8, 0],
+                    [1, 2]
+                ],
+                [
+                    [2, 1],
+                    [1, 1]
+                ]
+            )
+        )
+
+        input_list = ["floreen", "um", "zazozuzezizy", "floreen", ""]
+        index = CharNgram.build_index(reference_list)
+
+        for scoring_method in CharNgram.Scoring:
+            for references in [reference_list, index]:
+                dense = CharNgram.compare_many(
+                    references,
+                    input_list,
+                    scoring_method
+                )
+
+                top = CharNgram.compare_many(
+                    references,
+                    input_list,
+                    scoring_method,
+                    2,
+                    3
+                )
+
+                self.assertEqual(dense.indexes, None)
+                self.assertEqual(len(dense.scores), len(input_list))
+                self.assertEqual(len(top.indexes), len(input_list))
+                self.assertEqual(len(top.scores), len(input_list))
+
+                for i, input_string in enumerate(input_list):
+                    self.assertEqual(
+                        sorted(enumerate(dense.scores[i])),
+                        sorted(
+                            CharNgram.compare_list(
+                                reference_list,
+                                input_string,
+                                scoring_method,
+                                2,
+                                CharNgram.ReturnBy.INDEX,
+                                CharNgram.ReturnScope.ALL
+                            )
+                        )
+                    )
+
+                    self.assertEqual(
+                        list(zip(top.indexes[i], top.scores[i])),
+                        CharNgram.compare_list_topk(
+                            reference_list,
+                            input_string,
+                            3,
+                            scoring_method,
+                            2,
+                            CharNgram.ReturnBy.INDEX
+                        )
+                    )
+
+        with self.assertRaises(CharNgramException):
+            CharNgram.compare_many(reference_list, [])
+
+        with self.assertRaises(CharNgramException):
+            CharNgram.compare_many([], ["floreen"])
+
+        with self.assertRaises(CharNgramException):
+            CharNgram.compare_many(
+                reference_list,
+                ["floreen"],
+                CharNgram.Scoring.PERCENTAGE,
+                2,
+                0
+            )
+
     # --------------------------------------------------------------------------
     def test_get_best_list_match(self):
         """Tests for CharNgram.get_best_list_match."""
@@ -869,6 +1690,2084 @@ class TestCharNgramMethods(unittest.TestCase):
             None
         )
 
+    # --------------------------------------------------------------------------
+    def test_compare_string_async(self):
+        """Tests for CharNgram.compare_string_async."""
+
+        self.maxDiff = None
+
+        for scoring_method in CharNgram.Scoring:
+            for ngram_size in [1, 2, 3]:
+                self.assertEqual(
+                    asyncio.run(
+                        CharNgram.compare_string_async(
+                            "testing",
+                            "inst",
+                            scoring_method,
+                            ngram_size
+                        )
+                    ),
+                    CharNgram.compare_string(
+                        "testing",
+                        "inst",
+                        scoring_method,
+                        ngram_size
+                    )
+                )
+
+    # --------------------------------------------------------------------------
+    def test_compare_list_async(self):
+        """Tests for CharNgram.compare_list_async."""
+
+        self.maxDiff = None
+
+        reference_list = [
+            "Hydrogen",
+            "Helium",
+            "Lithium",
+            "Beryllium",
+            "Boron",
+            "Carbon",
+            "Nitrogen",
+            "Oxygen",
+            "Fluorine",
+            "Neon",
+            "Neon"
+        ]
+
+        for compiled_list in [
+            reference_list,
+            CharNgram.compile(reference_list),
+            CharNgram.build_index(reference_list)
+        ]:
+            for input_string in ["floreen", "um", "zazozuzezizy"]:
+                for return_type in CharNgram.ReturnBy:
+                    for return_scores in CharNgram.ReturnScope:
+                        for chunk_size in [1, 3, 100]:
+                            self.assertEqual(
+                                asyncio.run(
+                                    CharNgram.compare_list_async(
+                                        compiled_list,
+                                        input_string,
+                                        CharNgram.Scoring.PERCENTAGE,
+                                        2,
+                                        return_type,
+                                        return_scores,
+                                        None,
+                                        chunk_size
+                                    )
+                                ),
+                                CharNgram.compare_list(
+                                    reference_list,
+                                    input_string,
+                                    CharNgram.Scoring.PERCENTAGE,
+                                    2,
+                                    return_type,
+                                    return_scores
+                                )
+                            )
+
+        async def compare_and_cancel():
+            ticks = 0
+
+            async def tick():
+                nonlocal ticks
+
+                while True:
+                    ticks += 1
+                    await asyncio.sleep(0)
+
+            ticker = asyncio.create_task(tick())
+            comparison = asyncio.create_task(
+                CharNgram.compare_list_async(
+                    reference_list * 10000,
+                    "floreen",
+                    arg_chunk_size=10
+                )
+            )
+
+            await asyncio.sleep(0.01)
+            comparison.cancel()
+            ticker.cancel()
+
+            with self.assertRaises(asyncio.CancelledError):
+                await comparison
+
+            return ticks
+
+        self.assertGreater(asyncio.run(compare_and_cancel()), 1)
+
+        with self.assertRaises(CharNgramException):
+            asyncio.run(CharNgram.compare_list_async([], "floreen"))
+
+        with self.assertRaises(CharNgramException):
+            asyncio.run(
+                CharNgram.compare_list_async(
+                    reference_list,
+                    "floreen",
+                    arg_chunk_size=0
+                )
+            )
+
+    # --------------------------------------------------------------------------
+    def test_get_best_list_match_async(self):
+        """Tests for CharNgram.get_best_list_match_async."""
+
+        self.maxDiff = None
+
+        reference_list = [
+            "Hydrogen",
+            "Helium",
+            "Lithium",
+            "Beryllium",
+            "Boron",
+            "Carbon",
+            "Nitrogen",
+            "Oxygen",
+            "Fluorine",
+            "Neon",
+            "Neon"
+        ]
+
+        for compiled_list in [
+            reference_list,
+            CharNgram.compile(reference_list),
+            CharNgram.build_index(reference_list)
+        ]:
+            for input_string in ["floreen", "neon", "um", "zazozuzezizy"]:
+                for scoring_method in CharNgram.Scoring:
+                    self.assertEqual(
+                        asyncio.run(
+                            CharNgram.get_best_list_match_async(
+                                compiled_list,
+                                input_string,
+                                scoring_method,
+                                2,
+                                2
+                            )
+                        ),
+                        CharNgram.get_best_list_match(
+                            reference_list,
+                            input_string,
+                            scoring_method
+                        )
+                    )
+
+        with self.assertRaises(CharNgramException):
+            asyncio.run(CharNgram.get_best_list_match_async([], "floreen"))
+
+    # --------------------------------------------------------------------------
+    def test_compile(self):
+        """Tests for CharNgram.compile."""
+
+        self.maxDiff = None
+
+        reference_list = [
+            "Hydrogen",
+            "Helium",
+            "Lithium",
+            "Beryllium",
+            "Boron",
+            "Carbon",
+            "Nitrogen",
+            "Oxygen",
+            "Fluorine",
+            "Neon",
+            "",
+            "Neon"
+        ]
+
+        for ngram_size in [1, 2, 3]:
+            reference_set = CharNgram.compile(reference_list, ngram_size)
+
+            self.assertEqual(len(reference_set), len(reference_list))
+            self.assertEqual(reference_set.ngram_size, ngram_size)
+            self.assertEqual(reference_set.references, tuple(reference_list))
+            self.assertEqual(reference_set.unique_ids, tuple(range(11)))
+
+            for input_string in ["floreen", "um", "zazozuzezizy", ""]:
+                for scoring_method in CharNgram.Scoring:
+                    for return_type in CharNgram.ReturnBy:
+                        for return_scores in CharNgram.ReturnScope:
+                            self.assertEqual(
+                                CharNgram.compare_list(
+                                    reference_set,
+                                    input_string,
+                                    scoring_method,
+                                    ngram_size,
+                                    return_type,
+                                    return_scores
+                                ),
+                                CharNgram.compare_list(
+                                    reference_list,
+                                    input_string,
+                                    scoring_method,
+                                    ngram_size,
+                                    return_type,
+                                    return_scores
+                                )
+                            )
+
+        reference_set = CharNgram.compile(reference_list, 2)
+
+        self.assertEqual(
+            {
+                total: list(bucket)
+                for total, bucket in reference_set.buckets.items()
+            },
+            {
+                0: [10], 3: [9, 11], 4: [4], 5: [1, 5, 7], 6: [2], 7: [0, 6, 8],
+                8: [3]
+            }
+        )
+        self.assertEqual(list(reference_set.unique_buckets[3]), [9])
+
+        # Only the buckets that can reach the minimum score are scanned, yet
+        # results match those of the plain list.
+        for input_string in ["floreen", "um", "neon", "hydrogens", ""]:
+            for scoring_method in CharNgram.Scoring:
+                for min_score in [0, 1, 25, 50, 80, 100]:
+                    for return_type in CharNgram.ReturnBy:
+                        self.assertEqual(
+                            CharNgram.compare_list(
+                                reference_set,
+                                input_string,
+                                scoring_method,
+                                2,
+                                return_type,
+                                CharNgram.ReturnScope.ALL,
+                                arg_min_score=min_score
+                            ),
+                            CharNgram.compare_list(
+                                reference_list,
+                                input_string,
+                                scoring_method,
+                                2,
+                                return_type,
+                                CharNgram.ReturnScope.ALL,
+                                arg_min_score=min_score
+                            )
+                        )
+
+        self.assertEqual(
+            CharNgram.get_best_list_match(reference_set, "floreen"),
+            "Fluorine"
+        )
+
+        self.assertEqual(
+            CharNgram.get_best_list_match_index(reference_set, "floreen"),
+            8
+        )
+
+        self.assertEqual(
+            CharNgram.compare_many(reference_set, ["floreen"], arg_k=1),
+            CharNgram.BatchScores([[8]], [[2 / 7 * 100]])
+        )
+
+        with self.assertRaises(AttributeError):
+            reference_set.ngram_size = 3
+
+        with self.assertRaises(AttributeError):
+            reference_set.extra = None
+
+        for mutate in [
+            lambda: reference_set.totals.__setitem__(0, 0),
+            lambda: reference_set.buckets.clear(),
+            lambda: reference_set.unique_buckets.__setitem__(1, ()),
+            lambda: reference_set.buckets[
+                reference_set.totals[0]
+            ].__setitem__(0, 0),
+            lambda: reference_set.profiles[0].keys.__setitem__(0, 0),
+            lambda: reference_set.profiles[0].counts.__setitem__(0, 0)
+        ]:
+            with self.assertRaises((AttributeError, TypeError)):
+                mutate()
+
+        with self.assertRaises(CharNgramException):
+            CharNgram.compile([])
+
+        with self.assertRaises(CharNgramException):
+            CharNgram.compile(["testing", None])
+
+    # --------------------------------------------------------------------------
+    def test_build_index(self):
+        """Tests for CharNgram.build_index."""
+
+        self.maxDiff = None
+
+        reference_list = [
+            "Hydrogen",
+            "Helium",
+            "Lithium",
+            "Beryllium",
+            "Boron",
+            "Carbon",
+            "Nitrogen",
+            "Oxygen",
+            "Fluorine",
+            "Neon",
+            "",
+            "Neon"
+        ]
+
+        for ngram_size in [1, 2, 3]:
+            index = CharNgram.build_index(reference_list, ngram_size)
+
+            self.assertEqual(len(index), len(reference_list))
+            self.assertEqual(index.ngram_size, ngram_size)
+
+            for input_string in ["floreen", "um", "zazozuzezizy", ""]:
+                for scoring_method in CharNgram.Scoring:
+                    for return_type in CharNgram.ReturnBy:
+                        for return_scores in CharNgram.ReturnScope:
+                            self.assertEqual(
+                                CharNgram.compare_list(
+                                    index,
+                                    input_string,
+                                    scoring_method,
+                                    ngram_size,
+                                    return_type,
+                                    return_scores
+                                ),
+                                CharNgram.compare_list(
+                                    reference_list,
+                                    input_string,
+                                    scoring_method,
+                                    ngram_size,
+                                    return_type,
+                                    return_scores
+                                )
+                            )
+
+        index = CharNgram.build_index(reference_list)
+
+        self.assertEqual(
+            CharNgram.get_best_list_match(index, "floreen"),
+            "Fluorine"
+        )
+
+        self.assertEqual(
+            CharNgram.get_best_list_match_index(index, "floreen"),
+            8
+        )
+
+        self.assertEqual(
+            CharNgram.get_best_list_match(index, "zazozuzezizy"),
+            None
+        )
+
+        with self.assertRaises(CharNgramException):
+            CharNgram.build_index([])
+
+        with self.assertRaises(CharNgramException):
+            CharNgram.build_index(None)
+
+        with self.assertRaises(CharNgramException):
+            CharNgram.build_index(["testing", None])
+
+        with self.assertRaises(CharNgramException):
+            CharNgram.compare_list(
+                index,
+                "floreen",
+                1337
+            )
+
+        with self.assertRaises(CharNgramException):
+            CharNgram.compare_list(
+                index,
+                "floreen",
+                CharNgram.Scoring.PERCENTAGE,
+                2,
+                1337
+            )
+
+    # --------------------------------------------------------------------------
+    def test_add_reference(self):
+        """Tests for CharNgram.add_reference."""
+
+        self.maxDiff = None
+
+        index = CharNgram.build_index(["Hydrogen", "Helium"])
+
+        CharNgram.add_reference(index, 2, "Lithium")
+        CharNgram.add_reference(index, 1000, "Beryllium")
+        CharNgram.add_reference(index, 500, "Boron")
+
+        self.assertEqual(len(index), 5)
+        self.assertEqual(list(index.get_reference_ids()), [0, 1, 2, 500, 1000])
+        self.assertEqual(index.get_reference(1000), "Beryllium")
+
+        for input_string in ["berilium", "lithium", "zazozuzezizy"]:
+            self.assertEqual(
+                CharNgram.compare_list(
+                    index,
+                    input_string,
+                    CharNgram.Scoring.PERCENTAGE,
+                    2,
+                    CharNgram.ReturnBy.INDEX,
+                    CharNgram.ReturnScope.ALL
+                ),
+                [
+                    ([0, 1, 2, 500, 1000][position], score)
+                    for position, score in CharNgram.compare_list(
+                        ["Hydrogen", "Helium", "Lithium", "Boron", "Beryllium"],
+                        input_string,
+                        CharNgram.Scoring.PERCENTAGE,
+                        2,
+                        CharNgram.ReturnBy.INDEX,
+                        CharNgram.ReturnScope.ALL
+                    )
+                ]
+            )
+
+        self.assertEqual(
+            CharNgram.get_best_list_match_index(index, "berilium"),
+            1000
+        )
+
+        with self.assertRaises(CharNgramException):
+            CharNgram.add_reference(index, 2, "Carbon")
+
+        with self.assertRaises(CharNgramException):
+            CharNgram.add_reference(index, -1, "Carbon")
+
+        with self.assertRaises(CharNgramException):
+            CharNgram.add_reference(index, 2 ** 32, "Carbon")
+
+        with self.assertRaises(CharNgramException):
+            CharNgram.add_reference(index, "3", "Carbon")
+
+        with self.assertRaises(CharNgramException):
+            CharNgram.add_reference(["Hydrogen"], 1, "Carbon")
+
+        with self.assertRaises(CharNgramException):
+            CharNgram.compare_many(index, ["berilium"])
+
+        with tempfile.TemporaryDirectory() as directory:
+            with self.assertRaises(CharNgramException):
+                index.save(os.path.join(directory, "index.fzj"))
+
+    # --------------------------------------------------------------------------
+    def test_remove_reference(self):
+        """Tests for CharNgram.remove_reference."""
+
+        self.maxDiff = None
+
+        reference_list = [
+            "Hydrogen",
+            "Helium",
+            "Lithium",
+            "Beryllium",
+            "Boron",
+            "Carbon",
+            "Nitrogen",
+            "Oxygen"
+        ]
+
+        index = CharNgram.build_index(reference_list)
+
+        # Bools are no reference ids, whether or not the index maps slots.
+        self.assertTrue(0 in index)
+        self.assertFalse(False in index)
+        self.assertFalse(True in index)
+
+        with self.assertRaises(CharNgramException):
+            CharNgram.remove_reference(index, True)
+
+        CharNgram.remove_reference(index, 1)
+        CharNgram.remove_reference(index, 6)
+
+        self.assertEqual(len(index), 6)
+        self.assertFalse(1 in index)
+        self.assertFalse(True in index)
+        self.assertEqual(list(index.get_postings("he")[0]), [])
+
+        reference_ids = [0, 2, 3, 4, 5, 7]
+
+        for return_type in CharNgram.ReturnBy:
+            for input_string in ["helium", "nitrogen", "oxygen", ""]:
+                expected = CharNgram.compare_list(
+                    [reference_list[i] for i in reference_ids],
+                    input_string,
+                    CharNgram.Scoring.MATCHES,
+                    2,
+                    return_type,
+                    CharNgram.ReturnScope.ALL
+                )
+
+                if return_type == CharNgram.ReturnBy.INDEX:
+                    expected = [
+                        (reference_ids[position], score)
+                        for position, score in expected
+                    ]
+
+                self.assertEqual(
+                    CharNgram.compare_list(
+                        index,
+                        input_string,
+                        CharNgram.Scoring.MATCHES,
+                        2,
+                        return_type,
+                        CharNgram.ReturnScope.ALL
+                    ),
+                    expected
+                )
+
+        with self.assertRaises(CharNgramException):
+            CharNgram.remove_reference(index, 1)
+
+        # Removing most reference strings compacts the index, and re-adding
+        # them at the end restores their original positions.
+        for reference_id in [2, 3, 4, 5, 7]:
+            CharNgram.remove_reference(index, reference_id)
+
+        for reference_id in range(1, len(reference_list)):
+            CharNgram.add_reference(
+                index,
+                reference_id,
+                reference_list[reference_id]
+            )
+
+        self.assertEqual(
+            CharNgram.compare_many(index, ["helium", "oxygen"]),
+            CharNgram.compare_many(reference_list, ["helium", "oxygen"])
+        )
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "index.fzj")
+            index.save(path)
+
+            self.assertEqual(
+                CharNgram.compare_list(
+                    CharNgram.load(path),
+                    "helium",
+                    CharNgram.Scoring.PERCENTAGE,
+                    2,
+                    CharNgram.ReturnBy.INDEX,
+                    CharNgram.ReturnScope.ALL
+                ),
+                CharNgram.compare_list(
+                    reference_list,
+                    "helium",
+                    CharNgram.Scoring.PERCENTAGE,
+                    2,
+                    CharNgram.ReturnBy.INDEX,
+                    CharNgram.ReturnScope.ALL
+                )
+            )
+
+        # An index whose reference strings have all been removed is as
+        # unpopulated as an empty reference list.
+        index = CharNgram.build_index(["apple", "banana"])
+        CharNgram.remove_reference(index, 0)
+        CharNgram.remove_reference(index, 1)
+
+        self.assertEqual(len(index), 0)
+
+        for query in [
+            lambda: CharNgram.compare_list(index, "apple"),
+            lambda: CharNgram.compare_list_topk(index, "apple", 1),
+            lambda: CharNgram.compare_many(index, ["apple"]),
+            lambda: CharNgram.get_best_list_match(index, "apple"),
+            lambda: CharNgram.get_best_list_match_index(index, "apple"),
+            lambda: asyncio.run(
+                CharNgram.get_best_list_match_async(index, "apple")
+            )
+        ]:
+            with self.assertRaises(CharNgramException):
+                query()
+
+    # --------------------------------------------------------------------------
+    def test_update_reference(self):
+        """Tests for CharNgram.update_reference."""
+
+        self.maxDiff = None
+
+        index = CharNgram.build_index(["Hydrogen", "Helium", "Lithium"])
+
+        CharNgram.update_reference(index, 0, "Neon")
+        CharNgram.update_reference(index, 2, "Carbon")
+
+        self.assertEqual(len(index), 3)
+        self.assertEqual(index.get_reference(0), "Neon")
+
+        for input_string in ["hydrogen", "neon", "carbon", "helium"]:
+            self.assertEqual(
+                CharNgram.compare_list(
+                    index,
+                    input_string,
+                    CharNgram.Scoring.PERCENTAGE,
+                    2,
+                    CharNgram.ReturnBy.INDEX,
+                    CharNgram.ReturnScope.ALL
+                ),
+                CharNgram.compare_list(
+                    ["Neon", "Helium", "Carbon"],
+                    input_string,
+                    CharNgram.Scoring.PERCENTAGE,
+                    2,
+                    CharNgram.ReturnBy.INDEX,
+                    CharNgram.ReturnScope.ALL
+                )
+            )
+
+        self.assertEqual(
+            CharNgram.compare_list_topk(index, "carbon", 1),
+            [("Carbon", 100.0)]
+        )
+
+        with self.assertRaises(CharNgramException):
+            CharNgram.update_reference(index, 3, "Oxygen")
+
+        self.assertEqual(len(index), 3)
+
+        # Indexes built by another class are left untouched.
+        word_index = WordNgram.build_index(["12 Main Street"], 1)
+
+        for change in [
+            lambda: CharNgram.add_reference(word_index, 1, "Oak Lane"),
+            lambda: CharNgram.remove_reference(word_index, 0),
+            lambda: CharNgram.update_reference(word_index, 0, "Oak Lane")
+        ]:
+            with self.assertRaises(CharNgramException):
+                change()
+
+        self.assertEqual(len(word_index), 1)
+        self.assertEqual(word_index.get_reference(0), "12 Main Street")
+
+    # --------------------------------------------------------------------------
+    def test_build_minhash_index(self):
+        """Tests for CharNgram.build_minhash_index."""
+
+        self.maxDiff = None
+
+        reference_list = [
+            "Hydrogen",
+            "Helium",
+            "Lithium",
+            "Beryllium",
+            "Boron",
+            "Carbon",
+            "Nitrogen",
+            "Oxygen",
+            "Fluorine",
+            "Neon",
+            "",
+            "Neon"
+        ]
+
+        # With 64 bands of a single row, every reference string sharing a
+        # fraction of its distinct ngrams with the input string is all but
+        # certain to be a candidate, so results match the exact ones.
+        index = CharNgram.build_minhash_index(reference_list, 2, 64, 1)
+
+        self.assertEqual(len(index), len(reference_list))
+        self.assertEqual(
+            (index.ngram_size, index.bands, index.rows),
+            (2, 64, 1)
+        )
+
+        for input_string in ["floreen", "um", "neon", "zazozuzezizy", ""]:
+            for return_type in CharNgram.ReturnBy:
+                for return_scores in CharNgram.ReturnScope:
+                    self.assertEqual(
+                        CharNgram.compare_list(
+                            index,
+                            input_string,
+                            CharNgram.Scoring.PERCENTAGE,
+                            2,
+                            return_type,
+                            return_scores
+                        ),
+                        CharNgram.compare_list(
+                            reference_list,
+                            input_string,
+                            CharNgram.Scoring.PERCENTAGE,
+                            2,
+                            return_type,
+                            return_scores
+                        )
+                    )
+
+        self.assertEqual(
+            CharNgram.compare_list_topk(
+                index,
+                "floreen",
+                2,
+                arg_min_score=20
+            ),
+            [("Fluorine", 2 / 7 * 100), ("Boron", 25.0)]
+        )
+
+        # With the default 32 bands of 4 rows, only reference strings of high
+        # ngram similarity are candidates.
+        index = CharNgram.build_minhash_index(reference_list)
+
+        self.assertEqual(
+            CharNgram.compare_list(index, "neon"),
+            [("Neon", 100.0)]
+        )
+
+        self.assertEqual(
+            CharNgram.get_best_list_match(index, "floreen"),
+            None
+        )
+
+        self.assertEqual(round(index.get_recall(0.5), 4), 0.8732)
+        self.assertEqual(index.get_recall(1.0), 1.0)
+
+        self.assertEqual(
+            index.get_signature({"ne": 1, "eo": 1, "on": 1}),
+            index.get_signature({"on": 2, "eo": 1, "ne": 3})
+        )
+
+        self.assertEqual(len(index.get_signature({"ne": 1})), 128)
+        self.assertEqual(index.get_signature({}), [])
+
+        with self.assertRaises(CharNgramException):
+            CharNgram.build_minhash_index([])
+
+        with self.assertRaises(CharNgramException):
+            CharNgram.build_minhash_index(reference_list, 2, 0)
+
+        with self.assertRaises(CharNgramException):
+            CharNgram.build_minhash_index(reference_list, 2, 32, "4")
+
+    # --------------------------------------------------------------------------
+    def test_build_simhash_index(self):
+        """Tests for CharNgram.build_simhash_index."""
+
+        self.maxDiff = None
+
+        reference_list = [
+            "The quick brown fox jumps over the lazy dog near the riverbank",
+            "Pack my box with five dozen liquor jugs, said the sphinx",
+            "",
+            "The quick brown fox jumps over the lazzy dog near the riverbank",
+            "Sphinx of black quartz, judge my vow"
+        ]
+
+        index = CharNgram.build_simhash_index(reference_list, 2, 4)
+
+        self.assertEqual(len(index), len(reference_list))
+        self.assertEqual((index.ngram_size, index.max_distance), (2, 4))
+
+        input_string = (
+            "The quick brown fox jumps over the lazy dog near the riverbank."
+        )
+
+        # Only the near-duplicates are candidates, and they are scored
+        # exactly.
+        self.assertEqual(
+            CharNgram.compare_list(
+                index,
+                input_string,
+                CharNgram.Scoring.DICE,
+                2,
+                CharNgram.ReturnBy.INDEX,
+                CharNgram.ReturnScope.ALL,
+                arg_min_score=1
+            ),
+            [
+                (0, CharNgram.compare_string(
+                    reference_list[0],
+                    input_string,
+                    CharNgram.Scoring.DICE
+                )),
+                (3, CharNgram.compare_string(
+                    reference_list[3],
+                    input_string,
+                    CharNgram.Scoring.DICE
+                ))
+            ]
+        )
+
+        self.assertEqual(
+            CharNgram.get_best_list_match_index(index, input_string),
+            0
+        )
+
+        # Without a minimum score, the remaining reference strings score 0.
+        self.assertEqual(
+            CharNgram.compare_list(
+                index,
+                reference_list[4],
+                CharNgram.Scoring.MATCHES,
+                2,
+                CharNgram.ReturnBy.INDEX,
+                CharNgram.ReturnScope.ALL
+            ),
+            [(4, 35), (0, 0), (1, 0), (2, 0), (3, 0)]
+        )
+
+        # A distance of 0 only finds identical fingerprints.
+        index = CharNgram.build_simhash_index(reference_list, 2, 0)
+
+        self.assertEqual(
+            CharNgram.compare_list(index, input_string, arg_min_score=1),
+            []
+        )
+
+        self.assertEqual(
+            CharNgram.compare_list(index, reference_list[1], arg_min_score=1),
+            [(reference_list[1], 100.0)]
+        )
+
+        with self.assertRaises(CharNgramException):
+            CharNgram.build_simhash_index([])
+
+        with self.assertRaises(CharNgramException):
+            CharNgram.build_simhash_index(reference_list, 2, 64)
+
+        with self.assertRaises(CharNgramException):
+            CharNgram.build_simhash_index(reference_list, 2, "3")
+
+    # --------------------------------------------------------------------------
+    def test_get_simhash(self):
+        """Tests for CharNgram.get_simhash."""
+
+        fingerprint = CharNgram.get_simhash("Hydrogen")
+
+        self.assertEqual(fingerprint, CharNgram.get_simhash("hydrogen"))
+        self.assertEqual(fingerprint, CharNgram.get_simhash("Hydrogen"))
+        self.assertTrue(0 < fingerprint < 2 ** 64)
+        self.assertNotEqual(fingerprint, CharNgram.get_simhash("Hydrogen", 3))
+        self.assertEqual(CharNgram.get_simhash(""), 0)
+
+        self.assertEqual(
+            CharNgramSimHashIndex.get_fingerprint({"ne": 1, "eo": 1, "on": 1}),
+            CharNgram.get_simhash("neon")
+        )
+
+        with self.assertRaises(CharNgramException):
+            CharNgram.get_simhash("Hydrogen", (1, 2))
+
+    # --------------------------------------------------------------------------
+    def test_build_profile(self):
+        """Tests for CharNgram.build_profile."""
+
+        self.maxDiff = None
+
+        profile = CharNgram.build_profile("TestTest", 2)
+
+        self.assertEqual(len(profile), 4)
+        self.assertEqual(profile.total, 7)
+        self.assertEqual(list(profile.keys), sorted(profile.keys))
+        self.assertEqual(
+            dict(zip(profile.keys, profile.counts)),
+            {
+                CharNgramProfile.encode("te"): 2,
+                CharNgramProfile.encode("es"): 2,
+                CharNgramProfile.encode("st"): 2,
+                CharNgramProfile.encode("tt"): 1
+            }
+        )
+
+        profile = CharNgram.build_profile("", 2)
+
+        self.assertEqual(len(profile), 0)
+        self.assertEqual(profile.total, 0)
+
+        ngrams = [
+            "", "a", "\x00", "\x00a", "a\x00", "\U0010ffff" * 3, "ab", "abc",
+            "abcd", "abce", "\ud800abc", "te", "et"
+        ]
+
+        self.assertEqual(
+            len(set(CharNgramProfile.encode(ngram) for ngram in ngrams)),
+            len(ngrams)
+        )
+
+        for ngram in ngrams:
+            self.assertLess(CharNgramProfile.encode(ngram), 2 ** 64)
+            self.assertGreaterEqual(CharNgramProfile.encode(ngram), 0)
+
+        with self.assertRaises(CharNgramException):
+            CharNgram.build_profile(None, 2)
+
+        with self.assertRaises(CharNgramException):
+            CharNgram.build_profile("testing", "x")
+
+    # --------------------------------------------------------------------------
+    def test_compare_profiles(self):
+        """Tests for CharNgram.compare_profiles."""
+
+        self.maxDiff = None
+
+        strings = [
+            "testing", "test", "inst", "st", "t", "", "tEsTiNg", "floreen",
+            "Fluorine", "Gandalf and Frodo walked across Middle-earth",
+            "gondolf plus fredo took a walk on earth", "\u00e9t\u00e9 \u00e9t\u00e9"
+        ]
+
+        for ngram_size in [1, 2, 3, 4, 8]:
+            for reference_string in strings:
+                reference_profile = CharNgram.build_profile(
+                    reference_string,
+                    ngram_size
+                )
+
+                for input_string in strings:
+                    input_profile = CharNgram.build_profile(
+                        input_string,
+                        ngram_size
+                    )
+
+                    for scoring_method in CharNgram.Scoring:
+                        self.assertEqual(
+                            CharNgram.compare_profiles(
+                                reference_profile,
+                                input_profile,
+                                scoring_method
+                            ),
+                            CharNgram.compare_string(
+                                reference_string,
+                                input_string,
+                                scoring_method,
+                                ngram_size
+                            )
+                        )
+
+        with self.assertRaises(CharNgramException):
+            CharNgram.compare_profiles(
+                CharNgram.build_profile("testing"),
+                CharNgram.build_profile("testing"),
+                1337
+            )
+
+        with self.assertRaises(CharNgramException):
+            CharNgram.compare_profiles(
+                "testing",
+                CharNgram.build_profile("testing")
+            )
+
+    # --------------------------------------------------------------------------
+    def test_load(self):
+        """Tests for CharNgram.load and the save methods it pairs with."""
+
+        self.maxDiff = None
+
+        reference_list = [
+            "Hydrogen",
+            "Helium",
+            "Lithium",
+            "Beryllium",
+            "Boron",
+            "Carbon",
+            "Nitrogen",
+            "Oxygen",
+            "Fluorine",
+            "Neon",
+            "Neon",
+            "",
+            "Ününoctium \U0001f9ea",
+            "\udc80"
+        ]
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "elements.fzj")
+
+            for build in [CharNgram.compile, CharNgram.build_index]:
+                for ngram_size in [1, 2, 5]:
+                    build(reference_list, ngram_size).save(path)
+
+                    loaded = CharNgram.load(path)
+
+                    self.assertIsInstance(
+                        loaded,
+                        type(build(reference_list, ngram_size))
+                    )
+                    self.assertEqual(loaded.ngram_size, ngram_size)
+                    self.assertEqual(len(loaded), len(reference_list))
+
+                    for input_string in ["floreen", "um", "ün \U0001f9ea", ""]:
+                        for scoring_method in CharNgram.Scoring:
+                            for return_type in CharNgram.ReturnBy:
+                                self.assertEqual(
+                                    CharNgram.compare_list(
+                                        loaded,
+                                        input_string,
+                                        scoring_method,
+                                        ngram_size,
+                                        return_type,
+                                        CharNgram.ReturnScope.ALL
+                                    ),
+                                    CharNgram.compare_list(
+                                        reference_list,
+                                        input_string,
+                                        scoring_method,
+                                        ngram_size,
+                                        return_type,
+                                        CharNgram.ReturnScope.ALL
+                                    )
+                                )
+
+            with open(path, "rb") as file:
+                data = file.read()
+
+            for corrupt_data in [b"", b"not a fuzzjunkie file", data[:-8]]:
+                with open(path, "wb") as file:
+                    file.write(corrupt_data)
+
+                with self.assertRaises(CharNgramException):
+                    CharNgram.load(path)
+
+            # Threads saving to the same path never share a temporary file.
+            index = CharNgram.build_index(reference_list)
+            threads = [
+                threading.Thread(
+                    target=lambda: [index.save(path) for i in range(20)]
+                )
+                for thread in range(4)
+            ]
+
+            for thread in threads:
+                thread.start()
+
+            for thread in threads:
+                thread.join()
+
+            self.assertEqual(len(CharNgram.load(path)), len(reference_list))
+            self.assertEqual(os.listdir(directory), ["elements.fzj"])
+
+            # Posting lists pointing past the reference strings and offsets
+            # running backwards are caught when loading or mapping, not when
+            # querying.
+            def corrupt_section(
+                arg_compiled,
+                arg_section,
+                arg_typecode,
+                arg_mapped=False
+            ):
+                arg_compiled.save(path)
+
+                with open(path, "rb") as file:
+                    data = bytearray(file.read())
+
+                position = 16
+
+                for section in range(arg_section):
+                    length = struct.unpack_from("<Q", data, position + 8)[0]
+                    position += 16 + -(-length * struct.calcsize(
+                        data[position:position + 1].decode()
+                    ) // 8) * 8
+
+                struct.pack_into(
+                    "<" + arg_typecode,
+                    data,
+                    position + 16 + struct.calcsize(arg_typecode),
+                    2 ** 31
+                )
+
+                with open(path, "wb") as file:
+                    file.write(data)
+
+                with self.assertRaises(CharNgramException):
+                    CharNgram.load(path)
+
+                if arg_mapped:
+                    with self.assertRaises(CharNgramException):
+                        CharNgram.open_index(path)
+
+            corrupt_section(CharNgram.build_index(reference_list), 5, "I", True)
+            corrupt_section(CharNgram.build_index(reference_list), 4, "Q", True)
+            corrupt_section(CharNgram.build_index(reference_list), 0, "Q", True)
+            corrupt_section(CharNgram.compile(reference_list), 3, "Q")
+            corrupt_section(CharNgram.compile(reference_list), 0, "Q")
+
+            # Files only load into the class whose ngrams they hold.
+            for compiled in [
+                WordNgram.build_index(["new york city", "york"], 1),
+                WordNgram.compile(["new york city", "york"], 1)
+            ]:
+                compiled.save(path)
+
+                with self.assertRaises(CharNgramException):
+                    CharNgram.load(path)
+
+                self.assertEqual(
+                    WordNgram.compare_list(
+                        WordNgram.load(path),
+                        "new york city",
+                        arg_ngram_size=1
+                    ),
+                    [("york", 100.0), ("new york city", 100.0)]
+                )
+
+            CharNgram.build_index(["new york city", "york"], 1).save(path)
+
+            with self.assertRaises(CharNgramException):
+                WordNgram.load(path)
+
+            with self.assertRaises(CharNgramException):
+                WordNgram.open_index(path)
+
+            CharNgram.open_index(path).close()
+
+    # --------------------------------------------------------------------------
+    def test_open_index(self):
+        """Tests for CharNgram.open_index."""
+
+        self.maxDiff = None
+
+        reference_list = [
+            "Hydrogen",
+            "Helium",
+            "Lithium",
+            "Beryllium",
+            "Boron",
+            "Carbon",
+            "Nitrogen",
+            "Oxygen",
+            "Fluorine",
+            "Neon",
+            "Neon",
+            "",
+            "Ününoctium \U0001f9ea"
+        ]
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "elements.fzj")
+
+            for ngram_size in [1, 2, 5]:
+                CharNgram.build_index(reference_list, ngram_size).save(path)
+
+                with CharNgram.open_index(path) as index:
+                    self.assertEqual(index.ngram_size, ngram_size)
+                    self.assertEqual(len(index), len(reference_list))
+                    self.assertEqual(
+                        [
+                            index.get_reference(reference_id)
+                            for reference_id in range(len(index))
+                        ],
+                        reference_list
+                    )
+
+                    for input_string in ["floreen", "um", "ün \U0001f9ea", ""]:
+                        for scoring_method in CharNgram.Scoring:
+                            for return_type in CharNgram.ReturnBy:
+                                for return_scores in CharNgram.ReturnScope:
+                                    self.assertEqual(
+                                        CharNgram.compare_list(
+                                            index,
+                                            input_string,
+                                            scoring_method,
+                                            ngram_size,
+                                            return_type,
+                                            return_scores
+                                        ),
+                                        CharNgram.compare_list(
+                                            reference_list,
+                                            input_string,
+                                            scoring_method,
+                                            ngram_size,
+                                            return_type,
+                                            return_scores
+                                        )
+                                    )
+
+                    self.assertEqual(
+                        CharNgram.compare_many(
+                            index,
+                            ["floreen", "um", "floreen"],
+                            CharNgram.Scoring.MATCHES,
+                            ngram_size,
+                            2
+                        ),
+                        CharNgram.compare_many(
+                            reference_list,
+                            ["floreen", "um", "floreen"],
+                            CharNgram.Scoring.MATCHES,
+                            ngram_size,
+                            2
+                        )
+                    )
+
+                with self.assertRaises(ValueError):
+                    CharNgram.compare_list(index, "floreen")
+
+            CharNgram.compile(reference_list).save(path)
+
+            with self.assertRaises(CharNgramException):
+                CharNgram.open_index(path)
+
+            for corrupt_data in [b"", b"not a fuzzjunkie file"]:
+                with open(path, "wb") as file:
+                    file.write(corrupt_data)
+
+                with self.assertRaises(CharNgramException):
+                    CharNgram.open_index(path)
+
+    # --------------------------------------------------------------------------
+    def test_cache(self):
+        """Tests for CharNgram.set_cache, clear_cache and cache_info."""
+
+        self.maxDiff = None
+
+        cache = CharNgramCache(100, None)
+        CharNgram.set_cache(cache)
+
+        try:
+            CharNgram.compare_string("testing", "test")
+            CharNgram.compare_string("testing", "test")
+            CharNgram.compare_string("testing", "test", arg_ngram_size=3)
+
+            # The input string "test" is only cached once seen twice.
+            info = CharNgram.cache_info()
+            self.assertEqual(info.hits, 1)
+            self.assertEqual(info.misses, 5)
+            self.assertEqual(info.evictions, 0)
+            self.assertEqual(info.entries, 3)
+            self.assertGreater(info.bytes, 0)
+            self.assertEqual(info.max_entries, 100)
+            self.assertEqual(info.max_bytes, None)
+
+            self.assertEqual(CharNgram.cache_info(2).entries, 2)
+            self.assertEqual(CharNgram.cache_info(3).entries, 1)
+
+            CharNgram.clear_cache(3)
+            self.assertEqual(CharNgram.cache_info().entries, 2)
+            self.assertEqual(CharNgram.cache_info(3).entries, 0)
+
+            CharNgram.clear_cache()
+            self.assertEqual(
+                CharNgram.cache_info(),
+                CharNgramCache.Info(0, 0, 0, 0, 0, 100, None)
+            )
+
+            # Compiled reference lists keep their own ngrams, so compiling
+            # leaves the cache alone.
+            reference_list = ["Hydrogen", "Helium", "Lithium"]
+            CharNgram.compile(reference_list)
+            CharNgram.build_index(reference_list)
+            CharNgram.build_matrix(reference_list)
+            CharNgram.build_minhash_index(reference_list)
+            CharNgram.build_simhash_index(reference_list)
+            self.assertEqual(
+                CharNgram.cache_info(),
+                CharNgramCache.Info(0, 0, 0, 0, 0, 100, None)
+            )
+
+            CharNgram.set_cache(None)
+            self.assertEqual(CharNgram.cache_info(), None)
+            self.assertEqual(
+                CharNgram.compare_string("testing", "test"),
+                50.0
+            )
+            CharNgram.clear_cache()
+        finally:
+            CharNgram.set_cache(CharNgramCache())
+
+    # --------------------------------------------------------------------------
+    def test_set_metrics(self):
+        """Tests for CharNgram.set_metrics."""
+
+        self.maxDiff = None
+
+        reference_list = [
+            "Hydrogen",
+            "Helium",
+            "Lithium",
+            "Neon",
+            "Neon"
+        ]
+
+        metrics = CharNgramMetrics()
+
+        try:
+            CharNgram.set_cache(CharNgramCache())
+            CharNgram.set_metrics(metrics)
+
+            CharNgram.compare_string("testing", "test")
+
+            self.assertEqual(
+                metrics.snapshot().counters,
+                {
+                    "cache_misses": 2,
+                    "strings_profiled": 2,
+                    "ngrams_generated": 9,
+                    "comparisons": 1
+                }
+            )
+
+            metrics.reset()
+
+            CharNgram.compare_list(
+                reference_list,
+                "neon",
+                arg_return_scores=CharNgram.ReturnScope.ALL
+            )
+
+            snapshot = metrics.snapshot()
+
+            self.assertEqual(snapshot.counters["queries"], 1)
+            self.assertEqual(snapshot.counters["comparisons"], 4)
+            self.assertNotIn("cache_hits", snapshot.counters)
+            self.assertEqual(snapshot.counters["cache_misses"], 5)
+            self.assertEqual(snapshot.counters["strings_profiled"], 5)
+            self.assertEqual(
+                sorted(snapshot.timers),
+                ["profiling", "scoring", "sorting"]
+            )
+            self.assertEqual(snapshot.timers["scoring"].count, 1)
+            self.assertEqual(snapshot.timers["sorting"].count, 1)
+            self.assertEqual(snapshot.timers["profiling"].count, 5)
+
+            metrics.reset()
+
+            CharNgram.compare_list(reference_list, "neon")
+
+            self.assertEqual(metrics.snapshot().counters["cache_hits"], 4)
+            self.assertEqual(metrics.snapshot().counters["cache_misses"], 1)
+
+            metrics.reset()
+
+            CharNgram.compare_list_topk(
+                CharNgram.build_index(reference_list),
+                "neon",
+                2,
+                arg_min_score=50
+            )
+
+            self.assertEqual(metrics.snapshot().counters["queries"], 1)
+            self.assertEqual(metrics.snapshot().counters["comparisons"], 1)
+
+            metrics.reset()
+
+            list(CharNgram.iter_compare(iter(reference_list), "neon"))
+
+            self.assertEqual(metrics.snapshot().counters["queries"], 1)
+            self.assertEqual(metrics.snapshot().counters["comparisons"], 5)
+
+            CharNgram.set_metrics(None)
+            metrics.reset()
+
+            CharNgram.compare_list(reference_list, "neon")
+
+            self.assertEqual(metrics.snapshot(), CharNgramMetrics.Snapshot({}, {}))
+        finally:
+            CharNgram.set_metrics(None)
+            CharNgram.set_cache(CharNgramCache())
+
+    # --------------------------------------------------------------------------
+    def test_compare_list_threads(self):
+        """Tests for CharNgram.compare_list called from many threads."""
+
+        self.maxDiff = None
+
+        reference_list = [
+            "Hydrogen",
+            "Helium",
+            "Lithium",
+            "Beryllium",
+            "Boron",
+            "Carbon",
+            "Nitrogen",
+            "Oxygen",
+            "Fluorine",
+            "Neon"
+        ]
+
+        input_strings = [
+            "floreen", "um", "helum", "nitro", "gen", "boro", "carbonium",
+            "zazozuzezizy", "xygen", "lith"
+        ]
+
+        jobs = [
+            (input_string, scoring_method, ngram_size)
+            for input_string in input_strings
+            for scoring_method in CharNgram.Scoring
+            for ngram_size in [1, 2, 3]
+        ]
+
+        expected = {}
+
+        for job in jobs:
+            expected[job] = CharNgram.compare_list(
+                reference_list,
+                job[0],
+                job[1],
+                job[2],
+                CharNgram.ReturnBy.STRING,
+                CharNgram.ReturnScope.ALL
+            )
+
+        # A small cache forces constant admissions and evictions.
+        CharNgram.set_cache(CharNgramCache(16, None, 1))
+
+        failures = []
+
+        def worker(arg_offset):
+            try:
+                for i in range(200):
+                    job = jobs[(arg_offset + i) % len(jobs)]
+
+                    scores = CharNgram.compare_list(
+                        reference_list,
+                        job[0],
+                        job[1],
+                        job[2],
+                        CharNgram.ReturnBy.STRING,
+                        CharNgram.ReturnScope.ALL
+                    )
+
+                    if scores != expected[job]:
+                        failures.append((job, scores))
+            except Exception as e:
+                failures.append(e)
+
+        try:
+            threads = [
+                threading.Thread(target=worker, args=(i * 7,))
+                for i in range(16)
+            ]
+
+            for thread in threads:
+                thread.start()
+
+            for thread in threads:
+                thread.join()
+
+            info = CharNgram.cache_info()
+        finally:
+            CharNgram.set_cache(CharNgramCache())
+
+        self.assertEqual(failures, [])
+        self.assertLessEqual(info.entries, 16)
+        self.assertGreater(info.evictions, 0)
+
+# ------------------------------------------------------------------------------
+class TestCharNgramShardPoolMethods(unittest.TestCase):
+    """Provides unit tests for public fuzzjunkie.CharNgramShardPool methods.
+
+    Author:
+        Juan Irming
+    """
+
+    # --------------------------------------------------------------------------
+    def test_compare_shards(self):
+        """Tests for CharNgram.compare_list with a CharNgramShardPool."""
+
+        self.maxDiff = None
+
+        reference_list = [
+            "Hydrogen",
+            "Helium",
+            "Lithium",
+            "Beryllium",
+            "Boron",
+            "Carbon",
+            "Nitrogen",
+            "Oxygen",
+            "Fluorine",
+            "Neon",
+            "Neon"
+        ]
+
+        with CharNgramShardPool(reference_list, 2, 3) as pool:
+            self.assertEqual(len(pool), len(reference_list))
+
+            for input_string in ["floreen", "um", "zazozuzezizy"]:
+                for scoring_method in CharNgram.Scoring:
+                    for return_type in CharNgram.ReturnBy:
+                        for return_scores in CharNgram.ReturnScope:
+                            for min_score in [None, 1, 25]:
+                                self.assertEqual(
+                                    CharNgram.compare_list(
+                                        pool,
+                                        input_string,
+                                        scoring_method,
+                                        2,
+                                        return_type,
+                                        return_scores,
+                                        min_score
+                                    ),
+                                    CharNgram.compare_list(
+                                        reference_list,
+                                        input_string,
+                                        scoring_method,
+                                        2,
+                                        return_type,
+                                        return_scores,
+                                        min_score
+                                    )
+                                )
+
+                        for k in [1, 2, 5]:
+                            self.assertEqual(
+                                CharNgram.compare_list_topk(
+                                    pool,
+                                    input_string,
+                                    k,
+                                    scoring_method,
+                                    2,
+                                    return_type
+                                ),
+                                CharNgram.compare_list_topk(
+                                    reference_list,
+                                    input_string,
+                                    k,
+                                    scoring_method,
+                                    2,
+                                    return_type
+                                )
+                            )
+
+            self.assertEqual(
+                CharNgram.get_best_list_match_index(pool, "floreen"),
+                8
+            )
+
+            with self.assertRaises(CharNgramException):
+                CharNgram.compare_list(pool, "floreen", 1337)
+
+        with self.assertRaises(CharNgramException):
+            CharNgram.compare_list(pool, "floreen")
+
+        with self.assertRaises(CharNgramException):
+            CharNgramShardPool([])
+
+        with self.assertRaises(CharNgramException):
+            CharNgramShardPool(reference_list, 2, 0)
+
+# ------------------------------------------------------------------------------
+class TestCharNgramCacheMethods(unittest.TestCase):
+    """Provides unit tests for public fuzzjunkie.CharNgramCache methods.
+
+    Author:
+        Juan Irming
+    """
+
+    # --------------------------------------------------------------------------
+    def test_get_put(self):
+        """Tests for CharNgramCache.get and CharNgramCache.put."""
+
+        self.maxDiff = None
+
+        cache = CharNgramCache(2, None)
+
+        self.assertEqual(cache.get(2, "test"), None)
+
+        cache.put(2, "test", {"te": 1, "es": 1, "st": 1})
+        cache.put(2, "", {})
+
+        self.assertEqual(cache.get(2, "test"), {"te": 1, "es": 1, "st": 1})
+        self.assertEqual(cache.get(2, ""), {})
+        self.assertEqual(cache.get(1, "test"), None)
+
+        # "test" is now the least recently used entry and gets evicted.
+        cache.put(2, "tent", {"te": 1, "en": 1, "nt": 1})
+
+        self.assertEqual(cache.get(2, "test"), None)
+        self.assertEqual(cache.get(2, ""), {})
+        self.assertEqual(cache.get(2, "tent"), {"te": 1, "en": 1, "nt": 1})
+
+        info = cache.cache_info()
+        self.assertEqual(info.hits, 4)
+        self.assertEqual(info.misses, 3)
+        self.assertEqual(info.evictions, 1)
+        self.assertEqual(info.entries, 2)
+
+        cache.put(2, "tent", {"te": 1, "en": 1, "nt": 1})
+        self.assertEqual(cache.cache_info().entries, 2)
+
+    # --------------------------------------------------------------------------
+    def test_roles(self):
+        """Tests for CharNgramCache query string admission."""
+
+        self.maxDiff = None
+
+        reference = CharNgramCache.Role.REFERENCE
+        query = CharNgramCache.Role.QUERY
+
+        cache = CharNgramCache(3, None, 2)
+
+        cache.put(2, "tent", {"te": 1, "en": 1, "nt": 1}, reference)
+        cache.put(2, "tint", {"ti": 1, "in": 1, "nt": 1}, reference)
+
+        # A query string seen once is not admitted.
+        self.assertEqual(cache.get(2, "test", query), None)
+        cache.put(2, "test", {"te": 1, "es": 1, "st": 1}, query)
+        self.assertEqual(cache.cache_info().entries, 2)
+
+        # A query string seen twice is admitted.
+        self.assertEqual(cache.get(2, "test", query), None)
+        cache.put(2, "test", {"te": 1, "es": 1, "st": 1}, query)
+        self.assertEqual(
+            cache.get(2, "test", query),
+            {"te": 1, "es": 1, "st": 1}
+        )
+
+        # Reference strings evict query entries first.
+        cache.put(2, "tant", {"ta": 1, "an": 1, "nt": 1}, reference)
+        self.assertEqual(cache.get(2, "test"), None)
+        self.assertEqual(cache.cache_info().entries, 3)
+
+        # Query strings never evict reference strings.
+        for i in range(3):
+            cache.get(2, "test", query)
+
+        cache.put(2, "test", {"te": 1, "es": 1, "st": 1}, query)
+        self.assertEqual(cache.get(2, "test"), None)
+        self.assertEqual(cache.get(2, "tent"), {"te": 1, "en": 1, "nt": 1})
+        self.assertEqual(cache.get(2, "tint"), {"ti": 1, "in": 1, "nt": 1})
+        self.assertEqual(cache.get(2, "tant"), {"ta": 1, "an": 1, "nt": 1})
+
+        # A query string may not evict a more frequently seen query string.
+        cache = CharNgramCache(1, None, 2)
+
+        for i in range(3):
+            cache.get(2, "test", query)
+
+        cache.put(2, "test", {"te": 1, "es": 1, "st": 1}, query)
+
+        for i in range(2):
+            cache.get(2, "tent", query)
+
+        cache.put(2, "tent", {"te": 1, "en": 1, "nt": 1}, query)
+        self.assertEqual(cache.get(2, "test"), {"te": 1, "es": 1, "st": 1})
+        self.assertEqual(cache.get(2, "tent"), None)
+
+        # A query string cached as a reference string is a hit.
+        cache = CharNgramCache(10, None, 2)
+        cache.put(2, "test", {"te": 1, "es": 1, "st": 1}, reference)
+        self.assertEqual(
+            cache.get(2, "test", query),
+            {"te": 1, "es": 1, "st": 1}
+        )
+
+    # --------------------------------------------------------------------------
+    def test_max_bytes(self):
+        """Tests for the CharNgramCache byte limit."""
+
+        self.maxDiff = None
+
+        cache = CharNgramCache(None, 1)
+
+        cache.put(2, "test", {"te": 1, "es": 1, "st": 1})
+
+        self.assertEqual(cache.get(2, "test"), None)
+        self.assertEqual(
+            cache.cache_info(),
+            CharNgramCache.Info(0, 1, 1, 0, 0, None, 1)
+        )
+
+        cache = CharNgramCache(None, None)
+
+        for i in range(1000):
+            cache.put(2, str(i), {str(i): 1})
+
+        info = cache.cache_info()
+        self.assertEqual(info.entries, 1000)
+        self.assertEqual(info.evictions, 0)
+
+        cache.max_bytes = info.bytes // 2
+        cache.put(1, "x", {"x": 1})
+
+        info = cache.cache_info()
+        self.assertLessEqual(info.bytes, cache.max_bytes)
+        self.assertGreater(info.evictions, 0)
+        self.assertEqual(cache.get(1, "x"), {"x": 1})
+        self.assertEqual(cache.get(2, "0"), None)
+
+        self.assertEqual(CharNgramCache(0, 0, 0).cache_info().max_bytes, 0)
+
+        for arguments in [(-1,), (None, -1), (None, None, -1), ("1",)]:
+            with self.assertRaises(CharNgramException):
+                CharNgramCache(*arguments)
+
+# ------------------------------------------------------------------------------
+class TestWordNgramMethods(unittest.TestCase):
+    """Provides unit tests for public fuzzjunkie.WordNgram methods.
+
+    Author:
+        Juan Irming
+    """
+
+    # --------------------------------------------------------------------------
+    def test_compare_string(self):
+        """Tests for WordNgram.compare_string."""
+
+        self.maxDiff = None
+
+        self.assertEqual(
+            WordNgram.compare_string(
+                "12 Main Street",
+                "12 main st",
+                arg_ngram_size=1
+            ),
+            2 / 3 * 100
+        )
+
+        self.assertEqual(
+            WordNgram.compare_string(
+                "Main Street, 12",
+                "12 main street",
+                WordNgram.Scoring.MATCHES,
+                1
+            ),
+            3
+        )
+
+        self.assertEqual(
+            WordNgram.compare_string("Main Street 12", "12 main street"),
+            50.0
+        )
+
+        self.assertEqual(
+            WordNgram.compare_string("A, B.", "a b", arg_ngram_size=3),
+            100.0
+        )
+
+        self.assertEqual(
+            WordNgram.compare_string("a b", "?!", arg_ngram_size=3),
+            0.0
+        )
+
+    # --------------------------------------------------------------------------
+    def test_compare_list(self):
+        """Tests for WordNgram.compare_list and its compiled reference lists."""
+
+        self.maxDiff = None
+
+        reference_list = [
+            "12 Main Street",
+            "Main Street 12",
+            "14 Elm Street",
+            "12 Main St."
+        ]
+
+        expected = {
+            1: [(3, 100.0), (0, 2 / 3 * 100), (1, 2 / 3 * 100), (2, 0.0)],
+            2: [(3, 100.0), (0, 50.0), (1, 0.0), (2, 0.0)]
+        }
+
+        for ngram_size in [1, 2]:
+            self.assertEqual(
+                WordNgram.compare_list(
+                    reference_list,
+                    "12 main st",
+                    WordNgram.Scoring.PERCENTAGE,
+                    ngram_size,
+                    WordNgram.ReturnBy.INDEX,
+                    WordNgram.ReturnScope.ALL
+                ),
+                expected[ngram_size]
+            )
+
+            for compiled in [
+                WordNgram.compile(reference_list, ngram_size),
+                WordNgram.build_index(reference_list, ngram_size)
+            ]:
+                self.assertEqual(
+                    WordNgram.compare_list_topk(
+                        compiled,
+                        "12 main st",
+                        4,
+                        WordNgram.Scoring.PERCENTAGE,
+                        ngram_size,
+                        WordNgram.ReturnBy.INDEX
+                    ),
+                    expected[ngram_size]
+                )
+
+            self.assertEqual(
+                WordNgram.get_best_list_match(
+                    reference_list,
+                    "12 main st",
+                    arg_ngram_size=ngram_size
+                ),
+                "12 Main St."
+            )
+
+        with CharNgramShardPool(
+            reference_list,
+            1,
+            2,
+            WordNgram
+        ) as shard_pool:
+            self.assertEqual(
+                WordNgram.compare_list_topk(
+                    shard_pool,
+                    "12 main st",
+                    4,
+                    WordNgram.Scoring.PERCENTAGE,
+                    1,
+                    WordNgram.ReturnBy.INDEX
+                ),
+                expected[1]
+            )
+
+        # Without an ngram size, pools use the default of their engine.
+        with CharNgramShardPool(
+            reference_list,
+            arg_shards=1,
+            arg_engine=WordNgram
+        ) as shard_pool:
+            self.assertEqual(
+                shard_pool.ngram_size,
+                WordNgram.build_index(reference_list).ngram_size
+            )
+
+    # --------------------------------------------------------------------------
+    def test_compare_list_engine(self):
+        """Tests that compiled reference lists are only used by their class."""
+
+        self.maxDiff = None
+
+        reference_list = ["12 Main Street", "14 Elm Street"]
+
+        compiled_lists = [
+            WordNgram.compile(reference_list, 1),
+            WordNgram.build_index(reference_list, 1),
+            WordNgram.build_minhash_index(reference_list, 1),
+            WordNgram.build_simhash_index(reference_list, 1)
+        ]
+
+        if numpy is not None:
+            compiled_lists.append(WordNgram.build_matrix(reference_list, 1))
+
+        for compiled in compiled_lists:
+            with self.assertRaises(CharNgramException):
+                CharNgram.compare_list(compiled, "12 main street")
+
+            self.assertEqual(
+                WordNgram.compare_list(
+                    compiled,
+                    "12 main street",
+                    arg_ngram_size=1
+                ),
+                [("12 Main Street", 100.0)]
+            )
+
+        with self.assertRaises(CharNgramException):
+            WordNgram.compare_list(
+                CharNgram.build_index(reference_list),
+                "12 main street"
+            )
+
+    # --------------------------------------------------------------------------
+    def test_cache_info(self):
+        """Tests that WordNgram and CharNgram keep separate caches."""
+
+        self.maxDiff = None
+
+        original_cache = CharNgram.cache_info()
+
+        WordNgram.set_cache(CharNgramCache())
+        WordNgram.compare_string("main street", "main st")
+
+        self.assertEqual(WordNgram.cache_info().misses, 2)
+        self.assertEqual(CharNgram.cache_info(), original_cache)
+
+# ------------------------------------------------------------------------------
+class TestCharNgramMetricsMethods(unittest.TestCase):
+    """Provides unit tests for public fuzzjunkie.CharNgramMetrics methods.
+
+    Author:
+        Juan Irming
+    """
+
+    # --------------------------------------------------------------------------
+    def test_increment(self):
+        """Tests for CharNgramMetrics.increment, snapshot and reset."""
+
+        self.maxDiff = None
+
+        reports = []
+        metrics = CharNgramMetrics(
+            lambda kind, name, value: reports.append((kind, name, value))
+        )
+
+        self.assertEqual(metrics.snapshot(), CharNgramMetrics.Snapshot({}, {}))
+
+        metrics.increment("queries")
+        metrics.increment("comparisons", 10)
+        metrics.increment("comparisons", 5)
+
+        self.assertEqual(
+            metrics.snapshot().counters,
+            {"queries": 1, "comparisons": 15}
+        )
+
+        self.assertEqual(
+            reports,
+            [
+                (CharNgramMetrics.Kind.COUNTER, "queries", 1),
+                (CharNgramMetrics.Kind.COUNTER, "comparisons", 10),
+                (CharNgramMetrics.Kind.COUNTER, "comparisons", 5)
+            ]
+        )
+
+        metrics.reset()
+
+        self.assertEqual(metrics.snapshot(), CharNgramMetrics.Snapshot({}, {}))
+
+    # --------------------------------------------------------------------------
+    def test_record_time(self):
+        """Tests for CharNgramMetrics.record_time."""
+
+        self.maxDiff = None
+
+        reports = []
+        metrics = CharNgramMetrics(
+            lambda kind, name, value: reports.append((kind, name, value))
+        )
+
+        metrics.record_time("scoring", 0.5)
+        metrics.record_time("scoring", 1.5)
+        metrics.record_time("sorting", 0.25)
+
+        self.assertEqual(
+            metrics.snapshot().timers,
+            {
+                "scoring": CharNgramMetrics.Timer(2, 2.0, 1.5),
+                "sorting": CharNgramMetrics.Timer(1, 0.25, 0.25)
+            }
+        )
+
+        self.assertEqual(
+            reports,
+            [
+                (CharNgramMetrics.Kind.TIMER, "scoring", 0.5),
+                (CharNgramMetrics.Kind.TIMER, "scoring", 1.5),
+                (CharNgramMetrics.Kind.TIMER, "sorting", 0.25)
+            ]
+        )
+
+# ------------------------------------------------------------------------------
+class TestMainFunction(unittest.TestCase):
+    """Provides unit tests for the fuzzjunkie.main command-line function.
+
+    Author:
+        Juan Irming
+    """
+
+    # --------------------------------------------------------------------------
+    def test_main(self):
+        """Tests for main."""
+
+        self.maxDiff = None
+
+        reference_list = [
+            "Hydrogen",
+            "Helium",
+            "Lithium",
+            "Fluorine",
+            "Neon",
+            "Neon",
+            "Tab\tbed"
+        ]
+
+        with tempfile.TemporaryDirectory() as directory:
+            reference_path = os.path.join(directory, "references.txt")
+            input_path = os.path.join(directory, "input.txt")
+            output_path = os.path.join(directory, "output.txt")
+
+            with open(reference_path, "w", encoding="utf-8") as file:
+                file.write("\n".join(reference_list) + "\n")
+
+            with open(input_path, "w", encoding="utf-8") as file:
+                file.write("floreen\nneon\nzzz\nhelum\ntab bed\n")
+
+            def run(*arguments):
+                self.assertEqual(
+                    main(list(arguments) + ["-i", input_path, "-o", output_path]),
+                    0
+                )
+
+                with open(output_path, encoding="utf-8") as file:
+                    return file.read()
+
+            expected = (
+                "floreen\tFluorine\t3\t" + str(2 / 7 * 100) + "\n"
+                + "neon\tNeon\t4\t100.0\n"
+                + "helum\tHelium\t1\t60.0\n"
+                + "tab bed\tTab\\tbed\t6\t" + str(4 / 6 * 100) + "\n"
+            )
+
+            self.assertEqual(run(reference_path), expected)
+
+            for workers in ["2", "0"]:
+                self.assertEqual(
+                    run(reference_path, "-w", workers, "--chunk-size", "1"),
+                    expected
+                )
+
+            self.assertEqual(
+                run(reference_path, "-s", "matches", "-k", "2", "-t", "3"),
+                "neon\tNeon\t4\t3\n"
+                + "neon\tNeon\t5\t3\n"
+                + "helum\tHelium\t1\t3\n"
+                + "tab bed\tTab\\tbed\t6\t4\n"
+            )
+
+            self.assertEqual(
+                [
+                    json.loads(line) for line in run(
+                        reference_path,
+                        "-f",
+                        "jsonl",
+                        "-t",
+                        "60"
+                    ).splitlines()
+                ],
+                [
+                    {
+                        "query": "neon",
+                        "reference": "Neon",
+                        "index": 4,
+                        "score": 100.0
+                    },
+                    {
+                        "query": "helum",
+                        "reference": "Helium",
+                        "index": 1,
+                        "score": 60.0
+                    },
+                    {
+                        "query": "tab bed",
+                        "reference": "Tab\tbed",
+                        "index": 6,
+                        "score": 4 / 6 * 100
+                    }
+                ]
+            )
+
+            saved_path = os.path.join(directory, "references.fzj")
+
+            for build in [CharNgram.compile, CharNgram.build_index]:
+                build(reference_list).save(saved_path)
+
+                for workers in ["1", "2"]:
+                    self.assertEqual(run(saved_path, "-w", workers), expected)
+
+            # Windows line endings are not part of the strings.
+            with open(reference_path, "wb") as file:
+                file.write(
+                    "\r\n".join(reference_list).encode("utf-8") + b"\r\n"
+                )
+
+            with open(input_path, "wb") as file:
+                file.write(b"floreen\r\nneon\r\nzzz\r\nhelum\r\ntab bed\r\n")
+
+            self.assertEqual(run(reference_path), expected)
+
+            with contextlib.redirect_stderr(io.StringIO()):
+                self.assertEqual(
+                    main(
+                        [
+                            os.path.join(directory, "missing.txt"),
+                            "-i",
+                            input_path
+                        ]
+                    ),
+                    1
+                )
+
+                with self.assertRaises(SystemExit):
+                    main([reference_path, "-k", "0"])
+
 if __name__ == "__main__":
     unittest.main()
 